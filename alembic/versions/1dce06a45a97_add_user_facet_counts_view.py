@@ -0,0 +1,47 @@
+"""Add user facet counts materialized view
+
+Revision ID: 1dce06a45a97
+Revises: 655d9213c227
+Create Date: 2026-10-19 09:12:41.204187
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '1dce06a45a97'
+down_revision: Union[str, None] = '655d9213c227'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Each grouping set leaves every other facet column NULL, so COALESCE picks the grouped value
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW user_facet_counts AS
+        SELECT
+            CASE
+                WHEN GROUPING(state) = 0 THEN 'state'
+                WHEN GROUPING(crm_status) = 0 THEN 'crm_status'
+                WHEN GROUPING(lead_source) = 0 THEN 'lead_source'
+                WHEN GROUPING(company_name) = 0 THEN 'company_name'
+                ELSE '_total'
+            END AS facet,
+            COALESCE(state, crm_status, lead_source, company_name) AS value,
+            count(*) AS cnt
+        FROM users
+        GROUP BY GROUPING SETS ((state), (crm_status), (lead_source), (company_name), ())
+        """
+    )
+    # REFRESH ... CONCURRENTLY requires a unique index over all rows
+    op.execute(
+        'CREATE UNIQUE INDEX ix_user_facet_counts_facet_value ON user_facet_counts (facet, value) NULLS NOT DISTINCT'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS user_facet_counts')
@@ -0,0 +1,74 @@
+"""Users data version from an append-only change log
+
+Revision ID: 2c6b8e0f4a13
+Revises: a7d2e9c4f150
+Create Date: 2026-10-20 09:12:37.204518
+
+The statement trigger on users updated the single 'users' row of table_versions, and every writer held that
+row lock until its commit: import batches, registrations, recounts and backfills queued behind each other.
+Each write statement now appends a row to table_changes instead, inserts do not wait on each other. The data
+version is the folded base in table_versions plus the count of the changes not folded yet, it moves exactly
+when a write commits, whatever the commit order. A periodic task of the app folds the log into the base.
+event_types keeps the bump, it is written a few times a day.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '2c6b8e0f4a13'
+down_revision: Union[str, None] = 'a7d2e9c4f150'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'table_changes',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column('table_name', sa.String(length=100), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION log_table_change() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO table_changes (table_name) VALUES (TG_TABLE_NAME);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute('DROP TRIGGER IF EXISTS users_bump_table_version ON users')
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER users_log_table_change
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+        FOR EACH STATEMENT EXECUTE FUNCTION log_table_change()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER IF EXISTS users_log_table_change ON users')
+    # The version keeps counting from where the log left it
+    op.execute(
+        """
+        UPDATE table_versions
+        SET version = version + (SELECT count(*) FROM table_changes WHERE table_name = 'users')
+        WHERE table_name = 'users'
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER users_bump_table_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """
+    )
+    op.execute('DROP FUNCTION IF EXISTS log_table_change()')
+    op.drop_table('table_changes')
@@ -0,0 +1,27 @@
+"""Add users updated_at index
+
+Revision ID: 3b7e9d1f0c24
+Revises: 8a3f1c7d2b90
+Create Date: 2026-10-19 14:02:17.880315
+
+Serves the max(updated_at) watermark and the "updated since" scans of the in-memory snapshots.
+"""
+from typing import Sequence, Union
+
+from scripts.backfill import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e9d1f0c24'
+down_revision: Union[str, None] = '8a3f1c7d2b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    create_index_concurrently('ix_users_updated_at', 'users', 'updated_at')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_users_updated_at')
@@ -0,0 +1,57 @@
+"""Add table_versions change counter
+
+Revision ID: 5e0a2c9b7d41
+Revises: c41d8e27a6f3
+Create Date: 2026-10-19 16:48:09.662019
+
+A statement-level trigger bumps the version of users on every write, giving a cheap data version for
+ETags. Unlike max(updated_at) it also moves on deletes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0a2c9b7d41'
+down_revision: Union[str, None] = 'c41d8e27a6f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'table_versions',
+        sa.Column('table_name', sa.String(length=100), nullable=False),
+        sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('table_name'),
+    )
+    op.execute("INSERT INTO table_versions (table_name) VALUES ('users')")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE table_versions SET version = version + 1, updated_at = now()
+            WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER users_bump_table_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER IF EXISTS users_bump_table_version ON users')
+    op.execute('DROP FUNCTION IF EXISTS bump_table_version()')
+    op.drop_table('table_versions')
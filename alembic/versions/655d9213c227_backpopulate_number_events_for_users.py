@@ -9,9 +9,8 @@ from typing import Sequence, Union
 
 from alembic import op
 import sqlalchemy as sa
-from sqlalchemy.orm.session import Session
 
-from scripts.sync import sync_user_relation_count
+from scripts.backfill import backfill, reset_backfill
 
 # revision identifiers, used by Alembic.
 revision: str = '655d9213c227'
@@ -22,14 +21,19 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    sync_user_relation_count(session=Session(op.get_bind()))
-    pass
-    # ### end Alembic commands ###
+    # Keyed batches in short transactions, resumable, instead of one transaction locking every user
+    backfill(
+        'users_number_events',
+        'users',
+        """
+        UPDATE users SET
+            number_events_hosted = (SELECT count(*) FROM events WHERE events.owner_id = users.id),
+            number_events_attended = (SELECT count(*) FROM registrations WHERE registrations.user_id = users.id)
+        WHERE id = ANY(:ids)
+        """,
+    )
 
 
 def downgrade() -> None:
     """Downgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    reset_backfill('users_number_events')
@@ -0,0 +1,79 @@
+"""Add full-text search vector to users
+
+Revision ID: 8a3f1c7d2b90
+Revises: 1dce06a45a97
+Create Date: 2026-10-19 11:40:05.531902
+
+The column is maintained by a trigger instead of being ``GENERATED ALWAYS ... STORED``: adding a stored
+generated column rewrites the whole table under an ACCESS EXCLUSIVE lock. Here the column is added as a
+metadata-only change, existing rows are filled in short resumable batches (scripts.backfill) and the GIN
+index is built concurrently.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from scripts.backfill import backfill, create_index_concurrently, drop_index_concurrently, reset_backfill
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a3f1c7d2b90'
+down_revision: Union[str, None] = '1dce06a45a97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def search_vector_expression(row: str) -> str:
+    # Emails are indexed whole and split on separators so "jane" or "acme" match "jane.doe@acme.com"
+    return f"""
+        setweight(to_tsvector('simple', coalesce({row}.first_name, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce({row}.last_name, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce({row}.email, '')), 'B')
+        || setweight(to_tsvector('simple', regexp_replace(coalesce({row}.email, ''), '[@._+-]+', ' ', 'g')), 'B')
+        || setweight(to_tsvector('simple', coalesce({row}.company_name, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce({row}.job_title, '')), 'C')
+    """
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Committed by the backfill below, ran again when the migration resumes after a failed batch
+    op.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS search_vector tsvector')
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION users_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {search_vector_expression('NEW')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER users_search_vector_update
+        BEFORE INSERT OR UPDATE OF first_name, last_name, email, company_name, job_title ON users
+        FOR EACH ROW EXECUTE FUNCTION users_search_vector_update()
+        """
+    )
+
+    # Backfill and index outside of the migration transaction so no lock is held for long
+    backfill(
+        'users_search_vector',
+        'users',
+        f"UPDATE users SET search_vector = {search_vector_expression('users')} WHERE id = ANY(:ids)",
+        batch_size=BATCH_SIZE,
+    )
+    create_index_concurrently('ix_users_search_vector', 'users', 'search_vector', using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_users_search_vector')
+    op.execute('DROP TRIGGER IF EXISTS users_search_vector_update ON users')
+    op.execute('DROP FUNCTION IF EXISTS users_search_vector_update()')
+    op.drop_column('users', 'search_vector')
+    reset_backfill('users_search_vector')
+
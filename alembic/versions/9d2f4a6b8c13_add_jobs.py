@@ -0,0 +1,72 @@
+"""Add jobs queue table
+
+Revision ID: 9d2f4a6b8c13
+Revises: 5e0a2c9b7d41
+Create Date: 2026-10-19 17:25:41.208335
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2f4a6b8c13'
+down_revision: Union[str, None] = '5e0a2c9b7d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'jobs',
+        sa.Column('kind', sa.String(length=100), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('progress_done', sa.Integer(), nullable=False),
+        sa.Column('progress_total', sa.Integer(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+        sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('worker', sa.String(length=255), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column(
+            'created_at',
+            postgresql.TIMESTAMP(),
+            server_default=sa.text('now()'),
+            nullable=False,
+            comment='Timestamp of when the record was created',
+        ),
+        sa.Column(
+            'updated_at',
+            postgresql.TIMESTAMP(),
+            server_default=sa.text('now()'),
+            nullable=False,
+            comment='Timestamp of when the record was last updated',
+        ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_jobs_queued_run_after',
+        'jobs',
+        ['run_after'],
+        unique=False,
+        postgresql_where=sa.text("status = 'queued'"),
+    )
+    op.create_index('ix_jobs_status', 'jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_status', table_name='jobs')
+    op.drop_index('ix_jobs_queued_run_after', table_name='jobs', postgresql_where=sa.text("status = 'queued'"))
+    op.drop_table('jobs')
@@ -0,0 +1,40 @@
+"""Users activity and signup date indexes
+
+Revision ID: a7d2e9c4f150
+Revises: f0b3c8d2a417
+Create Date: 2026-10-19 22:41:06.518203
+
+Serve the last_activity and created range filters of /api/users with B-trees, the composite indexes serve a
+range within one CRM status. created_at gets no BRIN although users are inserted in signup order: rows are
+updated constantly (counters, last_activity_at, search_vector, import upserts) and updated tuples move away
+from signup order. On a copy of a 100k users table, pg_stats.correlation of created_at went from 0.99 to 0.76
+after two rounds of updates over 10% of the users, and to 0.57 after two more rounds over 30% of them.
+"""
+from typing import Sequence, Union
+
+from scripts.backfill import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d2e9c4f150'
+down_revision: Union[str, None] = 'f0b3c8d2a417'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_users_created_at', 'created_at'),
+    ('ix_users_last_activity_at', 'last_activity_at'),
+    ('ix_users_crm_status_last_activity_at', 'crm_status, last_activity_at'),
+    ('ix_users_crm_status_created_at', 'crm_status, created_at'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, columns in INDEXES:
+        create_index_concurrently(name, 'users', columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _ in reversed(INDEXES):
+        drop_index_concurrently(name)
@@ -0,0 +1,56 @@
+"""Default primary keys to time-ordered UUIDv7
+
+Revision ID: b41c7e2a9f05
+Revises: 9d2f4a6b8c13
+Create Date: 2026-10-19 18:02:13.540917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41c7e2a9f05'
+down_revision: Union[str, None] = '9d2f4a6b8c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('users', 'event_types', 'events', 'registrations', 'jobs')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The application generates ids itself (src.utils.ids.uuid7), the column default covers raw SQL inserts.
+    # Random bytes of gen_random_uuid() with the millisecond timestamp over the first 48 bits and the
+    # version nibble set to 7 (bits 52 and 53 of the v4 layout's 0100).
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+            SELECT encode(
+                set_bit(
+                    set_bit(
+                        overlay(
+                            uuid_send(gen_random_uuid())
+                            PLACING substring(int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3)
+                            FROM 1 FOR 6
+                        ),
+                        52, 1
+                    ),
+                    53, 1
+                ),
+                'hex'
+            )::uuid
+        $$ LANGUAGE sql VOLATILE PARALLEL SAFE
+        """
+    )
+    for table in TABLES:
+        # Metadata only, existing rows keep their random ids
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN id SET DEFAULT uuid_generate_v7()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN id DROP DEFAULT')
+    op.execute('DROP FUNCTION IF EXISTS uuid_generate_v7()')
@@ -0,0 +1,44 @@
+"""Notify on event_types change
+
+Revision ID: c41d8e27a6f3
+Revises: 3b7e9d1f0c24
+Create Date: 2026-10-19 15:31:52.104776
+
+Every worker caches event_types in memory and listens on this channel to reload it.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d8e27a6f3'
+down_revision: Union[str, None] = '3b7e9d1f0c24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION event_types_notify_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('event_types_changed', TG_OP);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER event_types_notify_change
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON event_types
+        FOR EACH STATEMENT EXECUTE FUNCTION event_types_notify_change()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER IF EXISTS event_types_notify_change ON event_types')
+    op.execute('DROP FUNCTION IF EXISTS event_types_notify_change()')
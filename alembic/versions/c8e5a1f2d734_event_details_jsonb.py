@@ -0,0 +1,90 @@
+"""Convert events.event_details to JSONB with a GIN index
+
+Revision ID: c8e5a1f2d734
+Revises: b41c7e2a9f05
+Create Date: 2026-10-19 18:31:52.118064
+
+``ALTER COLUMN ... TYPE jsonb`` would rewrite the table under an ACCESS EXCLUSIVE lock. Instead a JSONB
+shadow column is added and kept in sync by a trigger, existing rows are copied in short resumable batches
+(scripts.backfill), then the columns are swapped in one short transaction and the GIN index is built
+concurrently.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from scripts.backfill import backfill, create_index_concurrently, drop_index_concurrently, reset_backfill
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e5a1f2d734'
+down_revision: Union[str, None] = 'b41c7e2a9f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Every step is committed before the next, a rerun after a failure skips or repeats them harmlessly
+    converted = op.get_bind().execute(
+        sa.text(
+            "SELECT data_type = 'jsonb' FROM information_schema.columns "
+            "WHERE table_name = 'events' AND column_name = 'event_details'"
+        )
+    ).scalar()
+    if not converted:
+        op.execute('ALTER TABLE events ADD COLUMN IF NOT EXISTS event_details_jsonb jsonb')
+        op.execute(
+            """
+            CREATE OR REPLACE FUNCTION events_event_details_jsonb_sync() RETURNS trigger AS $$
+            BEGIN
+                NEW.event_details_jsonb := NEW.event_details::jsonb;
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+            """
+        )
+        op.execute(
+            """
+            CREATE OR REPLACE TRIGGER events_event_details_jsonb_sync
+            BEFORE INSERT OR UPDATE OF event_details ON events
+            FOR EACH ROW EXECUTE FUNCTION events_event_details_jsonb_sync()
+            """
+        )
+
+        # Rows written from now on are synced by the trigger, copy the existing ones
+        backfill(
+            'events_event_details_jsonb',
+            'events',
+            'UPDATE events SET event_details_jsonb = event_details::jsonb WHERE id = ANY(:ids)',
+            batch_size=BATCH_SIZE,
+        )
+
+        # Catalog changes only, fails fast instead of queueing behind long transactions on events
+        op.execute("SET LOCAL lock_timeout = '5s'")
+        op.execute('DROP TRIGGER events_event_details_jsonb_sync ON events')
+        op.execute('DROP FUNCTION events_event_details_jsonb_sync()')
+        op.drop_column('events', 'event_details')
+        op.alter_column('events', 'event_details_jsonb', new_column_name='event_details')
+
+    create_index_concurrently(
+        'ix_events_event_details', 'events', 'event_details jsonb_path_ops', using='gin'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_events_event_details')
+    # Rewrites the table, JSON is only kept for the way back
+    op.alter_column(
+        'events',
+        'event_details',
+        type_=sa.JSON(),
+        existing_type=postgresql.JSONB(astext_type=sa.Text()),
+        postgresql_using='event_details::json',
+    )
+    reset_backfill('events_event_details_jsonb')
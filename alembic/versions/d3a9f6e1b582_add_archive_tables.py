@@ -0,0 +1,70 @@
+"""Add the cold tier manifest and archived counts
+
+Revision ID: d3a9f6e1b582
+Revises: c8e5a1f2d734
+Create Date: 2026-10-19 19:05:37.824410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a9f6e1b582'
+down_revision: Union[str, None] = 'c8e5a1f2d734'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'archive_files',
+        sa.Column('table_name', sa.String(length=100), nullable=False),
+        sa.Column('storage_key', sa.String(length=500), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False),
+        sa.Column('min_event_timestamp', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('max_event_timestamp', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('id', sa.UUID(), server_default=sa.text('uuid_generate_v7()'), nullable=False),
+        sa.Column(
+            'created_at',
+            postgresql.TIMESTAMP(),
+            server_default=sa.text('now()'),
+            nullable=False,
+            comment='Timestamp of when the record was created',
+        ),
+        sa.Column(
+            'updated_at',
+            postgresql.TIMESTAMP(),
+            server_default=sa.text('now()'),
+            nullable=False,
+            comment='Timestamp of when the record was last updated',
+        ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('storage_key'),
+    )
+    op.create_index(
+        'ix_archive_files_table_name_max_event_timestamp',
+        'archive_files',
+        ['table_name', 'max_event_timestamp'],
+        unique=False,
+    )
+    op.create_table(
+        'archived_user_counts',
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('events_hosted', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('events_attended', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('archived_user_counts')
+    op.drop_index('ix_archive_files_table_name_max_event_timestamp', table_name='archive_files')
+    op.drop_table('archive_files')
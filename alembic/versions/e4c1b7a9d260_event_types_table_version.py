@@ -0,0 +1,36 @@
+"""Track the event_types data version
+
+Revision ID: e4c1b7a9d260
+Revises: d3a9f6e1b582
+Create Date: 2026-10-19 20:12:44.508317
+
+Workers trust the published reference data snapshot only while its version is the current one.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4c1b7a9d260'
+down_revision: Union[str, None] = 'd3a9f6e1b582'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("INSERT INTO table_versions (table_name) VALUES ('event_types') ON CONFLICT DO NOTHING")
+    op.execute(
+        """
+        CREATE TRIGGER event_types_bump_table_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON event_types
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER IF EXISTS event_types_bump_table_version ON event_types')
+    op.execute("DELETE FROM table_versions WHERE table_name = 'event_types'")
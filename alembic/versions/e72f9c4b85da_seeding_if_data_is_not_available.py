@@ -8,11 +8,8 @@ Create Date: 2025-07-18 20:03:15.947364
 from typing import Sequence, Union
 
 from alembic import op
-import sqlalchemy as sa
-from sqlalchemy.orm import Session
-
-from scripts.seeding import seeding_data
-
+from scripts.backfill import insert_batches
+from scripts.seeding import SEED_BATCH_SIZE, dataset, seeding_pending
 
 # revision identifiers, used by Alembic.
 revision: str = 'e72f9c4b85da'
@@ -23,7 +20,12 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
-    seeding_data(Session(op.get_bind()))
+    tables = dataset()
+    if not seeding_pending(op.get_bind(), tables):
+        return
+    # Batches committed outside of the migration transaction, a failed run resumes from the checkpoints
+    for table, rows in tables:
+        insert_batches(f'seed_{table.name}', table, rows, batch_size=SEED_BATCH_SIZE)
 
 
 def downgrade() -> None:
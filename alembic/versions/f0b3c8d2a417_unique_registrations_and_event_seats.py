@@ -0,0 +1,80 @@
+"""Unique registrations per user and event, event seats
+
+Revision ID: f0b3c8d2a417
+Revises: e4c1b7a9d260
+Create Date: 2026-10-19 21:12:48.305127
+
+Duplicate (user_id, event_id) registrations are removed first, keeping an active one over a cancelled one,
+then the earliest, and the attended counters of their users are corrected. The unique index is built
+concurrently and attached as the constraint the registration API's ON CONFLICT relies on.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from scripts.backfill import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f0b3c8d2a417'
+down_revision: Union[str, None] = 'e4c1b7a9d260'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DEDUPLICATE_REGISTRATIONS = """
+WITH ranked AS (
+    SELECT id, row_number() OVER (
+        PARTITION BY user_id, event_id
+        ORDER BY status = 'Cancelled', registration_timestamp, id
+    ) AS position
+    FROM registrations
+),
+deleted AS (
+    DELETE FROM registrations r USING ranked
+    WHERE r.id = ranked.id AND ranked.position > 1
+    RETURNING r.user_id
+),
+per_user AS (
+    SELECT user_id, count(*) AS duplicates FROM deleted GROUP BY user_id
+)
+UPDATE users SET
+    number_events_attended = greatest(users.number_events_attended - per_user.duplicates, 0),
+    updated_at = now()
+FROM per_user
+WHERE users.id = per_user.user_id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Committed on its own, before the unique index build that would fail on the duplicates
+    with op.get_context().autocommit_block():
+        op.execute(DEDUPLICATE_REGISTRATIONS)
+    create_index_concurrently(
+        'uq_registrations_user_event', 'registrations', 'user_id, event_id', unique=True
+    )
+    create_index_concurrently('ix_registrations_event_id', 'registrations', 'event_id')
+    op.execute(
+        'ALTER TABLE registrations ADD CONSTRAINT uq_registrations_user_event '
+        'UNIQUE USING INDEX uq_registrations_user_event'
+    )
+    op.create_table(
+        'event_seats',
+        sa.Column('event_id', sa.UUID(), nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=True),
+        sa.Column('registered', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.CheckConstraint('registered >= 0', name='ck_event_seats_registered'),
+        sa.CheckConstraint('capacity IS NULL OR registered <= capacity', name='ck_event_seats_capacity'),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('event_id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('event_seats')
+    op.drop_constraint('uq_registrations_user_event', 'registrations', type_='unique')
+    drop_index_concurrently('ix_registrations_event_id')
@@ -0,0 +1,313 @@
+"""Online data backfills for Alembic migrations.
+
+Data work inside a migration's DDL transaction holds its locks for as long as the data work takes, and a
+failure throws all of it away. The helpers here run outside of it instead:
+
+* :func:`backfill` walks a table in primary key order and applies an ``UPDATE`` to one batch of keys per
+  short transaction, recording the last key in ``backfill_checkpoints`` in the same transaction. Running the
+  migration again after a failure resumes after the last committed batch.
+* :func:`insert_batches` inserts generated rows (e.g. a seeding) the same way, one batch per transaction
+  with ``ON CONFLICT DO NOTHING``, the checkpoint counting the rows done.
+* Between batches it waits while replicas lag or the database is busy, see :class:`Throttle`.
+* :func:`create_index_concurrently` builds an index without blocking writes, dropping the invalid leftover
+  of an earlier interrupted build first.
+
+Both commit the migration transaction before starting (see ``MigrationContext.autocommit_block``), so any
+schema change they depend on must come earlier in the same ``upgrade()``. That change is committed already
+when a batch fails and runs again when the migration resumes: write it so it can (``ADD COLUMN IF NOT
+EXISTS``, ``CREATE OR REPLACE``).
+
+Usage::
+
+    from scripts.backfill import backfill
+
+    def upgrade() -> None:
+        op.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS nickname VARCHAR(100)')
+        backfill('users_nickname', 'users', 'UPDATE users SET nickname = first_name WHERE id = ANY(:ids)')
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+logger = logging.getLogger('alembic.backfill')
+
+CHECKPOINT_TABLE = 'backfill_checkpoints'
+
+
+@dataclass(frozen=True)
+class Throttle:
+    """Back pressure between batches.
+
+    The backfill waits ``backoff_seconds`` at a time while any replica replays more than
+    ``max_replication_lag_seconds`` behind, or more than ``max_active_backends`` other sessions are running
+    a statement. ``pause_seconds`` is always slept between batches to leave room to the application.
+    """
+
+    max_replication_lag_seconds: float = 10
+    max_active_backends: int = 50
+    pause_seconds: float = 0.05
+    backoff_seconds: float = 5
+
+    def wait(self, connection: sa.Connection) -> None:
+        while True:
+            lag = connection.execute(
+                sa.text('SELECT coalesce(max(extract(epoch FROM replay_lag)), 0) FROM pg_stat_replication')
+            ).scalar_one()
+            active = connection.execute(
+                sa.text("SELECT count(*) FROM pg_stat_activity WHERE state = 'active' AND pid <> pg_backend_pid()")
+            ).scalar_one()
+            if lag <= self.max_replication_lag_seconds and active <= self.max_active_backends:
+                break
+            logger.info(f'Backfill paused: replication lag {lag:.1f}s, {active} active backends')
+            time.sleep(self.backoff_seconds)
+        time.sleep(self.pause_seconds)
+
+
+def _ensure_checkpoint_table(connection: sa.Connection) -> None:
+    connection.execute(
+        sa.text(
+            f"""
+            CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+                name VARCHAR(255) PRIMARY KEY,
+                last_key TEXT,
+                rows_done BIGINT NOT NULL DEFAULT 0,
+                finished_at TIMESTAMPTZ,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+    )
+
+
+def _key_type(connection: sa.Connection, table: str, key: str) -> str:
+    return connection.execute(
+        sa.text(
+            'SELECT format_type(atttypid, atttypmod) FROM pg_attribute '
+            'WHERE attrelid = CAST(:table AS regclass) AND attname = :key'
+        ),
+        {'table': table, 'key': key},
+    ).scalar_one()
+
+
+def backfill(  # noqa: PLR0913
+    name: str,
+    table: str,
+    update_sql: str,
+    key: str = 'id',
+    batch_size: int = 1000,
+    where: Optional[str] = None,
+    throttle: Optional[Throttle] = None,
+) -> int:
+    """Apply ``update_sql`` to every row of ``table`` in batches of ``batch_size`` keys.
+
+    Args:
+        name: Unique name of this backfill, the checkpoint is stored under it.
+        table: Table walked in ``key`` order.
+        update_sql: Statement applied to one batch, the keys are bound as the array ``:ids``.
+        key: Unique, indexed column to walk the table by.
+        batch_size: Keys per transaction.
+        where: Optional SQL condition restricting the rows to walk.
+        throttle: Back pressure settings, defaults to :class:`Throttle`.
+
+    Returns:
+        The number of keys processed by this run.
+    """
+    throttle = throttle or Throttle()
+    context = op.get_context()
+    if context.as_sql:
+        raise RuntimeError(f'Backfill {name} cannot run in offline (--sql) mode')
+
+    with context.autocommit_block():
+        # A connection of its own: the migration connection stays in autocommit mode for the block
+        engine = op.get_bind().engine
+        with engine.begin() as connection:
+            _ensure_checkpoint_table(connection)
+            key_type = _key_type(connection, table, key)
+            checkpoint = connection.execute(
+                sa.text(f'SELECT last_key, rows_done, finished_at FROM {CHECKPOINT_TABLE} WHERE name = :name'),
+                {'name': name},
+            ).one_or_none()
+        if checkpoint is not None and checkpoint.finished_at is not None:
+            logger.info(f'Backfill {name} already finished, skipping')
+            return 0
+
+        last_key = checkpoint.last_key if checkpoint else None
+        rows_done = checkpoint.rows_done if checkpoint else 0
+        condition = f'AND ({where})' if where else ''
+        next_batch = sa.text(
+            f"""
+            SELECT {key} FROM {table}
+            WHERE (CAST(:last_key AS TEXT) IS NULL OR {key} > CAST(:last_key AS {key_type})) {condition}
+            ORDER BY {key}
+            LIMIT :batch_size
+            """
+        )
+        save_checkpoint = sa.text(
+            f"""
+            INSERT INTO {CHECKPOINT_TABLE} (name, last_key, rows_done, finished_at, updated_at)
+            VALUES (:name, :last_key, :rows_done, CASE WHEN :finished THEN now() END, now())
+            ON CONFLICT (name) DO UPDATE SET
+                last_key = excluded.last_key,
+                rows_done = excluded.rows_done,
+                finished_at = excluded.finished_at,
+                updated_at = now()
+            """
+        )
+        processed = 0
+        if last_key is not None:
+            logger.info(f'Backfill {name} resuming after {last_key} ({rows_done} rows done)')
+        while True:
+            with engine.begin() as connection:
+                ids = connection.execute(next_batch, {'last_key': last_key, 'batch_size': batch_size}).scalars().all()
+                if ids:
+                    connection.execute(sa.text(update_sql), {'ids': ids})
+                    last_key = str(ids[-1])
+                    rows_done += len(ids)
+                    processed += len(ids)
+                connection.execute(
+                    save_checkpoint,
+                    {'name': name, 'last_key': last_key, 'rows_done': rows_done, 'finished': not ids},
+                )
+            if not ids:
+                break
+            logger.info(f'Backfill {name}: {rows_done} rows done')
+            with engine.connect() as connection:
+                throttle.wait(connection)
+    logger.info(f'Backfill {name} finished, {processed} rows in this run')
+    return processed
+
+
+def insert_batches(
+    name: str,
+    table: sa.Table,
+    rows: list[dict],
+    batch_size: int = 1000,
+    throttle: Optional[Throttle] = None,
+) -> int:
+    """Insert ``rows`` into ``table`` in batches of ``batch_size``, skipping rows whose key exists.
+
+    A resumed run skips the ``rows_done`` first rows, ``rows`` must come in the same order on every run.
+
+    Args:
+        name: Unique name of this insert, the checkpoint is stored under it.
+        table: Table inserted into, only the columns present in the rows are sent.
+        rows: Column values of every row.
+        batch_size: Rows per transaction.
+        throttle: Back pressure settings, defaults to :class:`Throttle`.
+
+    Returns:
+        The number of rows processed by this run.
+    """
+    throttle = throttle or Throttle()
+    context = op.get_context()
+    if context.as_sql:
+        raise RuntimeError(f'Insert {name} cannot run in offline (--sql) mode')
+
+    with context.autocommit_block():
+        engine = op.get_bind().engine
+        with engine.begin() as connection:
+            _ensure_checkpoint_table(connection)
+            checkpoint = connection.execute(
+                sa.text(f'SELECT rows_done, finished_at FROM {CHECKPOINT_TABLE} WHERE name = :name'),
+                {'name': name},
+            ).one_or_none()
+        if checkpoint is not None and checkpoint.finished_at is not None:
+            logger.info(f'Insert {name} already finished, skipping')
+            return 0
+
+        rows_done = checkpoint.rows_done if checkpoint else 0
+        save_checkpoint = sa.text(
+            f"""
+            INSERT INTO {CHECKPOINT_TABLE} (name, rows_done, finished_at, updated_at)
+            VALUES (:name, :rows_done, CASE WHEN :finished THEN now() END, now())
+            ON CONFLICT (name) DO UPDATE SET
+                rows_done = excluded.rows_done,
+                finished_at = excluded.finished_at,
+                updated_at = now()
+            """
+        )
+        insert = postgresql.insert(table).on_conflict_do_nothing()
+        processed = 0
+        if rows_done:
+            logger.info(f'Insert {name} resuming after {rows_done} rows')
+        while True:
+            batch = rows[rows_done : rows_done + batch_size]
+            with engine.begin() as connection:
+                if batch:
+                    connection.execute(insert, batch)
+                    rows_done += len(batch)
+                    processed += len(batch)
+                connection.execute(
+                    save_checkpoint, {'name': name, 'rows_done': rows_done, 'finished': not batch}
+                )
+            if not batch:
+                break
+            logger.info(f'Insert {name}: {rows_done} rows done')
+            with engine.connect() as connection:
+                throttle.wait(connection)
+    logger.info(f'Insert {name} finished, {processed} rows in this run')
+    return processed
+
+
+def reset_backfill(name: str) -> None:
+    """Forget the checkpoint of ``name``, to call from ``downgrade()`` so the next upgrade backfills again."""
+    bind = op.get_bind()
+    if bind.execute(sa.text('SELECT to_regclass(:table)'), {'table': CHECKPOINT_TABLE}).scalar() is not None:
+        bind.execute(sa.text(f'DELETE FROM {CHECKPOINT_TABLE} WHERE name = :name'), {'name': name})
+
+
+def create_index_concurrently(  # noqa: PLR0913
+    name: str,
+    table: str,
+    columns: str,
+    using: Optional[str] = None,
+    where: Optional[str] = None,
+    unique: bool = False,
+) -> None:
+    """``CREATE INDEX CONCURRENTLY``, outside of the migration transaction.
+
+    A concurrent build that fails or is interrupted leaves an invalid index behind which ``IF NOT EXISTS``
+    would happily keep, so an invalid index with the same name is dropped and built again.
+
+    Args:
+        name: Index name.
+        table: Indexed table.
+        columns: Column list or expressions, as SQL, e.g. ``'crm_status, last_activity_at'``.
+        using: Index method, e.g. ``'gin'`` or ``'brin'``.
+        where: Condition of a partial index, as SQL.
+        unique: Build a unique index.
+    """
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        valid = bind.execute(
+            sa.text(
+                'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+                'WHERE c.relname = :name'
+            ),
+            {'name': name},
+        ).scalar_one_or_none()
+        if valid is False:
+            logger.warning(f'Dropping invalid index {name} left by an interrupted build')
+            bind.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+        elif valid:
+            return
+        method = f'USING {using} ' if using else ''
+        predicate = f' WHERE {where}' if where else ''
+        bind.execute(
+            sa.text(
+                f'CREATE {"UNIQUE " if unique else ""}INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                f'ON {table} {method}({columns}){predicate}'
+            )
+        )
+
+
+def drop_index_concurrently(name: str) -> None:
+    with op.get_context().autocommit_block():
+        op.get_bind().execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
@@ -0,0 +1,160 @@
+"""Concurrency benchmark of the registration API on a single hot event.
+
+Registers ``--users`` users who are not registered yet to one event, as fast as ``--concurrency`` clients
+can, a fraction of them sending their request twice. The capacity of the event is set so that ``--seats`` of
+them get a seat. Reports the sustained registrations per second and the latency, then checks in the database
+that the event is not over-subscribed, that nobody is registered twice and that the seats counter matches the
+registrations. Exits with status 1 when a check fails.
+
+It writes registrations and changes the capacity of the event, run it against a scratch database::
+
+    uv run python -m scripts.bench_registrations --users 5000 --seats 2500 --concurrency 200
+    # Against the app in this process, no server needed (runs the lifespan, needs the database)
+    uv run python -m scripts.bench_registrations --asgi src.main:app
+"""
+
+import argparse
+import asyncio
+import importlib
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+from sqlalchemy import func, select
+
+from scripts.loadtest import PERCENTILES, Histogram
+from src.core.db import Database
+from src.models import Event, EventSeats, Registration, User
+from src.repos.registration import CANCELLED
+
+
+def pick(db: Database, event_id: Optional[uuid.UUID], users: int) -> tuple[uuid.UUID, list[uuid.UUID]]:
+    """The event, the most recent one by default, and users not registered to it yet."""
+    with db.sync_session() as session:
+        if event_id is None:
+            event_id = session.scalar(select(Event.id).order_by(Event.event_timestamp.desc()).limit(1))
+            if event_id is None:
+                raise SystemExit('No event in the database, seed it first')
+        registered = select(Registration.user_id).where(Registration.event_id == event_id)
+        user_ids = session.scalars(select(User.id).where(User.id.not_in(registered)).limit(users)).all()
+    return event_id, list(user_ids)
+
+
+def verify(db: Database, event_id: uuid.UUID) -> list[str]:
+    with db.sync_session() as session:
+        seats = session.execute(
+            select(EventSeats.capacity, EventSeats.registered).where(EventSeats.event_id == event_id)
+        ).one()
+        active = session.scalar(
+            select(func.count())
+            .select_from(Registration)
+            .where(Registration.event_id == event_id, Registration.status != CANCELLED)
+        )
+        duplicated = session.scalar(
+            select(func.count()).select_from(
+                select(Registration.user_id)
+                .where(Registration.event_id == event_id)
+                .group_by(Registration.user_id)
+                .having(func.count() > 1)
+                .subquery()
+            )
+        )
+    failures = []
+    if seats.capacity is not None and active > seats.capacity:
+        failures.append(f'over-subscribed: {active} active registrations for {seats.capacity} seats')
+    if active != seats.registered:
+        failures.append(f'seats counter {seats.registered} but {active} active registrations')
+    if duplicated:
+        failures.append(f'{duplicated} users registered more than once')
+    return failures
+
+
+@asynccontextmanager
+async def make_client(base_url: str, asgi: Optional[str], concurrency: int):
+    if asgi is None:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+            yield client
+        return
+    module, _, attribute = asgi.partition(':')
+    app = getattr(importlib.import_module(module), attribute or 'app')
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver', timeout=30) as client:
+            yield client
+
+
+async def run(
+    client: httpx.AsyncClient, event_id: uuid.UUID, requests: list[uuid.UUID], concurrency: int
+) -> tuple[Histogram, Counter, float]:
+    latency, statuses = Histogram(), Counter()
+    queue = iter(requests)
+    path = f'/api/events/{event_id}/registrations'
+
+    async def worker() -> None:
+        for user_id in queue:
+            started = time.perf_counter()
+            response = await client.post(path, json={'user_id': str(user_id)})
+            latency.record((time.perf_counter() - started) * 1_000_000)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latency, statuses, time.perf_counter() - started
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--event-id', type=uuid.UUID, help='Event to register to, the most recent by default')
+    parser.add_argument('--users', type=int, default=5000, help='Distinct users registering')
+    parser.add_argument('--seats', type=int, help='Seats left for them, half of them by default')
+    parser.add_argument('--unlimited', action='store_true', help='No capacity limit')
+    parser.add_argument('--duplicates', type=float, default=0.05, help='Fraction of users sending twice')
+    parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight')
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--asgi', help='Run against an ASGI app in this process, e.g. src.main:app')
+    args = parser.parse_args()
+
+    db = Database()
+    event_id, user_ids = pick(db, args.event_id, args.users)
+    requests = user_ids + random.sample(user_ids, int(len(user_ids) * args.duplicates))
+    random.shuffle(requests)
+    seats = args.users // 2 if args.seats is None else args.seats
+
+    async with make_client(args.base_url, args.asgi, args.concurrency) as client:
+        current = (await client.get(f'/api/events/{event_id}/capacity')).raise_for_status().json()
+        capacity = None if args.unlimited else current['registered'] + seats
+        (await client.put(f'/api/events/{event_id}/capacity', json={'capacity': capacity})).raise_for_status()
+        print(
+            f'Event {event_id}: {len(user_ids)} users, {len(requests)} requests, '
+            f'{"no limit" if capacity is None else f"{seats} seats left"}, concurrency {args.concurrency}'
+        )
+        latency, statuses, elapsed = await run(client, event_id, requests, args.concurrency)
+        batches = (await client.get('/api/metrics')).json().get('registration_batches')
+
+    registered = statuses[201]
+    print(f'{len(requests)} requests in {elapsed:.2f}s: {len(requests) / elapsed:.0f} requests/s')
+    print(f'{registered} registered: {registered / elapsed:.0f} registrations/s')
+    print(f'statuses: {dict(sorted(statuses.items()))}')
+    summary = latency.summary()
+    percentiles = ', '.join(f'p{p} {summary[f"p{p}_ms"]:.1f}' for p in PERCENTILES[:3])
+    print(f'latency ms: {percentiles}, max {summary["max_ms"]:.1f}')
+    if batches:
+        print(f'batches of the worker answering /api/metrics: {batches}')
+
+    expected = len(user_ids) if capacity is None else min(seats, len(user_ids))
+    failures = verify(db, event_id)
+    if registered != expected:
+        failures.append(f'{registered} users registered, expected {expected}')
+    for failure in failures:
+        print(f'FAIL {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,125 @@
+"""Insert benchmark of random (v4) against time-ordered (v7) UUID primary keys.
+
+Each strategy fills a scratch table shaped like ``registrations`` with the same number of rows, in batches
+of one transaction each, and reports the insert throughput, the WAL written, the size of the primary key
+index and, when the ``pgstattuple`` extension is available, its leaf density and fragmentation. Random keys
+split pages all over the index, ordered keys fill the rightmost leaf; the difference grows with the table
+once the index no longer fits in ``shared_buffers``. The ``v7_db`` strategy needs the migrations applied::
+
+    uv run python -m scripts.bench_uuid --rows 2000000 --batch-size 5000
+"""
+
+import argparse
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+from sqlalchemy import Connection, create_engine, text
+
+from src.core.config import settings
+from src.utils.ids import uuid7
+
+# name -> (column default, id generated in Python or None to let the database generate it)
+STRATEGIES: dict[str, tuple[str, Optional[Callable[[], uuid.UUID]]]] = {
+    'v4_db': ('gen_random_uuid()', None),
+    'v4_python': ('gen_random_uuid()', uuid.uuid4),
+    'v7_db': ('uuid_generate_v7()', None),
+    'v7_python': ('uuid_generate_v7()', uuid7),
+}
+
+
+def _wal_lsn(connection: Connection) -> int:
+    return connection.execute(text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')")).scalar_one()
+
+
+def _index_stats(connection: Connection, index: str) -> dict[str, Any]:
+    size = connection.execute(text(f"SELECT pg_relation_size('{index}')")).scalar_one()
+    stats = {'index_mb': round(size / 2**20, 1)}
+    try:
+        with connection.begin_nested():
+            row = connection.execute(
+                text(f"SELECT avg_leaf_density, leaf_fragmentation FROM pgstatindex('{index}')")
+            ).one()
+        stats.update(leaf_density=row.avg_leaf_density, leaf_fragmentation=row.leaf_fragmentation)
+    except Exception:
+        # pgstattuple is not installed
+        pass
+    return stats
+
+
+def run(connection: Connection, name: str, rows: int, batch_size: int, logged: bool = False) -> dict[str, Any]:
+    default, generate = STRATEGIES[name]
+    table = f'bench_uuid_{name}'
+    connection.execute(text(f'DROP TABLE IF EXISTS {table}'))
+    connection.execute(
+        text(
+            f"""
+            CREATE {'' if logged else 'UNLOGGED '}TABLE {table} (
+                id UUID PRIMARY KEY DEFAULT {default},
+                user_id UUID NOT NULL,
+                event_id UUID NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+            """
+        )
+    )
+    connection.commit()
+    if generate is None:
+        insert = text(f'INSERT INTO {table} (user_id, event_id) VALUES (:user_id, :event_id)')
+    else:
+        insert = text(f'INSERT INTO {table} (id, user_id, event_id) VALUES (:id, :user_id, :event_id)')
+    user_id, event_id = uuid.uuid4(), uuid.uuid4()
+
+    wal_before = _wal_lsn(connection)
+    connection.commit()
+    started = time.perf_counter()
+    for done in range(0, rows, batch_size):
+        count = min(batch_size, rows - done)
+        if generate is None:
+            params = [{'user_id': user_id, 'event_id': event_id}] * count
+        else:
+            params = [{'id': generate(), 'user_id': user_id, 'event_id': event_id} for _ in range(count)]
+        connection.execute(insert, params)
+        connection.commit()
+    elapsed = time.perf_counter() - started
+    # Close to zero for unlogged tables, the WAL of page splits and full page writes only shows with --logged
+    wal_mb = (_wal_lsn(connection) - wal_before) / 2**20
+    result = {
+        'strategy': name,
+        'rows': rows,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(rows / elapsed),
+        'wal_mb': round(wal_mb, 1),
+        **_index_stats(connection, f'{table}_pkey'),
+    }
+    connection.commit()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--strategies', default=','.join(STRATEGIES), help='Comma separated, of ' + ', '.join(STRATEGIES))
+    parser.add_argument('--logged', action='store_true', help='Regular tables, so the WAL volume is measured')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch tables')
+    args = parser.parse_args()
+
+    engine = create_engine(settings.SYNC_DB_URL, insertmanyvalues_page_size=args.batch_size)
+    results = []
+    with engine.connect() as connection:
+        for name in args.strategies.split(','):
+            results.append(run(connection, name, args.rows, args.batch_size, logged=args.logged))
+            print(results[-1], flush=True)
+            if not args.keep:
+                connection.execute(text(f'DROP TABLE bench_uuid_{name}'))
+                connection.commit()
+
+    columns = ['strategy', 'rows_per_second', 'seconds', 'wal_mb', 'index_mb', 'leaf_density', 'leaf_fragmentation']
+    print(''.join(f'{column:>20}' for column in columns))
+    for result in results:
+        print(''.join(f'{result.get(column, "-"):>20}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""Open-model load generator for the API.
+
+Requests are sent at a constant arrival rate (or Poisson arrivals) whatever the response times, like real
+traffic. Latency is measured from the time each request was *scheduled* to be sent, not from when it was
+actually sent, so a stalled server is charged for the requests that queued up behind the stall instead of
+hiding them (coordinated omission). Service time, measured from the actual send, is reported next to it.
+
+Scenarios are TOML files, see ``scripts/scenarios/users_mix.toml``::
+
+    uv run python -m scripts.loadtest scripts/scenarios/users_mix.toml --rate 300 --duration 60
+    # Against the app in this process, no server needed (runs the lifespan, needs the database)
+    uv run python -m scripts.loadtest scripts/scenarios/users_mix.toml --asgi src.main:app
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import random
+import time
+import tomllib
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import httpx
+
+PERCENTILES = (50, 90, 99, 99.9, 99.99)
+
+
+class Histogram:
+    """Log-linear latency histogram in microseconds, in the spirit of HdrHistogram.
+
+    Every power of two range is split in ``2 ** sub_bucket_bits`` linear buckets, so any recorded value is
+    known within ``1 / 2 ** sub_bucket_bits`` of its magnitude (0.8% with the default 7 bits) with a
+    memory footprint independent of the number of samples.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_buckets = 1 << sub_bucket_bits
+        self.counts: Counter[int] = Counter()
+        self.total = 0
+        self.min = math.inf
+        self.max = 0
+        self.sum = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_buckets:
+            return value
+        exponent = value.bit_length() - self.sub_bucket_bits
+        return (exponent << self.sub_bucket_bits) + (value >> exponent)
+
+    def _value(self, index: int) -> int:
+        """Highest value of the bucket, so percentiles are never underestimated."""
+        exponent, sub_bucket = divmod(index, self.sub_buckets)
+        if exponent == 0:
+            return sub_bucket
+        return ((sub_bucket + 1) << exponent) - 1
+
+    def record(self, value_us: float) -> None:
+        value = max(0, int(value_us))
+        self.counts[self._index(value)] += 1
+        self.total += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'Histogram') -> None:
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> int:
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(p / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            'count': self.total,
+            'min_ms': (self.min if self.total else 0) / 1000,
+            'mean_ms': (self.sum / self.total if self.total else 0) / 1000,
+            **{f'p{p}_ms': self.percentile(p) / 1000 for p in PERCENTILES},
+            'max_ms': self.max / 1000,
+        }
+
+
+@dataclass
+class RequestSpec:
+    name: str
+    path: str
+    method: str = 'GET'
+    weight: float = 1
+    # Lists are sampled per request, scalars sent as is
+    params: dict[str, Any] = field(default_factory=dict)
+    headers: dict[str, str] = field(default_factory=dict)
+
+    def build(self, rng: random.Random) -> dict[str, Any]:
+        params = {
+            key: rng.choice(value) if isinstance(value, list) else value for key, value in self.params.items()
+        }
+        return {'method': self.method, 'url': self.path, 'params': params, 'headers': self.headers}
+
+
+@dataclass
+class Scenario:
+    name: str
+    requests: list[RequestSpec]
+    base_url: str = 'http://localhost:8000'
+    rate: float = 50
+    duration: float = 30
+    warmup: float = 0
+    arrival: str = 'constant'
+    max_in_flight: int = 1000
+    timeout: float = 30
+    seed: int = 1739
+
+    @classmethod
+    def load(cls, path: str) -> 'Scenario':
+        with open(path, 'rb') as file:
+            data = tomllib.load(file)
+        requests = [RequestSpec(**spec) for spec in data.pop('requests')]
+        return cls(requests=requests, **data)
+
+
+@dataclass
+class Results:
+    latency: dict[str, Histogram] = field(default_factory=lambda: defaultdict(Histogram))
+    service_time: dict[str, Histogram] = field(default_factory=lambda: defaultdict(Histogram))
+    statuses: dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+    sent: int = 0
+    started: float = 0
+    finished: float = 0
+
+
+def arrivals(scenario: Scenario, rng: random.Random) -> Iterator[float]:
+    """Offsets in seconds from the start at which requests are due."""
+    offset = 0.0
+    end = scenario.warmup + scenario.duration
+    while offset < end:
+        yield offset
+        offset += rng.expovariate(scenario.rate) if scenario.arrival == 'poisson' else 1 / scenario.rate
+
+
+async def run(scenario: Scenario, client: httpx.AsyncClient) -> Results:
+    rng = random.Random(scenario.seed)
+    weights = [spec.weight for spec in scenario.requests]
+    slots = asyncio.Semaphore(scenario.max_in_flight)
+    results = Results()
+    tasks: set[asyncio.Task] = set()
+
+    async def fire(spec: RequestSpec, request: dict[str, Any], intended: float, measured: bool) -> None:
+        # Waiting for a slot counts in the latency, the request was due at `intended`
+        async with slots:
+            sent = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                status = str(response.status_code)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            done = time.perf_counter()
+        if measured:
+            results.latency[spec.name].record((done - intended) * 1e6)
+            results.service_time[spec.name].record((done - sent) * 1e6)
+            results.statuses[spec.name][status] += 1
+
+    start = time.perf_counter()
+    results.started = start + scenario.warmup
+    for offset in arrivals(scenario, rng):
+        intended = start + offset
+        delay = intended - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        spec = rng.choices(scenario.requests, weights=weights)[0]
+        measured = offset >= scenario.warmup
+        if measured:
+            results.sent += 1
+        task = asyncio.create_task(fire(spec, spec.build(rng), intended, measured))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    results.finished = time.perf_counter()
+    return results
+
+
+def report(scenario: Scenario, results: Results) -> dict[str, Any]:
+    total_latency, total_service = Histogram(), Histogram()
+    statuses: Counter = Counter()
+    per_request = {}
+    for name in sorted(results.latency):
+        total_latency.merge(results.latency[name])
+        total_service.merge(results.service_time[name])
+        statuses.update(results.statuses[name])
+        per_request[name] = {
+            'latency': results.latency[name].summary(),
+            'service_time': results.service_time[name].summary(),
+            'statuses': dict(results.statuses[name]),
+        }
+    elapsed = results.finished - results.started
+    ok = sum(count for status, count in statuses.items() if status.startswith('2') or status == '304')
+    return {
+        'scenario': scenario.name,
+        'target_rate': scenario.rate,
+        'arrival': scenario.arrival,
+        'duration_s': round(elapsed, 2),
+        'sent': results.sent,
+        'throughput_rps': round(results.sent / elapsed, 2) if elapsed else 0,
+        'ok_rps': round(ok / elapsed, 2) if elapsed else 0,
+        'statuses': dict(statuses),
+        'latency': total_latency.summary(),
+        'service_time': total_service.summary(),
+        'requests': per_request,
+    }
+
+
+def print_report(data: dict[str, Any]) -> None:
+    columns = ['count', 'mean_ms', *(f'p{p}_ms' for p in PERCENTILES), 'max_ms']
+    print(
+        f"{data['scenario']}: {data['sent']} requests in {data['duration_s']}s, "
+        f"{data['throughput_rps']} rps offered ({data['target_rate']} {data['arrival']}), {data['ok_rps']} rps ok"
+    )
+    print(f"statuses: {data['statuses']}")
+    print(f"{'latency (from scheduled send)':<36}" + ''.join(f'{column:>11}' for column in columns))
+    rows = [('all', data['latency'])] + [(name, value['latency']) for name, value in data['requests'].items()]
+    rows.append(('all, service time', data['service_time']))
+    for name, summary in rows:
+        print(f'{name:<36}' + f"{summary['count']:>11}" + ''.join(f'{summary[column]:>11.2f}' for column in columns[1:]))
+
+
+@asynccontextmanager
+async def make_client(scenario: Scenario, asgi: Optional[str]):
+    limits = httpx.Limits(max_connections=scenario.max_in_flight, max_keepalive_connections=scenario.max_in_flight)
+    if asgi is None:
+        async with httpx.AsyncClient(base_url=scenario.base_url, timeout=scenario.timeout, limits=limits) as client:
+            yield client
+        return
+    module, _, attribute = asgi.partition(':')
+    app = getattr(importlib.import_module(module), attribute or 'app')
+    # ASGITransport does not run the lifespan, the app needs its startup (caches, subscriptions) done
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver', timeout=scenario.timeout) as client:
+            yield client
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenario', help='Scenario TOML file')
+    parser.add_argument('--rate', type=float, help='Override the arrival rate, requests per second')
+    parser.add_argument('--duration', type=float, help='Override the measured duration, seconds')
+    parser.add_argument('--base-url', help='Override the base URL')
+    parser.add_argument('--asgi', help='Run against an ASGI app in this process, e.g. src.main:app')
+    parser.add_argument('--json', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    scenario = Scenario.load(args.scenario)
+    scenario.rate = args.rate or scenario.rate
+    scenario.duration = args.duration or scenario.duration
+    scenario.base_url = args.base_url or scenario.base_url
+    async with make_client(scenario, args.asgi) as client:
+        results = await run(scenario, client)
+    data = report(scenario, results)
+    print_report(data)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(data, file, indent=2)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,10 +1,11 @@
 import datetime
 import random
 import uuid
-from uuid import uuid4
+from typing import Union
 
 from faker import Faker  # For generating realistic-looking data
-from sqlalchemy import select
+from sqlalchemy import Connection, Table, select
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm.session import Session
 
 from src.models import Event, EventType, Registration
@@ -14,6 +15,8 @@ NUM_USERS = 100
 NUM_EVENTS = 20
 NUM_MIN_REGISTRATION = 20
 NUM_MAX_REGISTRATION = 60
+# Rows per insert transaction
+SEED_BATCH_SIZE = 500
 
 SEED = 1739
 Faker.seed(SEED)
@@ -44,8 +47,8 @@ def generate_users(num_users):
             job_title=fake.job(),
             city=fake.city(),
             state=fake.state(),
-            crm_status=random.choice(crm_statuses),
-            lead_source=random.choice(lead_sources),
+            crm_status=rd.choice(crm_statuses),
+            lead_source=rd.choice(lead_sources),
             last_activity_at=fake.date_time_between(start_date='-1y', end_date='now', tzinfo=datetime.UTC),
         )
         users.append(user)
@@ -88,33 +91,30 @@ def generate_events(num_events, users, event_types):
         return []
 
     for _ in range(num_events):
-        random_user = random.choice(users)
-        random_event_type = random.choice(event_types)
+        random_user = rd.choice(users)
+        random_event_type = rd.choice(event_types)
 
         # Randomly select a CRM user to record the event (can be None)
-        recorded_by = random.choice([*users, None])
+        recorded_by = rd.choice([*users, None])
 
         event = Event(
             id=gen_consistent_uuid(),
             owner_id=random_user.id,
-            event_type=random_event_type,
+            event_type_id=random_event_type.id,
             event_timestamp=fake.date_time_between(
                 start_date='-6m', end_date='now', tzinfo=datetime.timezone.utc
             ),
-            event_status=random.choice(event_statuses),
-            duration_minutes=random.randint(10, 120)
+            event_status=rd.choice(event_statuses),
+            duration_minutes=rd.randint(10, 120)
             if random_event_type.category in ['Sales', 'Support']
             else None,
-            notes=fake.sentence() if random.random() > 0.3 else None,  # Add notes sometimes
+            notes=fake.sentence() if rd.random() > 0.3 else None,  # Add notes sometimes
             event_details={
                 'detail_key': fake.word(),
                 'value': fake.random_int(min=1, max=100),
             },  # Simple JSON details
+            recorded_by_user_id=recorded_by.id if recorded_by else None,
         )
-        # Assign recorded_by_user if a user was chosen
-        if recorded_by:
-            event.recorded_by_user = recorded_by
-
         events.append(event)
     return events
 
@@ -122,8 +122,9 @@ def generate_events(num_events, users, event_types):
 def generate_registration(users: list[User], events: list[Event]):
     regs = []
     for event in events:
-        number_of_participant = random.randrange(NUM_MIN_REGISTRATION, NUM_MAX_REGISTRATION)
-        participants: list[User] = random.choices(users, k=number_of_participant)
+        number_of_participant = rd.randrange(NUM_MIN_REGISTRATION, NUM_MAX_REGISTRATION)
+        # Without replacement: a user registers once per event (uq_registrations_user_event)
+        participants: list[User] = rd.sample(users, k=min(number_of_participant, len(users)))
 
         for participant in participants:
             if participant.id == event.owner_id:
@@ -133,51 +134,64 @@ def generate_registration(users: list[User], events: list[Event]):
                 user_id=participant.id,
                 event_id=event.id,
                 registration_timestamp=fake.date_time_between(start_date='-1y', end_date='now'),
-                status=random.choice(['Registered', 'Attended', 'Cancelled']),
+                status=rd.choice(['Registered', 'Attended', 'Cancelled']),
             )
             regs.append(reg)
     return regs
 
 
-def seeding_data(session: Session):
-    with session.begin():
-        rec = []
-        stm = select(User.id).limit(1)
-        user_cnt = session.execute(stm).scalar_one_or_none()
-        if user_cnt is None:
-            users = generate_users(NUM_USERS)
-            rec = rec + users
-            # session.add_all(users)
-            # session.commit()
-
-        stm = select(EventType.id).limit(1)
-        event_type = session.execute(stm).scalar_one_or_none()
-        if event_type is None:
-            event_types = generate_event_types()
-            rec = rec + event_types
-            # session.add_all(event_types)
-            # session.commit()
-
-        stm = select(Event.id).limit(1)
-        event = session.execute(stm).scalar_one_or_none()
-        if event is None:
-            events = generate_events(
-                NUM_EVENTS,
-                users if len(users) > 0 else [],
-                event_types=event_types if len(event_types) > 0 else [],
-            )
-            rec = rec + events
-            # session.add_all(events)
-            # session.commit()
-
-        stm = select(Registration.id).limit(1)
-        reg = session.execute(stm).scalar_one_or_none()
-        if reg is None:
-            regs = generate_registration(
-                users if len(users) > 0 else [],
-                events=events if len(events) > 0 else [],
-            )
-            rec = rec + regs
-            # session.add_all(regs)
-        session.add_all(rec)
-        session.commit()
+def as_row(record) -> dict:
+    """Columns set on a generated record, the only ones inserted.
+
+    The seeding migration runs before the columns added by later migrations exist, an ORM flush would send
+    them as NULL.
+    """
+    columns = type(record).__table__.columns
+    return {key: value for key, value in vars(record).items() if key in columns}
+
+
+def reset_generators() -> None:
+    """Start every generator over from the seed, each run generates the same records in the same order."""
+    Faker.seed(SEED)
+    fake.unique.clear()
+    rd.seed(SEED)
+
+
+def dataset() -> list[tuple[Table, list[dict]]]:
+    """Rows of the sample dataset per table, in foreign key order.
+
+    Deterministic: the ids, and the order of the rows, are the same on every run, so an interrupted seeding
+    resumes by inserting the same rows again (``ON CONFLICT DO NOTHING``).
+    """
+    reset_generators()
+    users = generate_users(NUM_USERS)
+    event_types = generate_event_types()
+    events = generate_events(NUM_EVENTS, users, event_types=event_types)
+    regs = generate_registration(users, events=events)
+    return [
+        (model.__table__, [as_row(record) for record in records])
+        for model, records in ((User, users), (EventType, event_types), (Event, events), (Registration, regs))
+    ]
+
+
+def seeding_pending(connection: Union[Connection, Session], tables: list[tuple[Table, list[dict]]]) -> bool:
+    """Whether the sample dataset goes into this database: it has no users yet, or the sample ones of an
+    interrupted seeding."""
+    first_user_id = tables[0][1][0]['id']
+    if connection.scalar(select(User.id).limit(1)) is None:
+        return True
+    return connection.scalar(select(User.id).where(User.id == first_user_id)) is not None
+
+
+def seeding_data(session: Session, batch_size: int = SEED_BATCH_SIZE) -> None:
+    """Insert the sample dataset into a database without users, one short transaction per batch of rows."""
+    tables = dataset()
+    pending = seeding_pending(session, tables)
+    session.commit()
+    if not pending:
+        return
+    for table, rows in tables:
+        for start in range(0, len(rows), batch_size):
+            with session.begin():
+                batch = rows[start : start + batch_size]
+                session.execute(postgresql.insert(table).on_conflict_do_nothing(), batch)
@@ -0,0 +1,29 @@
+"""Helpers for conditional requests (ETag / If-None-Match)."""
+
+from typing import Optional
+
+from starlette.responses import Response
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+from src.core.config import settings
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of ``If-None-Match`` against ``etag``, as RFC 9110 requires for GET."""
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')}
+    return '*' in candidates or etag.removeprefix('W/') in candidates
+
+
+def cache_headers(etag: str, vary: str = 'Accept') -> dict[str, str]:
+    return {
+        'ETag': etag,
+        'Cache-Control': settings.USERS_CACHE_CONTROL,
+        'Vary': vary,
+    }
+
+
+def not_modified(etag: str) -> Response:
+    # A 304 must repeat the validators and caching headers the 200 would have sent
+    return Response(status_code=HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
@@ -0,0 +1,118 @@
+"""Content negotiation and compact binary encodings for list endpoints.
+
+Service to service callers can ask for ``application/msgpack`` or the Arrow IPC stream format instead of
+JSON. Both are built straight from the row tuples of the page query, without going through pydantic.
+"""
+
+import datetime
+import uuid
+from collections.abc import Sequence
+from typing import Any
+
+import msgpack
+import orjson
+import pyarrow as pa
+from sqlalchemy import ColumnElement
+from sqlalchemy.sql import sqltypes
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+SUPPORTED_MEDIA_TYPES = (JSON, MSGPACK, ARROW_STREAM)
+
+
+def negotiate(accept: str | None) -> str:
+    """Pick the media type with the highest ``q`` in the ``Accept`` header, JSON when nothing matches.
+
+    Ties go to the type listed first.
+    """
+    best, best_quality = JSON, 0.0
+    for item in (accept or '').split(','):
+        media_type, *params = (part.strip() for part in item.split(';'))
+        if media_type in ('*/*', 'application/*'):
+            media_type = JSON
+        if media_type not in SUPPORTED_MEDIA_TYPES:
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, uuid.UUID):
+        return value.bytes
+    if isinstance(value, datetime.datetime):
+        # Naive timestamps are stored in UTC
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.UTC)
+        return msgpack.Timestamp.from_datetime(value)
+    raise TypeError(f'Cannot serialize {type(value)!r}')
+
+
+def encode_msgpack(meta: dict[str, Any], key: str, fields: Sequence[str], rows: Sequence[Sequence[Any]]) -> bytes:
+    """Encode a page as a map of ``meta`` plus ``key`` -> list of row maps.
+
+    UUIDs become 16 raw bytes and datetimes the MessagePack timestamp extension type.
+    """
+    payload = {**meta, key: [dict(zip(fields, row)) for row in rows]}
+    return msgpack.packb(payload, default=_msgpack_default)
+
+
+def _arrow_type(sql_type: sqltypes.TypeEngine) -> pa.DataType | None:
+    if isinstance(sql_type, sqltypes.Uuid):
+        return pa.binary(16)
+    if isinstance(sql_type, sqltypes.DateTime):
+        # Naive values are read as UTC wall clock, aware ones are converted
+        return pa.timestamp('us', tz='UTC')
+    if isinstance(sql_type, sqltypes.Integer):
+        return pa.int64()
+    if isinstance(sql_type, sqltypes.Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, sqltypes.String):
+        return pa.string()
+    return None
+
+
+def _arrow_column(values: list[Any], arrow_type: pa.DataType | None) -> pa.Array:
+    if arrow_type == pa.binary(16):
+        values = [value.bytes if value is not None else None for value in values]
+    return pa.array(values, type=arrow_type)
+
+
+def encode_arrow(meta: dict[str, Any], columns: Sequence[ColumnElement], rows: Sequence[Sequence[Any]]) -> bytes:
+    """Encode a page as a single-batch Arrow IPC stream, one column per selected column.
+
+    Arrow types come from the SQL column types, so the schema is the same even for empty pages.
+    ``meta`` (counts, paging, facets) travels as JSON in the schema metadata.
+    """
+    schema = pa.schema(
+        [pa.field(column.key, _arrow_type(column.type) or pa.null()) for column in columns],
+        metadata={'meta': orjson.dumps(meta)},
+    )
+    values = list(zip(*rows)) if rows else [() for _ in columns]
+    batch = pa.RecordBatch.from_arrays(
+        [_arrow_column(list(column), field.type) for column, field in zip(values, schema)],
+        schema=schema,
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_page(
+    media_type: str, meta: dict[str, Any], key: str, columns: Sequence[ColumnElement], rows: Sequence[Sequence[Any]]
+) -> bytes:
+    """Encode one page of ``rows`` selected with ``columns`` in ``media_type``."""
+    if media_type == MSGPACK:
+        return encode_msgpack(meta, key, [column.key for column in columns], rows)
+    if media_type == ARROW_STREAM:
+        return encode_arrow(meta, columns, rows)
+    raise ValueError(f'Unsupported media type {media_type}')
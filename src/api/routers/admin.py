@@ -0,0 +1,131 @@
+"""Admin API endpoints: profiling of the worker serving the request.
+
+Only mounted in the environments listed in ``ADMIN_ENVIRONMENTS``. Each uvicorn worker is profiled on its
+own, every response carries the ``pid`` of the worker that answered.
+"""
+
+import os
+import secrets
+from typing import Optional
+
+from dependency_injector.wiring import Provide, inject
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from src.container import Container
+from src.core.config import Env, settings
+from src.core.logger import get_logger
+from src.core.profiling import MemoryProfiler, SamplingProfiler
+from src.schemas.exceptions.base import AuthException, BadRequestException, NotFoundException
+
+logger = get_logger(__name__)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None, description='Value of ADMIN_TOKEN')) -> None:
+    """The admin token is mandatory once configured, without one only a local environment is let in."""
+    if settings.ADMIN_TOKEN is None:
+        if settings.ENVIRONMENT is not Env.local:
+            raise AuthException('ADMIN_TOKEN is not configured')
+        return
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise AuthException('Invalid admin token')
+
+
+admin_router = APIRouter(prefix='/api/admin', tags=['Admin'], dependencies=[Depends(require_admin)])
+
+
+@admin_router.get('/profile/cpu')
+@inject
+async def profile_cpu(
+    cpu_profiler: SamplingProfiler = Depends(Provide[Container.cpu_profiler]),
+    seconds: float = Query(10, gt=0, le=120, description='How long to sample'),
+    interval_ms: float = Query(5, ge=1, le=100, description='Time between two samples'),
+    output: str = Query(
+        'collapsed',
+        pattern='^(collapsed|speedscope)$',
+        description='`collapsed` stacks (flamegraph.pl, speedscope) or a `speedscope` JSON flame graph',
+    ),
+    include_idle: bool = Query(False, description='Keep samples of threads waiting for work'),
+):
+    """
+    Samples the Python stacks of every thread of this worker for `seconds`, the event loop included.
+
+    The sampler runs in a thread of its own and only for the duration of the call.
+    """
+    try:
+        stacks = await run_in_threadpool(cpu_profiler.profile, seconds, interval_ms / 1000, include_idle)
+    except RuntimeError as exc:
+        raise BadRequestException(str(exc)) from exc
+    pid = os.getpid()
+    logger.info(f'CPU profile of {seconds}s taken, {sum(stacks.values())} samples')
+    if output == 'speedscope':
+        return ORJSONResponse(
+            cpu_profiler.speedscope(stacks, interval_ms / 1000, f'worker {pid}'),
+            headers={'X-Worker-Pid': str(pid)},
+        )
+    return PlainTextResponse(cpu_profiler.collapsed(stacks), headers={'X-Worker-Pid': str(pid)})
+
+
+@admin_router.post('/profile/memory/start')
+@inject
+async def start_memory_tracing(
+    memory_profiler: MemoryProfiler = Depends(Provide[Container.memory_profiler]),
+    frames: int = Query(1, ge=1, le=50, description='Frames stored per allocation, more is slower'),
+):
+    """Starts `tracemalloc` in this worker. Allocations are slower until it is stopped."""
+    memory_profiler.start(frames)
+    return {'pid': os.getpid(), 'tracing': memory_profiler.tracing}
+
+
+@admin_router.post('/profile/memory/stop')
+@inject
+async def stop_memory_tracing(
+    memory_profiler: MemoryProfiler = Depends(Provide[Container.memory_profiler]),
+):
+    """Stops `tracemalloc` and drops the snapshots of this worker."""
+    memory_profiler.stop()
+    return {'pid': os.getpid(), 'tracing': memory_profiler.tracing}
+
+
+@admin_router.post('/profile/memory/snapshots')
+@inject
+async def take_memory_snapshot(
+    memory_profiler: MemoryProfiler = Depends(Provide[Container.memory_profiler]),
+    group_by: str = Query('lineno', pattern='^(lineno|filename|traceback)$'),
+    limit: int = Query(30, ge=1, le=500),
+):
+    """Takes a snapshot, returns its id and the biggest allocation sites."""
+    try:
+        snapshot_id = await run_in_threadpool(memory_profiler.snapshot)
+    except RuntimeError as exc:
+        raise BadRequestException(str(exc)) from exc
+    top = await run_in_threadpool(memory_profiler.top, snapshot_id, group_by, limit)
+    return {'pid': os.getpid(), 'snapshot_id': snapshot_id, 'top': top}
+
+
+@admin_router.get('/profile/memory/snapshots')
+@inject
+async def list_memory_snapshots(
+    memory_profiler: MemoryProfiler = Depends(Provide[Container.memory_profiler]),
+):
+    return {'pid': os.getpid(), 'tracing': memory_profiler.tracing, 'snapshot_ids': memory_profiler.snapshot_ids()}
+
+
+@admin_router.get('/profile/memory/diff')
+@inject
+async def diff_memory_snapshots(
+    memory_profiler: MemoryProfiler = Depends(Provide[Container.memory_profiler]),
+    base: int = Query(..., description='Snapshot to compare from'),
+    target: Optional[int] = Query(None, description='Snapshot to compare to, a new one when omitted'),
+    group_by: str = Query('lineno', pattern='^(lineno|filename|traceback)$'),
+    limit: int = Query(30, ge=1, le=500),
+):
+    """Allocation sites that grew the most between two snapshots of this worker."""
+    try:
+        stats = await run_in_threadpool(memory_profiler.diff, base, target, group_by, limit)
+    except KeyError as exc:
+        raise NotFoundException(exc.args[0]) from exc
+    except RuntimeError as exc:
+        raise BadRequestException(str(exc)) from exc
+    return {'pid': os.getpid(), 'base': base, 'target': target, 'diff': stats}
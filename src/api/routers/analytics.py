@@ -0,0 +1,45 @@
+"""Analytics API endpoints, computed over the hot tables and the Parquet archive together."""
+
+import datetime
+import uuid
+from typing import Optional
+
+from dependency_injector.wiring import Provide, inject
+from fastapi import APIRouter, Depends, Query
+from starlette.concurrency import run_in_threadpool
+
+from src.container import Container
+from src.core.logger import get_logger
+from src.schemas.dto.analytics import MonthlyEventStats, MonthlyEventStatsResponse
+from src.schemas.exceptions.base import BadRequestException
+from src.services.archive import ArchiveService
+from src.services.reference import ReferenceDataCache
+
+analytics_router = APIRouter(prefix='/api/analytics', tags=['Analytics'])
+logger = get_logger(__name__)
+
+
+@analytics_router.get('/events/monthly', response_model=MonthlyEventStatsResponse)
+@inject
+async def monthly_event_stats(
+    archive_service: ArchiveService = Depends(Provide[Container.archive_service]),
+    reference_data: ReferenceDataCache = Depends(Provide[Container.reference_data]),
+    since: Optional[datetime.datetime] = Query(None, description='Events at or after this time'),
+    until: Optional[datetime.datetime] = Query(None, description='Events before this time'),
+):
+    """
+    Events, distinct hosts and registrations per month and event type.
+
+    Archived events are included: only the archive files overlapping `[since, until)` are read, narrow the
+    range to keep the call cheap. Live events are aggregated by the database, per month, type and host.
+    """
+    since = since.replace(tzinfo=datetime.UTC) if since and since.tzinfo is None else since
+    until = until.replace(tzinfo=datetime.UTC) if until and until.tzinfo is None else until
+    if since and until and since >= until:
+        raise BadRequestException('since must be before until')
+    rows = await run_in_threadpool(archive_service.monthly_event_stats, since, until)
+    stats = []
+    for row in rows:
+        event_type = reference_data.event_type(uuid.UUID(row['event_type_id']))
+        stats.append(MonthlyEventStats(**row, event_type_name=event_type.type_name if event_type else None))
+    return MonthlyEventStatsResponse(since=since, until=until, stats=stats)
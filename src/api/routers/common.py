@@ -1,18 +1,42 @@
 """Common API endpoints."""
 
+import datetime
+import os
+import uuid
 from typing import Optional
 
 from dependency_injector.wiring import Provide, inject
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, File, Form, Query, Request, Response, UploadFile, status
+from fastapi.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
 
 from services.user import UserService
+from src.api.caching import cache_headers, etag_matches, not_modified
+from src.api.encoders import JSON, encode_page, negotiate
+from src.api.routers.job import to_response
 from src.container import Container
+from src.core.admission import AdmissionController
+from src.core.batching import MicroBatcher
 from src.core.logger import get_logger
+from src.core.singleflight import SingleFlight
+from src.core.tracing import span
+from src.models.job import JobStatus
+from src.repos.user import FACET_FIELDS, SUGGEST_FIELDS, USER_RESPONSE_COLUMNS
+from src.schemas.dto.job import JobResponse
 from src.schemas.dto.user import (
+    DateRange,
     NumRange,
     PaginatedUsersResponse,
+    SuggestionResponse,
+    UserExportRequest,
     UserFilterCriteria,
 )
+from src.schemas.exceptions.base import BadRequestException, ConflictException, NotFoundException
+from src.services.job import JobService
+from src.services.suggestion import SuggestionService
+from src.services.user_export import EXPORT_JOB_KIND, UserExportService
+from src.services.user_import import IMPORT_JOB_KIND, UserImportService
+from src.services.user_index import UserIndex
 
 common_router = APIRouter(prefix='/api', tags=['Common'])
 logger = get_logger(__name__)
@@ -30,13 +54,59 @@ async def ping():
     return {'message': 'pong'}
 
 
+@common_router.get('/metrics')
+@inject
+async def metrics(
+    user_search_flight: SingleFlight = Depends(Provide[Container.user_search_flight]),
+    admission_controller: AdmissionController = Depends(Provide[Container.admission_controller]),
+    user_index: UserIndex = Depends(Provide[Container.user_index]),
+    registration_batcher: MicroBatcher = Depends(Provide[Container.registration_batcher]),
+):
+    """Counters of the worker serving this request."""
+    return {
+        'pid': os.getpid(),
+        'user_search_coalescing': user_search_flight.stats(),
+        'admission': admission_controller.stats(),
+        'user_index': user_index.stats(),
+        'registration_batches': registration_batcher.stats(),
+    }
+
+
 # --- Endpoint ---
+@common_router.get('/users/suggest', response_model=SuggestionResponse)
+@inject
+async def suggest_user_values(
+    suggestion_service: SuggestionService = Depends(Provide[Container.suggestion_service]),
+    field: str = Query(..., description=f"Field to autocomplete, one of {', '.join(SUGGEST_FIELDS)}"),
+    prefix: str = Query('', max_length=100, description='What the user typed so far (case-insensitive)'),
+    limit: int = Query(10, ge=1, le=50, description='Maximum number of suggestions'),
+):
+    """
+    Autocompletes company name, city, state or job title.
+
+    Served from an in-memory snapshot of the distinct values refreshed in the background, so it never
+    touches the database. Suggestions are the values starting with `prefix`, most frequent first.
+    """
+    if field not in SUGGEST_FIELDS:
+        raise BadRequestException(f'Unsupported field: {field}')
+    return SuggestionResponse(
+        field=field, prefix=prefix, suggestions=suggestion_service.suggest(field, prefix, limit)
+    )
+
+
 @common_router.get('/users', response_model=PaginatedUsersResponse)
 @inject
 async def retrieve_user(  # noqa: PLR0913
     # Since this one is too many argument, we can UserFilterCriteria as an input validator - request body
     # and change from get to post in order to support RequestModel from fastapi
+    request: Request,
+    response: Response,
     user_service: UserService = Depends(Provide[Container.user_service]),
+    q: Optional[str] = Query(
+        None,
+        max_length=200,
+        description='Full-text search over name, email, company and job title (prefix match, e.g. "jane acm")',
+    ),
     company_name: Optional[str] = Query(
         None, description='Filter by company name (case-insensitive, partial match)'
     ),
@@ -45,6 +115,7 @@ async def retrieve_user(  # noqa: PLR0913
     ),
     city: Optional[str] = Query(None, description='Filter by city (case-insensitive, partial match)'),
     state: Optional[str] = Query(None, description='Filter by state (case-insensitive, exact match)'),
+    crm_status: Optional[str] = Query(None, description="Filter by CRM status (exact match, e.g. 'Lead')"),
     min_events_hosted: Optional[int] = Query(
         None, ge=0, description='Minimum number of events hosted by the user'
     ),
@@ -57,22 +128,45 @@ async def retrieve_user(  # noqa: PLR0913
     max_events_attended: Optional[int] = Query(
         None, ge=0, description='Maximum number of events attended by the user'
     ),
+    last_activity_from: Optional[datetime.datetime] = Query(
+        None, description='Users last active at or after this time (UTC unless an offset is given)'
+    ),
+    last_activity_to: Optional[datetime.datetime] = Query(
+        None, description='Users last active before this time (UTC unless an offset is given)'
+    ),
+    created_from: Optional[datetime.datetime] = Query(
+        None, description='Users signed up at or after this time (UTC unless an offset is given)'
+    ),
+    created_to: Optional[datetime.datetime] = Query(
+        None, description='Users signed up before this time (UTC unless an offset is given)'
+    ),
     page: int = Query(1, ge=1, description='Page number for pagination'),
     page_size: int = Query(10, ge=1, le=100, description='Number of users per page'),
     page_last_id: int = Query(None, description='Last id of the page to improve pagination.'),
     sort_by: Optional[str] = Query(
-        'email',
-        description="Field to sort by (e.g., 'first_name', 'last_name', 'email', 'company_name', 'job_title', 'city', 'state', 'created_at', 'events_hosted_count', 'events_attended_count')",
-        regex='^(first_name|last_name|email|company_name|job_title|city|state|created_at|events_hosted_count|events_attended_count)$',
+        None,
+        description="Field to sort by (e.g., 'relevance', 'first_name', 'last_name', 'email', 'company_name', 'job_title', 'city', 'state', 'created_at', 'events_hosted_count', 'events_attended_count'). Defaults to 'relevance' when `q` is set, 'email' otherwise",
+        regex='^(relevance|first_name|last_name|email|company_name|job_title|city|state|created_at|events_hosted_count|events_attended_count)$',
     ),
     sort_order: Optional[str] = Query(
         'asc', description="Sort order ('asc' for ascending, 'desc' for descending)", regex='^(asc|desc)$'
     ),
+    facets: Optional[str] = Query(
+        None,
+        description=f"Comma separated fields to count users by, any of {', '.join(FACET_FIELDS)}",
+    ),
+    engine: str = Query(
+        'auto',
+        description="'auto' serves the search from the in-memory index when it can, 'sql' from Postgres",
+        pattern='^(auto|sql)$',
+    ),
 ):
     """
     Filters CRM users based on various criteria, supporting pagination and sorting.
 
     **Filtering Criteria:**
+    - `q`: Full-text search over first/last name, email, company name and job title. Every word is matched as
+      a prefix and all words must match, e.g. `jane acme`. Combined with the filters below.
     - `company_name`: Filter by company name (case-insensitive, partial match).
     - `job_title`: Filter by job title (case-insensitive, partial match).
     - `city`: Filter by city (case-insensitive, partial match).
@@ -81,17 +175,50 @@ async def retrieve_user(  # noqa: PLR0913
     - `max_events_hosted`: Filter by maximum number of events recorded/hosted by the user.
     - `min_events_attended`: Filter by minimum number of events attended/registered for by the user.
     - `max_events_attended`: Filter by maximum number of events attended/registered for by the user.
+    - `crm_status`: Filter by CRM status (exact match).
+    - `last_activity_from`, `last_activity_to`: Users last active in `[from, to)`, e.g. the last 30 days.
+      Users without any activity never match.
+    - `created_from`, `created_to`: Users signed up in `[from, to)`. Dates (`2026-01-31`) or timestamps,
+      in UTC unless they carry an offset.
 
     **Pagination:**
     - `page`: Current page number (starts from 1).
     - `page_size`: Number of results per page (max 100).
 
     **Sorting:**
-    - `sort_by`: Field to sort the results by.
+    - `sort_by`: Field to sort the results by. `relevance` ranks the `q` matches, best first.
     - `sort_order`: 'asc' for ascending (default), 'desc' for descending.
+
+    **Facets:**
+    - `facets`: e.g. `state,crm_status`. Returns the most frequent values of each field with their user count
+      for the current filters, computed in the same statement as the total count. Without filters they come
+      from a view refreshed every `FACET_REFRESH_INTERVAL_SECONDS`, the total is still counted live.
+
+    **Formats:**
+    - JSON by default. Send `Accept: application/msgpack` or `Accept: application/vnd.apache.arrow.stream`
+      for a compact binary page (ids as 16 raw bytes, native timestamps), see `src.utils.client` to decode.
+
+    **Limits:**
+    - Searches the planner expects to be very expensive (e.g. deep pages of a broad filter) are rejected with
+      `400`. When counting every match would be too slow, `total_count` is the planner's estimate and
+      `total_count_estimated` is `true`. Queries still running after `USERS_STATEMENT_TIMEOUT_MS` fail with `504`.
+
+    **Engine:**
+    - With `USERS_INDEX_ENABLED`, searches are served from an in-memory columnar copy of the users table
+      refreshed in the background, the same results without a database round trip. Full-text `q`, string sorts
+      the index cannot order like the database, and searches arriving while the copy is stale go to Postgres.
+      `engine=sql` forces Postgres. The `X-Search-Engine` response header tells which one answered.
+
+    **Caching:**
+    - Responses carry an `ETag` built from the users data version and the normalized criteria. Send it back
+      in `If-None-Match` to get an empty `304 Not Modified` while no user has been written in between.
     """
+    requested_facets = [facet.strip() for facet in facets.split(',') if facet.strip()] if facets else None
+    if requested_facets and (unknown := set(requested_facets) - set(FACET_FIELDS)):
+        raise BadRequestException(f'Unsupported facets: {", ".join(sorted(unknown))}')
 
     criteria = UserFilterCriteria(
+        q=q,
         company_name=company_name,
         job_title=job_title,
         city=city,
@@ -102,12 +229,118 @@ async def retrieve_user(  # noqa: PLR0913
         event_attended=NumRange(min_number=min_events_attended,max_number= max_events_attended)
         if min_events_attended or max_events_attended
         else None,
+        crm_status=crm_status,
+        last_activity=DateRange.between(last_activity_from, last_activity_to),
+        created=DateRange.between(created_from, created_to),
         page=page,
         page_size=page_size,
         page_last_id=page_last_id,
-        sort_by=sort_by,
+        sort_by=sort_by or ('relevance' if q else 'email'),
         sort_order=sort_order,
+        facets=list(dict.fromkeys(requested_facets)) if requested_facets else None,
     )
-    total_count, user = user_service.filter_user(criteria=criteria)
+    media_type = negotiate(request.headers.get('accept'))
+    # Picked once, the ETag and the result come from the same snapshot
+    snapshot = user_service.index_snapshot(criteria, engine)
+    engine_headers = {'X-Search-Engine': 'sql' if snapshot is None else 'memory'}
+    # Checked before the search itself, an unchanged result costs one primary key lookup
+    with span('users.etag'):
+        etag = await run_in_threadpool(user_service.user_etag, criteria, media_type, snapshot)
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return not_modified(etag)
 
-    return PaginatedUsersResponse(total_count=total_count, page=page, page_size=page_size, users=user)
+    if media_type != JSON:
+        total_count, rows, facet_counts, estimated = await user_service.search_user_rows(
+            criteria=criteria, snapshot=snapshot
+        )
+        meta = {
+            'total_count': total_count,
+            'total_count_estimated': estimated,
+            'page': page,
+            'page_size': page_size,
+            'facets': {facet: [count.model_dump() for count in counts] for facet, counts in facet_counts.items()}
+            if facet_counts
+            else None,
+        }
+        with span('users.encode', media_type=media_type, rows=len(rows)):
+            content = encode_page(media_type, meta, 'users', USER_RESPONSE_COLUMNS, rows)
+        return Response(
+            content=content,
+            media_type=media_type,
+            headers={**cache_headers(etag), **engine_headers},
+        )
+
+    response.headers.update({**cache_headers(etag), **engine_headers})
+    total_count, user, facet_counts, estimated = await user_service.search_users(
+        criteria=criteria, snapshot=snapshot
+    )
+
+    return PaginatedUsersResponse(
+        total_count=total_count,
+        total_count_estimated=estimated,
+        page=page,
+        page_size=page_size,
+        users=user,
+        facets=facet_counts,
+    )
+
+
+@common_router.post('/users/import', response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+@inject
+async def import_users(
+    file: UploadFile = File(..., description='CSV or XLSX file, the first row names the columns'),
+    sheet: Optional[str] = Form(None, description='XLSX sheet to read, the first one by default'),
+    user_import_service: UserImportService = Depends(Provide[Container.user_import_service]),
+    job_service: JobService = Depends(Provide[Container.job_service]),
+):
+    """
+    Imports users from a spreadsheet, upserting them on their email. Runs as an `import_users` background job,
+    poll `GET /api/jobs/{job_id}` for its progress and result.
+
+    **Columns:** `first_name`, `last_name` and `email` are required, `phone_number`, `company_name`,
+    `job_title`, `city`, `state`, `last_activity_at`, `crm_status` and `lead_source` optional. Headers are
+    matched case-insensitively (`First Name`, `E-mail` and a few common aliases work), other columns are
+    ignored. A blank optional cell keeps the current value of an existing user.
+
+    **Errors:** the header is checked before the job is queued (`400` with the missing columns). Invalid rows
+    do not stop the import, the job result counts them, lists the first `USERS_IMPORT_MAX_REPORTED_ERRORS`
+    with their row number and reason, and `errors_key` is the storage key of the full report (CSV).
+    """
+    payload = await user_import_service.store_upload(file, sheet)
+    job = await job_service.enqueue(IMPORT_JOB_KIND, payload)
+    return to_response(job)
+
+
+@common_router.post('/users/export', response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+@inject
+async def export_users(
+    body: UserExportRequest,
+    job_service: JobService = Depends(Provide[Container.job_service]),
+):
+    """
+    Exports the users matching the filters of `GET /api/users` to an XLSX file, with their hosted and
+    attended event counts. Runs as an `export_users` background job, its result has the `download_url` of the
+    file, valid for `USERS_EXPORT_LINK_EXPIRY_SECONDS`. Past that, `GET /api/users/exports/{job_id}/download`
+    redirects to a new one.
+    """
+    job = await job_service.enqueue(EXPORT_JOB_KIND, body.model_dump(mode='json', exclude_none=True))
+    return to_response(job)
+
+
+@common_router.get('/users/exports/{job_id}/download', status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+@inject
+async def download_user_export(
+    job_id: uuid.UUID,
+    job_service: JobService = Depends(Provide[Container.job_service]),
+    user_export_service: UserExportService = Depends(Provide[Container.user_export_service]),
+):
+    """Redirects to a fresh download link of the file of a finished export job."""
+    job = await job_service.get(job_id)
+    if job.kind != EXPORT_JOB_KIND:
+        raise NotFoundException(f'Job {job_id} is not an export')
+    if job.status != JobStatus.succeeded:
+        raise ConflictException(f'Export {job_id} is {job.status}, its file is not ready')
+    url, _ = await run_in_threadpool(user_export_service.download_link, job.result['storage_key'])
+    if url is None:
+        raise NotFoundException('The storage gives no download links, set STORAGE_LOCAL_SIGNING_KEY')
+    return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
@@ -0,0 +1,135 @@
+"""Event API endpoints."""
+
+import uuid
+from typing import Optional
+
+import orjson
+from dependency_injector.wiring import Provide, inject
+from fastapi import APIRouter, Depends, Query, status
+
+from src.container import Container
+from src.core.logger import get_logger
+from src.schemas.dto.event import EventFilterCriteria, PaginatedEventsResponse
+from src.schemas.dto.registration import (
+    EventCapacityRequest,
+    EventSeatsResponse,
+    RegistrationCreateRequest,
+    RegistrationResponse,
+)
+from src.schemas.exceptions.base import BadRequestException
+from src.services.event import EventService
+from src.services.registration import RegistrationService
+
+event_router = APIRouter(prefix='/api', tags=['Event'])
+logger = get_logger(__name__)
+
+
+@event_router.get('/events', response_model=PaginatedEventsResponse)
+@inject
+async def retrieve_event(
+    event_service: EventService = Depends(Provide[Container.event_service]),
+    owner_id: Optional[uuid.UUID] = Query(None, description='Filter by the user owning the event'),
+    event_type_id: Optional[uuid.UUID] = Query(None, description='Filter by event type'),
+    event_status: Optional[str] = Query(None, description='Filter by status (exact match)'),
+    details: Optional[str] = Query(
+        None,
+        description='JSON object event_details must contain, e.g. `{"venue": {"city": "Austin"}}`',
+    ),
+    details_has: Optional[str] = Query(
+        None,
+        description='Comma separated dotted keys that must exist in event_details, e.g. `venue.city,sponsor`',
+    ),
+    page: int = Query(1, ge=1, description='Page number for pagination'),
+    page_size: int = Query(10, ge=1, le=100, description='Number of events per page'),
+):
+    """
+    Lists events, most recent first.
+
+    Event type names and categories come from the in-memory reference data, the query never joins
+    `event_types`.
+
+    Filtering on `event_details`:
+    - `details` is a containment match (`@>`): objects match on the given keys only, arrays match when
+      they hold the given elements, scalars must be equal. Served by the GIN index on `event_details`.
+    - `details_has` requires each key path to exist whatever its value. The `jsonb_path_ops` index only
+      holds hashes of paths with their values, a bare path gives it nothing to look up and the index would
+      be read in full. Existence checks are applied to the rows left by the other filters: pair them with
+      `details` or another filter on large tables.
+    """
+    details_doc = None
+    if details:
+        try:
+            details_doc = orjson.loads(details)
+        except orjson.JSONDecodeError as exc:
+            raise BadRequestException(f'details is not valid JSON: {exc}') from exc
+        if not isinstance(details_doc, dict):
+            raise BadRequestException('details must be a JSON object')
+    paths = [path.strip() for path in details_has.split(',') if path.strip()] if details_has else None
+    if paths and any('' in path.split('.') for path in paths):
+        raise BadRequestException('details_has keys must be dotted paths without empty segments')
+
+    criteria = EventFilterCriteria(
+        owner_id=owner_id,
+        event_type_id=event_type_id,
+        event_status=event_status,
+        details=details_doc,
+        details_has=paths,
+        page=page,
+        page_size=page_size,
+    )
+    total_count, events = await event_service.filter_event(criteria=criteria)
+
+    return PaginatedEventsResponse(total_count=total_count, page=page, page_size=page_size, events=events)
+
+
+@event_router.post(
+    '/events/{event_id}/registrations',
+    response_model=RegistrationResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+@inject
+async def register_to_event(
+    event_id: uuid.UUID,
+    body: RegistrationCreateRequest,
+    registration_service: RegistrationService = Depends(Provide[Container.registration_service]),
+):
+    """
+    Registers a user to an event, 409 when the user is already registered or the event is full.
+
+    Concurrent registrations to the same event are written together, in one transaction per few
+    milliseconds per worker: a popular event opening does not queue one transaction per request on its
+    counter. The response is sent once the registration is committed.
+    """
+    return await registration_service.register(event_id, body.user_id, body.notes)
+
+
+@event_router.delete('/events/{event_id}/registrations/{user_id}', response_model=RegistrationResponse)
+@inject
+async def cancel_registration(
+    event_id: uuid.UUID,
+    user_id: uuid.UUID,
+    registration_service: RegistrationService = Depends(Provide[Container.registration_service]),
+):
+    """Cancels the registration of a user, freeing a seat. Registering again reactivates it."""
+    return await registration_service.cancel(event_id, user_id)
+
+
+@event_router.get('/events/{event_id}/capacity', response_model=EventSeatsResponse)
+@inject
+async def retrieve_event_capacity(
+    event_id: uuid.UUID,
+    registration_service: RegistrationService = Depends(Provide[Container.registration_service]),
+):
+    """Capacity of an event (`null`: no limit), its active registrations and the seats left."""
+    return await registration_service.seats(event_id)
+
+
+@event_router.put('/events/{event_id}/capacity', response_model=EventSeatsResponse)
+@inject
+async def update_event_capacity(
+    event_id: uuid.UUID,
+    body: EventCapacityRequest,
+    registration_service: RegistrationService = Depends(Provide[Container.registration_service]),
+):
+    """Sets the capacity of an event, `null` removes the limit. 409 when below the active registrations."""
+    return await registration_service.set_capacity(event_id, body.capacity)
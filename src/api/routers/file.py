@@ -0,0 +1,32 @@
+"""Downloads from the local storage backend, which has no server of its own to sign links for."""
+
+import os
+
+from dependency_injector.wiring import Provide, inject
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import FileResponse
+
+from src.container import Container
+from src.core.logger import get_logger
+from src.schemas.exceptions.base import ForbiddenException, NotFoundException
+from src.services.storage.client import StorageClient
+
+file_router = APIRouter(prefix='/api', tags=['File'])
+logger = get_logger(__name__)
+
+
+@file_router.get('/files/{key:path}')
+@inject
+async def download_file(
+    key: str,
+    expires: int = Query(..., description='Unix time the link expires at'),
+    signature: str = Query(..., description='Signature of the key and expiry'),
+    storage: StorageClient = Depends(Provide[Container.storage_client]),
+):
+    """Serves a file of the storage through a link given by the application, e.g. the one of an export."""
+    if not storage.verify_signature(key, expires, signature):
+        raise ForbiddenException('Invalid or expired download link')
+    path = storage.uri(key)
+    if not os.path.isfile(path):
+        raise NotFoundException(f'File {key} not found')
+    return FileResponse(path, filename=os.path.basename(key))
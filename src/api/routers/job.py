@@ -0,0 +1,76 @@
+"""Background job API endpoints."""
+
+import uuid
+from typing import Optional
+
+from dependency_injector.wiring import Provide, inject
+from fastapi import APIRouter, Depends, Header, status
+
+from src.api.routers.admin import require_admin
+from src.container import Container
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.models.job import Job
+from src.schemas.dto.job import JobCreateRequest, JobResponse
+from src.services.job import JobService
+
+job_router = APIRouter(prefix='/api', tags=['Job'])
+logger = get_logger(__name__)
+
+
+def to_response(job: Job) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        payload=job.payload,
+        result=job.result,
+        error=job.error,
+        progress_done=job.progress_done,
+        progress_total=job.progress_total,
+        attempts=job.attempts,
+        max_attempts=job.max_attempts,
+        cancel_requested=job.cancel_requested,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+@job_router.post('/jobs', response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+@inject
+async def create_job(
+    body: JobCreateRequest,
+    job_service: JobService = Depends(Provide[Container.job_service]),
+    x_admin_token: Optional[str] = Header(None, description='Value of ADMIN_TOKEN, for the ADMIN_JOB_KINDS'),
+):
+    """
+    Queues a background job, e.g. `{"kind": "recount_user_events"}`. Poll `GET /api/jobs/{job_id}` for its
+    progress and result. The kinds of `ADMIN_JOB_KINDS` (archiving, seeding) need the admin token.
+    """
+    if body.kind in settings.ADMIN_JOB_KINDS:
+        require_admin(x_admin_token)
+    job = await job_service.enqueue(body.kind, body.payload, body.max_attempts or 0)
+    return to_response(job)
+
+
+@job_router.get('/jobs/{job_id}', response_model=JobResponse)
+@inject
+async def retrieve_job(
+    job_id: uuid.UUID,
+    job_service: JobService = Depends(Provide[Container.job_service]),
+):
+    """Status, progress (`progress_done` out of `progress_total`), error of the last attempt and result of a job."""
+    return to_response(await job_service.get(job_id))
+
+
+@job_router.post('/jobs/{job_id}/cancel', response_model=JobResponse)
+@inject
+async def cancel_job(
+    job_id: uuid.UUID,
+    job_service: JobService = Depends(Provide[Container.job_service]),
+):
+    """
+    Cancels a job. A queued job is cancelled right away, a running one stops at its runner's next heartbeat.
+    """
+    return to_response(await job_service.cancel(job_id))
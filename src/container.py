@@ -8,18 +8,34 @@ dependencies and providing them to the application as needed.
 """
 
 from dependency_injector.containers import DeclarativeContainer, WiringConfiguration
-from dependency_injector.providers import Factory, Singleton
+from dependency_injector.providers import Dict, Factory, Singleton
 from services.user import UserService
 
+from src.core.admission import AdmissionController
+from src.core.batching import MicroBatcher
 from src.core.config import settings
 from src.core.db import Database
-from src.repos import UserRepo
+from src.core.profiling import MemoryProfiler, SamplingProfiler
+from src.core.singleflight import SingleFlight
+from src.core.snapshots import SnapshotStore
+from src.core.tasks import BackgroundTasks
+from src.repos import ArchiveRepo, EventRepo, JobRepo, RegistrationRepo, UserRepo
+from src.services.archive import ArchiveService
+from src.services.event import EventService
+from src.services.job import JobRunner, JobService
+from src.services.maintenance import MaintenanceService
+from src.services.reference import ReferenceDataCache
+from src.services.registration import RegistrationService
+from src.services.storage.client import create_storage_client
+from src.services.suggestion import SuggestionService
+from src.services.user_export import UserExportService
+from src.services.user_import import UserImportService
+from src.services.user_index import UserIndex
 # from src.services.file import FileService
 # from src.services.jdy.manpower_calculator import ManpowerCalculator
 # from src.services.jdy.update import ManpowerUpdateService
 # from src.services.metadata import MetadataService
 # from src.services.process import DataProcessingService
-# from src.services.storage.client import StorageClient
 
 
 class Container(DeclarativeContainer):
@@ -37,9 +53,17 @@ class Container(DeclarativeContainer):
             'src.services',
             'src.main',
             'src.api.routers',
+            'src.api.routers.admin',
+            'src.api.routers.analytics',
             'src.api.routers.common',
+            'src.api.routers.event',
+            'src.api.routers.file',
+            'src.api.routers.job',
             'src.api.query',
             'src.services.user',
+            'src.services.suggestion',
+            'src.services.event',
+            'src.services.job',
         ],
     )
 
@@ -49,14 +73,122 @@ class Container(DeclarativeContainer):
         async_db_url=settings.WRITER_DB_URL,
         sync_db_url=settings.SYNC_DB_URL,
     )
+    background_tasks = Singleton(BackgroundTasks)
+    admission_controller = Singleton(AdmissionController)
+    storage_client = Singleton(create_storage_client)
+    snapshot_store = Singleton(SnapshotStore, root=settings.SNAPSHOT_DIR)
+    # Idle until an admin endpoint asks for a profile
+    cpu_profiler = Singleton(SamplingProfiler)
+    memory_profiler = Singleton(MemoryProfiler)
+    # Identical concurrent user searches of this worker share one database round trip
+    user_search_flight = Singleton(SingleFlight, name='user_search')
+    # Concurrent registrations to an event on this worker share one transaction
+    registration_batcher = Singleton(
+        MicroBatcher,
+        name='registrations',
+        max_size=settings.REGISTRATION_BATCH_MAX_SIZE,
+        max_delay_ms=settings.REGISTRATION_BATCH_MAX_DELAY_MS,
+    )
 
     user_repo = Factory(
         UserRepo,
         db=db
     )
 
+    event_repo = Factory(
+        EventRepo,
+        db=db
+    )
+
+    job_repo = Factory(
+        JobRepo,
+        db=db
+    )
+
+    archive_repo = Factory(
+        ArchiveRepo,
+        db=db
+    )
+
+    registration_repo = Factory(
+        RegistrationRepo,
+        db=db
+    )
+
+    # Reference data loaded once per worker and shared by every service
+    reference_data = Singleton(
+        ReferenceDataCache,
+        event_repo=event_repo,
+        store=snapshot_store,
+    )
+
+    # Columnar snapshot of the users table, memory-mapped from the snapshot store
+    user_index = Singleton(
+        UserIndex,
+        user_repo=user_repo,
+        store=snapshot_store,
+    )
+
     # Service
     user_service = Factory(
         UserService,
-        user_repo
-    )
\ No newline at end of file
+        user_repo,
+        search_flight=user_search_flight,
+        user_index=user_index,
+    )
+    # In-memory snapshot shared by every request of this worker
+    suggestion_service = Singleton(
+        SuggestionService,
+        user_repo=user_repo,
+    )
+    event_service = Factory(
+        EventService,
+        event_repo=event_repo,
+        reference_data=reference_data,
+    )
+
+    registration_service = Factory(
+        RegistrationService,
+        registration_repo=registration_repo,
+        batcher=registration_batcher,
+    )
+
+    maintenance_service = Factory(
+        MaintenanceService,
+        user_repo=user_repo,
+    )
+    archive_service = Factory(
+        ArchiveService,
+        archive_repo=archive_repo,
+        storage=storage_client,
+    )
+    user_import_service = Factory(
+        UserImportService,
+        user_repo=user_repo,
+        storage=storage_client,
+    )
+    user_export_service = Factory(
+        UserExportService,
+        user_repo=user_repo,
+        storage=storage_client,
+    )
+
+    # Background jobs: kind -> async handler receiving a JobContext
+    job_handlers = Dict(
+        recount_user_events=maintenance_service.provided.recount_user_events,
+        seed=maintenance_service.provided.seed,
+        archive_events=archive_service.provided.archive_events,
+        import_users=user_import_service.provided.import_users,
+        export_users=user_export_service.provided.export_users,
+    )
+    job_service = Factory(
+        JobService,
+        job_repo=job_repo,
+        handlers=job_handlers,
+    )
+    job_runner = Singleton(
+        JobRunner,
+        job_repo=job_repo,
+        handlers=job_handlers,
+        concurrency=settings.JOBS_CONCURRENCY,
+    )
@@ -0,0 +1,218 @@
+"""Adaptive admission control and load shedding.
+
+Every request is sorted into a route class. Cheap endpoints (health checks, metrics) are never queued. Each
+other class has its own concurrency limit, adjusted with AIMD on the latency it observes: the limit grows
+by about one per round trip while requests finish under the latency target and shrinks by a fixed factor
+when they do not. Since these routes spend most of their time in the database, the limit follows the
+database slowing down well before callers pile up for ``DB_POOL_TIMEOUT`` seconds waiting on the pool.
+Requests that would wait longer than the class queue budget are rejected right away with ``503`` and a
+``Retry-After`` header.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import StrEnum
+
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.config import settings
+from src.core.tracing import span
+from src.schemas.base_response import BaseResponse
+from src.schemas.exceptions.base import ServiceUnavailableException
+
+
+class RouteClass(StrEnum):
+    cheap = 'cheap'
+    search = 'search'
+    heavy = 'heavy'
+
+
+@dataclass(frozen=True)
+class LimiterConfig:
+    initial_limit: int
+    min_limit: int
+    max_limit: int
+    latency_target_ms: float
+    queue_budget_ms: float
+
+
+def default_configs() -> dict[RouteClass, LimiterConfig]:
+    pool = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    return {
+        RouteClass.search: LimiterConfig(
+            initial_limit=settings.DB_POOL_SIZE,
+            min_limit=1,
+            max_limit=pool,
+            latency_target_ms=settings.ADMISSION_SEARCH_LATENCY_TARGET_MS,
+            queue_budget_ms=settings.ADMISSION_SEARCH_QUEUE_BUDGET_MS,
+        ),
+        # Heavy work gets a small share of the pool and sheds first
+        RouteClass.heavy: LimiterConfig(
+            initial_limit=max(1, pool // 10),
+            min_limit=1,
+            max_limit=max(1, pool // 4),
+            latency_target_ms=settings.ADMISSION_HEAVY_LATENCY_TARGET_MS,
+            queue_budget_ms=settings.ADMISSION_HEAVY_QUEUE_BUDGET_MS,
+        ),
+    }
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit with a FIFO queue bounded by a latency budget."""
+
+    DECREASE_FACTOR = 0.9
+    # Weight of the latest sample in the latency moving average
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, name: str, config: LimiterConfig):
+        self.name = name
+        self.config = config
+        self.limit = float(config.initial_limit)
+        self.in_flight = 0
+        self.latency_ms = config.latency_target_ms / 2
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+    def estimated_wait_ms(self) -> float:
+        """Time the next queued request would wait, from the average latency and the queue length."""
+        return (len(self._waiters) + 1) / max(self.limit, 1.0) * self.latency_ms
+
+    async def acquire(self) -> bool:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        budget_ms = self.config.queue_budget_ms
+        if self.estimated_wait_ms() > budget_ms:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=budget_ms / 1000)
+        except TimeoutError:
+            if not self._handed_over(waiter):
+                self._discard(waiter)
+                self.rejected += 1
+                return False
+        except asyncio.CancelledError:
+            # The client went away while queued, pass on the slot if it was already handed over
+            if self._handed_over(waiter):
+                self._release_slot()
+            else:
+                self._discard(waiter)
+            raise
+        # The slot was handed over by release(), in_flight already accounts for it
+        self.admitted += 1
+        return True
+
+    def release(self, latency_ms: float, ok: bool) -> None:
+        self._record(latency_ms, ok)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        while self._waiters and self.in_flight <= int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @staticmethod
+    def _handed_over(waiter: asyncio.Future) -> bool:
+        return waiter.done() and not waiter.cancelled()
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+    def _record(self, latency_ms: float, ok: bool) -> None:
+        self.latency_ms += self.EWMA_ALPHA * (latency_ms - self.latency_ms)
+        now = time.monotonic()
+        if not ok or latency_ms > self.config.latency_target_ms:
+            # At most one decrease per average round trip, one slow burst should not collapse the limit
+            if now - self._last_decrease > self.latency_ms / 1000:
+                self.limit = max(self.config.min_limit, self.limit * self.DECREASE_FACTOR)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.config.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'queued': len(self._waiters),
+            'latency_ms': round(self.latency_ms, 2),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+        }
+
+
+class AdmissionController:
+    def __init__(self, configs: dict[RouteClass, LimiterConfig] | None = None):
+        configs = configs or default_configs()
+        self.limiters = {route_class: AdaptiveLimiter(route_class, config) for route_class, config in configs.items()}
+
+    @staticmethod
+    def classify(path: str) -> RouteClass:
+        if any(path.startswith(prefix) for prefix in settings.ADMISSION_CHEAP_PATHS):
+            return RouteClass.cheap
+        if any(path.startswith(prefix) for prefix in settings.ADMISSION_HEAVY_PATHS):
+            return RouteClass.heavy
+        return RouteClass.search
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {route_class: limiter.stats() for route_class, limiter in self.limiters.items()}
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        limiter = self.controller.limiters.get(self.controller.classify(scope['path']))
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        with span('admission.wait', route_class=limiter.name):
+            admitted = await limiter.acquire()
+        if not admitted:
+            await self._reject(limiter, scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            limiter.release((time.perf_counter() - started) * 1000, ok=status < 500)  # noqa: PLR2004
+
+    @staticmethod
+    async def _reject(limiter: AdaptiveLimiter, scope: Scope, receive: Receive, send: Send) -> None:
+        retry_after = max(1, math.ceil(limiter.estimated_wait_ms() / 1000))
+        exc = ServiceUnavailableException('Server is overloaded, please retry later')
+        response = ORJSONResponse(
+            status_code=exc.error_code.value,
+            content=BaseResponse.error(exc).model_dump(),
+            headers={'Retry-After': str(retry_after)},
+        )
+        await response(scope, receive, send)
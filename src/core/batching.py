@@ -0,0 +1,84 @@
+"""Micro-batching: concurrent calls with the same key are processed together by one call."""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class MicroBatcher(Generic[T, R]):
+    """Group the items submitted for a key on this worker into batches handled by a single call.
+
+    The first item of a key waits up to ``max_delay_ms`` for others to join its batch. While a batch is being
+    processed the next one fills up and is taken as soon as the call returns, so at most one call per key is
+    in flight on this worker and a slower call makes the next batches larger instead of queueing more of them
+    (group commit). Items whose caller was cancelled before their batch was taken are dropped.
+    """
+
+    def __init__(self, name: str, max_size: int = 500, max_delay_ms: float = 5):
+        self.name = name
+        self.max_size = max_size
+        self.max_delay = max_delay_ms / 1000
+        self._pending: dict[Hashable, list[tuple[T, asyncio.Future]]] = {}
+        self._flushers: dict[Hashable, asyncio.Task] = {}
+        self.items = 0
+        self.batched = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    async def submit(
+        self, key: Hashable, item: T, fn: Callable[[Hashable, list[T]], Awaitable[list[R]]]
+    ) -> R:
+        """Result of ``item``: ``fn(key, items)`` returns one result per item, in order.
+
+        An exception raised by ``fn`` fails every item of the batch, a result that is an exception instance
+        fails its item only.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(key, []).append((item, future))
+        self.items += 1
+        if key not in self._flushers:
+            self._flushers[key] = asyncio.create_task(self._flush(key, fn))
+        return await future
+
+    async def _flush(self, key: Hashable, fn: Callable[[Hashable, list[T]], Awaitable[list[R]]]) -> None:
+        batch: list[tuple[T, asyncio.Future]] = []
+        try:
+            await asyncio.sleep(self.max_delay)
+            while pending := self._pending.get(key):
+                batch = [(item, future) for item, future in pending[: self.max_size] if not future.done()]
+                del pending[: self.max_size]
+                if not batch:
+                    continue
+                self.batches += 1
+                self.batched += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+                try:
+                    results = await fn(key, [item for item, _ in batch])
+                    if len(results) != len(batch):
+                        raise RuntimeError(f'{self.name}: {len(results)} results for {len(batch)} items')
+                except Exception as exc:
+                    results = [exc] * len(batch)
+                for (_, future), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        finally:
+            del self._flushers[key]
+            # Only left unresolved when this task was cancelled (worker shutdown)
+            for _, future in batch + self._pending.pop(key, []):
+                future.cancel()
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'items': self.items,
+            'batches': self.batches,
+            'average_batch': self.batched / self.batches if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'pending': sum(len(items) for items in self._pending.values()),
+        }
@@ -2,7 +2,7 @@
 
 import os
 from enum import StrEnum
-from typing import List
+from typing import List, Optional
 
 from pydantic import computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -44,6 +44,136 @@ class Settings(BaseSettings):
 
     # DB lock
     TRANSACTION_LOCK_ID: int = 1433
+    MIGRATION_LOCK_ID: int = 1435
+
+    # Production server (`python -m src.server`), SERVER_WORKERS=0 starts one worker per available CPU
+    SERVER_HOST: str = '0.0.0.0'
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
+    SERVER_BACKLOG: int = 2048
+    # Longer than the idle timeout of the load balancer in front, or it reuses connections being closed
+    SERVER_KEEP_ALIVE_SECONDS: int = 5
+    # Workers restart after this many requests plus a random jitter, 0 never restarts them
+    SERVER_MAX_REQUESTS: int = 10000
+    SERVER_MAX_REQUESTS_JITTER: int = 1000
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = 30
+    SERVER_RUN_MIGRATIONS: bool = True
+
+    # Admin endpoints (profiling), only mounted in these environments
+    ADMIN_ENVIRONMENTS: list[Env] = [Env.local, Env.dev]
+    ADMIN_TOKEN: Optional[str] = None
+    # Job kinds deleting or writing data in bulk, POST /api/jobs only queues them with the admin token
+    ADMIN_JOB_KINDS: list[str] = ['archive_events', 'seed']
+
+    # Per endpoint query limits, timeouts in milliseconds
+    USERS_STATEMENT_TIMEOUT_MS: int = 5000
+    USERS_LOCK_TIMEOUT_MS: int = 1000
+    EVENTS_STATEMENT_TIMEOUT_MS: int = 5000
+    EVENTS_LOCK_TIMEOUT_MS: int = 1000
+    # Planner cost limits of a user search, checked with EXPLAIN before it runs. 0 disables the check
+    USERS_MAX_PAGE_COST: float = 1_000_000
+    USERS_EXACT_COUNT_MAX_COST: float = 200_000
+
+    # Background jobs, run by the API workers when JOBS_RUN_IN_APP and/or by `python -m src.worker`
+    JOBS_RUN_IN_APP: bool = True
+    JOBS_CONCURRENCY: int = 2
+    JOBS_POLL_INTERVAL_SECONDS: float = 5
+    JOBS_HEARTBEAT_SECONDS: float = 10
+    JOBS_LEASE_SECONDS: float = 60
+    JOBS_MAX_ATTEMPTS: int = 3
+    JOBS_RETRY_BASE_SECONDS: float = 30
+    JOBS_BATCH_SIZE: int = 1000
+
+    # Request tracing, sampled traces go to a JSON lines file or an OTLP/HTTP collector
+    TRACING_ENABLED: bool = True
+    TRACING_SAMPLE_RATE: float = 0.01
+    TRACING_EXPORTER: str = 'file'  # file | otlp
+    TRACING_FILE: str = 'logs/traces.jsonl'
+    TRACING_OTLP_ENDPOINT: str = 'http://localhost:4318/v1/traces'
+    TRACING_SERVICE_NAME: str = 'supermomos-api'
+    # Traces waiting for the exporter thread, the ones past it are dropped while the exporter is behind
+    TRACING_QUEUE_SIZE: int = 1000
+    # Sampled traces slower than this get the EXPLAIN plan of their slowest statements
+    TRACING_SLOW_MS: float = 1000
+    TRACING_EXPLAIN_SLOW: bool = True
+    TRACING_EXPLAIN_MAX_STATEMENTS: int = 3
+
+    # Object storage: a local directory, or MinIO / any S3 compatible service
+    STORAGE_BACKEND: str = 'local'  # local | minio
+    STORAGE_LOCAL_ROOT: str = 'data/storage'
+    # Signs the download links of the local backend, served by /api/files. Empty disables the links, set a
+    # random secret to enable them, e.g. python -c "import secrets; print(secrets.token_hex(32))"
+    STORAGE_LOCAL_SIGNING_KEY: str = ''
+    STORAGE_BUCKET: str = 'supermomos'
+    MINIO_ENDPOINT: str = 'localhost:9000'
+    MINIO_ACCESS_KEY: str = 'minioadmin'
+    MINIO_SECRET_KEY: str = 'minioadmin'
+    MINIO_SECURE: bool = False
+    MINIO_REGION: str = 'us-east-1'
+
+    # Cold tier: events older than this move, with their registrations, to Parquet files in the storage
+    ARCHIVE_AFTER_DAYS: int = 365
+    ARCHIVE_BATCH_SIZE: int = 5000
+    ARCHIVE_PREFIX: str = 'archive'
+
+    # Admission control, per route class concurrency limits adapted to observed latency
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_CHEAP_PATHS: list[str] = ['/api/health', '/api/ping', '/api/metrics', '/api/admin']
+    ADMISSION_HEAVY_PATHS: list[str] = ['/api/analytics']
+    ADMISSION_SEARCH_LATENCY_TARGET_MS: float = 500
+    ADMISSION_SEARCH_QUEUE_BUDGET_MS: float = 1000
+    ADMISSION_HEAVY_LATENCY_TARGET_MS: float = 5000
+    ADMISSION_HEAVY_QUEUE_BUDGET_MS: float = 2000
+
+    # Facets
+    FACET_MAX_VALUES: int = 20
+    FACET_REFRESH_INTERVAL_SECONDS: int = 300
+    FACET_REFRESH_LOCK_ID: int = 1434
+
+    # HTTP caching of search results, clients may store them but must revalidate with If-None-Match
+    USERS_CACHE_CONTROL: str = 'private, no-cache'
+    # The users data version (ETags, index refresh) counts the change log, folded into its base periodically
+    DATA_VERSION_FOLD_INTERVAL_SECONDS: int = 30
+    DATA_VERSION_FOLD_LOCK_ID: int = 1436
+
+    # Typeahead
+    SUGGEST_TOP_K: int = 10
+    SUGGEST_PRECOMPUTED_PREFIX_LENGTH: int = 2
+    SUGGEST_REFRESH_INTERVAL_SECONDS: int = 30
+    SUGGEST_FULL_REBUILD_INTERVAL_SECONDS: int = 3600
+    # Re-read rows slightly older than the watermark to catch transactions that committed late
+    SUGGEST_WATERMARK_OVERLAP_SECONDS: int = 60
+
+    # Registrations, batched per event on each worker: one transaction and seats row lock per batch
+    REGISTRATION_BATCH_MAX_SIZE: int = 500
+    REGISTRATION_BATCH_MAX_DELAY_MS: float = 5
+    REGISTRATION_LOCK_TIMEOUT_MS: int = 5000
+
+    # Bulk import of users from CSV / XLSX files, validated and upserted one batch (and transaction) at a time
+    USERS_IMPORT_BATCH_SIZE: int = 5000
+    USERS_IMPORT_MAX_FILE_BYTES: int = 200 * 1024 * 1024
+    # Rejected rows returned in the job result, the full list goes to an error report in the storage
+    USERS_IMPORT_MAX_REPORTED_ERRORS: int = 100
+    USERS_IMPORT_PREFIX: str = 'imports'
+
+    # XLSX exports of users, streamed from a server-side cursor, download links valid for this long
+    USERS_EXPORT_BATCH_SIZE: int = 5000
+    USERS_EXPORT_LINK_EXPIRY_SECONDS: int = 3600
+    USERS_EXPORT_PREFIX: str = 'exports'
+
+    # Arrow snapshots published by one worker per host and memory-mapped by all of them
+    SNAPSHOT_DIR: str = 'data/snapshots'
+
+    # In-memory columnar user index, shared by the workers of a host, serving /api/users without Postgres
+    USERS_INDEX_ENABLED: bool = False
+    USERS_INDEX_REFRESH_INTERVAL_SECONDS: int = 15
+    USERS_INDEX_FULL_REBUILD_INTERVAL_SECONDS: int = 3600
+    # Searches go to SQL once the snapshot was last found up to date longer ago than this
+    USERS_INDEX_MAX_STALENESS_SECONDS: int = 60
+    USERS_INDEX_WATERMARK_OVERLAP_SECONDS: int = 60
+
+    # Reference data, reloaded periodically in case a change notification was missed
+    REFERENCE_DATA_RELOAD_INTERVAL_SECONDS: int = 600
 
     # Constants
     MAX_ALLOW_FLOAT_DIFF: float = 1e-6
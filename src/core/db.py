@@ -1,12 +1,16 @@
 """Database module."""
 
+import json
 import logging
 from collections.abc import Callable
-from contextlib import AbstractContextManager, asynccontextmanager
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, asynccontextmanager, contextmanager
 from contextvars import ContextVar, Token
 from typing import Any
 
-from sqlalchemy import create_engine
+import asyncpg
+from sqlalchemy import Executable, create_engine, func, select
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
@@ -16,10 +20,16 @@ from sqlalchemy.orm import Mapper, Session, sessionmaker
 from sqlalchemy.sql.expression import Delete, Insert, Update
 
 from src.core.config import settings
+from src.core.tracing import instrument_engine, span
 from src.models.base import Base
+from src.schemas.exceptions.base import QueryTimeoutException
 
 logger = logging.getLogger(__name__)
 
+# SQLSTATE raised when statement_timeout or lock_timeout cancels a statement
+QUERY_CANCELED = '57014'
+LOCK_NOT_AVAILABLE = '55P03'
+
 
 # Context management
 session_context: ContextVar[str] = ContextVar('session_context')
@@ -40,12 +50,48 @@ def reset_session_context(context: Token) -> None:
     session_context.reset(context)
 
 
+def timeouts(statement_timeout: int | None = None, lock_timeout: int | None = None) -> list[Executable]:
+    """Statements limiting the current transaction, timeouts in milliseconds.
+
+    ``set_config(..., true)`` is ``SET LOCAL`` with bind parameters: it ends with the transaction, so the
+    pooled connection goes back without it.
+    """
+    settings_ = {'statement_timeout': statement_timeout, 'lock_timeout': lock_timeout}
+    return [
+        select(func.set_config(name, f'{value}ms', True)) for name, value in settings_.items() if value is not None
+    ]
+
+
+def translate_error(exc: Exception) -> Exception:
+    """Turn a statement cancelled by one of the :func:`timeouts` into a :class:`QueryTimeoutException`."""
+    if isinstance(exc, DBAPIError) and getattr(exc.orig, 'pgcode', None) in (QUERY_CANCELED, LOCK_NOT_AVAILABLE):
+        return QueryTimeoutException('The query took too long, narrow down the request and try again')
+    return exc
+
+
+def explain(session: Session, stm: Executable) -> dict[str, Any]:
+    """Planner estimates for ``stm`` without running it, the top node of ``EXPLAIN (FORMAT JSON)``.
+
+    Relevant keys are ``Total Cost`` (arbitrary planner units) and ``Plan Rows``.
+    """
+    connection = session.connection()
+    compiled = stm.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    # Bind processors do not run for driver SQL, JSON objects go as text and are cast by their operator
+    params = {
+        key: json.dumps(value) if isinstance(value, dict) else value for key, value in compiled.params.items()
+    }
+    result = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', params)
+    return result.scalar_one()[0]['Plan']
+
+
 class Database:
     def __init__(
         self,
         async_db_url: str = settings.WRITER_DB_URL,
         sync_db_url: str = settings.SYNC_DB_URL,
     ) -> None:
+        self._sync_db_url = sync_db_url
+        self._listeners: list[asyncpg.Connection] = []
         self._async_engine = create_async_engine(
             async_db_url,
             pool_recycle=3600,
@@ -72,6 +118,10 @@ class Database:
             bind=self._engine,
             expire_on_commit=False,
         )
+        if settings.TRACING_ENABLED:
+            instrument_engine(self._async_engine.sync_engine)
+            # Statements of slow traces are explained with the psycopg2 engine, in its parameter style
+            instrument_engine(self._engine, explain=True)
 
     def get_routing_session(self) -> Session:
         engine = self._async_engine
@@ -93,21 +143,65 @@ class Database:
         Base.metadata.create_all(self._engine)
 
     @asynccontextmanager
-    async def session(self) -> Callable[..., AbstractContextManager[AsyncSession]]:
+    async def session(
+        self, statement_timeout: int | None = None, lock_timeout: int | None = None
+    ) -> Callable[..., AbstractContextManager[AsyncSession]]:
+        """Session on the async engine.
+
+        ``statement_timeout`` and ``lock_timeout`` (milliseconds) apply to the transaction the session starts,
+        a statement running past them fails with :class:`QueryTimeoutException`.
+        """
         session: AsyncSession = self._session_factory(expire_on_commit=False)
         try:
+            if limits := timeouts(statement_timeout, lock_timeout):
+                # Acquiring the connection begins the transaction, only done early when it is limited so
+                # callers can still open it with session.begin()
+                with span('db.pool_wait'):
+                    await session.connection()
+            for stm in limits:
+                await session.execute(stm)
             yield session
-        except Exception:
+        except Exception as exc:
             logger.exception('Session rollback because of exception')
             await session.rollback()
-            raise
+            error = translate_error(exc)
+            if error is exc:
+                raise
+            raise error from exc
         finally:
             await session.close()
 
+    async def listen(self, channel: str, callback: Callable[[str], Any]) -> asyncpg.Connection:
+        """Subscribe to a Postgres ``NOTIFY`` channel on a dedicated connection outside of the pool.
+
+        ``callback`` receives the notification payload and is called on the event loop.
+        """
+        connection = await asyncpg.connect(self._sync_db_url)
+        await connection.add_listener(channel, lambda _conn, _pid, _channel, payload: callback(payload))
+        self._listeners.append(connection)
+        return connection
+
     async def cleanup(self) -> None:
         logger.warning('Closing database connection')
+        for connection in self._listeners:
+            await connection.close()
+        self._listeners.clear()
         await self._async_engine.dispose()
         self._engine.dispose()
 
-    def sync_session(self) -> Session:
-        return self._sync_session_factory()
+    @contextmanager
+    def sync_session(self, statement_timeout: int | None = None, lock_timeout: int | None = None) -> Iterator[Session]:
+        """Session on the sync engine, same timeouts as :meth:`session`."""
+        with self._sync_session_factory() as session:
+            try:
+                if limits := timeouts(statement_timeout, lock_timeout):
+                    with span('db.pool_wait'):
+                        session.connection()
+                for stm in limits:
+                    session.execute(stm)
+                yield session
+            except Exception as exc:
+                error = translate_error(exc)
+                if error is exc:
+                    raise
+                raise error from exc
@@ -19,6 +19,7 @@ import asgi_correlation_id
 from loguru import logger
 
 from src.core.config import settings
+from src.core.tracing import current_span_id, current_trace_id
 
 
 class CustomLogger:
@@ -62,6 +63,9 @@ class CustomLogger:
         """Add correlation ID to log records."""
         correlation_id = asgi_correlation_id.context.correlation_id.get()
         record['correlation_id'] = correlation_id or 'no-correlation-id'
+        # Set on sampled requests only, joins the line to its span in the exported traces
+        if trace_id := current_trace_id():
+            record['extra'].update(trace_id=trace_id, span_id=current_span_id())
         return True
 
     @staticmethod
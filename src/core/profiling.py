@@ -0,0 +1,180 @@
+"""On-demand CPU and memory profiling of the current worker process.
+
+Nothing runs until asked: the CPU profiler is a thread sampling ``sys._current_frames()`` for the requested
+duration only, and ``tracemalloc`` is only tracing between :meth:`MemoryProfiler.start` and
+:meth:`MemoryProfiler.stop`.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import FrameType
+from typing import Any, Optional
+
+# (file name, function) of the innermost frame of threads waiting for work: the event loop in its selector,
+# idle thread pool workers. Samples of waiting threads are dropped unless asked for.
+IDLE_FRAMES = {
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+}
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f'{code.co_qualname} ({os.path.basename(code.co_filename)}:{frame.f_lineno})'
+
+
+def _is_idle(frame: FrameType) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """Statistical CPU profiler, one profile at a time per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def profile(self, seconds: float, interval: float = 0.005, include_idle: bool = False) -> Counter[str]:
+        """Sample the stacks of every other thread for ``seconds``, blocking the calling thread.
+
+        Returns:
+            Collapsed stacks: ``thread;outer frame;...;inner frame`` -> number of samples.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError('A CPU profile is already running in this worker')
+        try:
+            return self._sample(seconds, interval, include_idle)
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _sample(seconds: float, interval: float, include_idle: bool) -> Counter[str]:
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: Counter[str] = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not include_idle and _is_idle(frame)):
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, str(ident)))
+                stacks[';'.join(reversed(labels))] += 1
+            time.sleep(interval)
+        return stacks
+
+    @staticmethod
+    def collapsed(stacks: Counter[str]) -> str:
+        """Brendan Gregg's folded format, input of flamegraph.pl, speedscope, inferno..."""
+        return '\n'.join(f'{stack} {count}' for stack, count in stacks.most_common())
+
+    @staticmethod
+    def speedscope(stacks: Counter[str], interval: float, name: str) -> dict[str, Any]:
+        """Sampled profile in the speedscope file format, opens as a flame graph on https://speedscope.app."""
+        frames: dict[str, int] = {}
+        samples, weights = [], []
+        for stack, count in stacks.items():
+            samples.append([frames.setdefault(label, len(frames)) for label in stack.split(';')])
+            weights.append(count * interval)
+        total = sum(weights)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': [{'name': label} for label in frames]},
+            'profiles': [
+                {
+                    'type': 'sampled',
+                    'name': name,
+                    'unit': 'seconds',
+                    'startValue': 0,
+                    'endValue': total,
+                    'samples': samples,
+                    'weights': weights,
+                }
+            ],
+        }
+
+
+class MemoryProfiler:
+    """``tracemalloc`` snapshots kept in this worker so they can be compared later."""
+
+    # Allocations of the profiler itself
+    FILTERS = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    )
+
+    def __init__(self):
+        self._snapshots: dict[int, tracemalloc.Snapshot] = {}
+        self._next_id = 1
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        """Stop tracing and drop the snapshots, allocations are no longer slowed down."""
+        tracemalloc.stop()
+        self._snapshots.clear()
+
+    def snapshot(self) -> int:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError('Memory tracing is not started in this worker')
+        snapshot_id = self._next_id
+        self._next_id += 1
+        self._snapshots[snapshot_id] = tracemalloc.take_snapshot().filter_traces(self.FILTERS)
+        return snapshot_id
+
+    def snapshot_ids(self) -> list[int]:
+        return sorted(self._snapshots)
+
+    def top(self, snapshot_id: int, group_by: str = 'lineno', limit: int = 30) -> list[dict[str, Any]]:
+        stats = self._get(snapshot_id).statistics(group_by)
+        return [
+            {'location': self._location(stat.traceback), 'size_kb': stat.size / 1024, 'count': stat.count}
+            for stat in stats[:limit]
+        ]
+
+    def diff(
+        self, base_id: int, target_id: Optional[int] = None, group_by: str = 'lineno', limit: int = 30
+    ) -> list[dict[str, Any]]:
+        """Biggest growth from ``base_id`` to ``target_id`` (a fresh snapshot when not given)."""
+        target = self._get(target_id if target_id is not None else self.snapshot())
+        stats = target.compare_to(self._get(base_id), group_by)
+        return [
+            {
+                'location': self._location(stat.traceback),
+                'size_kb': stat.size / 1024,
+                'size_diff_kb': stat.size_diff / 1024,
+                'count': stat.count,
+                'count_diff': stat.count_diff,
+            }
+            for stat in stats[:limit]
+        ]
+
+    def _get(self, snapshot_id: int) -> tracemalloc.Snapshot:
+        try:
+            return self._snapshots[snapshot_id]
+        except KeyError:
+            raise KeyError(f'Unknown snapshot {snapshot_id}') from None
+
+    @staticmethod
+    def _location(traceback: tracemalloc.Traceback) -> str:
+        return ' <- '.join(f'{frame.filename}:{frame.lineno}' for frame in reversed(traceback))
@@ -0,0 +1,69 @@
+"""Request coalescing: concurrent calls with the same key share a single execution."""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import TypeVar
+
+T = TypeVar('T')
+
+
+@dataclass
+class _Call:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Deduplicate identical in-flight work on this worker.
+
+    The first caller for a key starts the work in its own task, callers arriving before it finishes await
+    the same task. A caller being cancelled only stops waiting; the work itself is cancelled once every
+    caller waiting on it is gone. Nothing is cached after completion, the next caller starts over.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, _Call] = {}
+        self.requests = 0
+        self.executions = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.requests += 1
+        call = self._calls.get(key)
+        if call is None:
+            self.executions += 1
+            call = _Call(task=asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._done(key, call))
+
+        call.waiters += 1
+        try:
+            # shield: cancelling this caller must not cancel the work shared with the others
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Forget it right away so a caller arriving now starts fresh work instead of a dying task
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _done(self, key: Hashable, call: _Call) -> None:
+        self._forget(key, call)
+        # Mark the exception as retrieved when every waiter was cancelled before the failure
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def stats(self) -> dict[str, float]:
+        coalesced = self.requests - self.executions
+        return {
+            'requests': self.requests,
+            'executions': self.executions,
+            'coalesced': coalesced,
+            'coalescing_ratio': coalesced / self.requests if self.requests else 0.0,
+            'in_flight': len(self._calls),
+        }
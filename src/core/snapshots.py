@@ -0,0 +1,128 @@
+"""Immutable Arrow IPC snapshots shared by the worker processes of a host.
+
+A snapshot lives in ``SNAPSHOT_DIR/<name>``: uncompressed Arrow IPC files, one per part, and a ``CURRENT``
+pointer naming the files of the latest version with its metadata. The pointer is replaced with ``os.replace``,
+so readers see either the previous or the next version, never a mix. Readers memory-map the files: the pages
+are held once by the page cache whatever the number of workers, and a new version is adopted by swapping one
+reference. Files of older versions are removed once superseded twice, mappings still open keep them readable.
+
+One process per host publishes at a time, the one holding the ``flock`` of ``.publish.lock``. The lock is
+released by the kernel when its holder dies, so another worker takes over at its next refresh.
+"""
+
+import json
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import polars as pl
+
+from src.core.logger import get_logger
+from src.utils.ids import uuid7
+
+try:
+    import fcntl
+except ImportError:  # Windows, single worker development setups
+    fcntl = None
+
+logger = get_logger(__name__)
+
+POINTER = 'CURRENT'
+PUBLISH_LOCK = '.publish.lock'
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A published version: its memory-mapped parts and the metadata given by the publisher."""
+
+    token: str
+    frames: Dict[str, pl.DataFrame]
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+class SnapshotStore:
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _dir(self, name: str) -> Path:
+        path = self.root / name
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def pointer(self, name: str) -> Optional[Dict[str, Any]]:
+        """Content of the ``CURRENT`` pointer of ``name``, ``None`` before the first publication."""
+        try:
+            return json.loads((self._dir(name) / POINTER).read_text())
+        except FileNotFoundError:
+            return None
+
+    def load(self, name: str, pointer: Optional[Dict[str, Any]] = None) -> Optional[Snapshot]:
+        """Memory-map the version ``pointer`` names, the current one by default."""
+        pointer = pointer or self.pointer(name)
+        if pointer is None:
+            return None
+        directory = self._dir(name)
+        frames = {
+            part: pl.read_ipc(directory / filename, memory_map=True)
+            for part, filename in pointer['files'].items()
+        }
+        return Snapshot(token=pointer['token'], frames=frames, meta=pointer['meta'])
+
+    def publish(self, name: str, frames: Dict[str, pl.DataFrame], meta: Dict[str, Any]) -> Snapshot:
+        """Write ``frames`` as a new version and make it current. Call it holding :meth:`publisher`."""
+        directory = self._dir(name)
+        token = str(uuid7())
+        files = {}
+        for part, frame in frames.items():
+            filename = f'{token}.{part}.arrow'
+            partial = directory / f'.{filename}.partial'
+            # Uncompressed, compressed buffers would have to be decompressed into each worker's memory
+            frame.write_ipc(partial, compression='uncompressed')
+            os.replace(partial, directory / filename)
+            files[part] = filename
+        previous = self.pointer(name)
+        pointer = {'token': token, 'files': files, 'meta': meta, 'published_at': time.time()}
+        self._write_pointer(name, pointer)
+        # Readers between reading the old pointer and mapping its files still find them
+        self._prune(name, {token, previous['token']} if previous else {token})
+        logger.info(f'Published snapshot {name} {token}')
+        return self.load(name, pointer)
+
+    def update_meta(self, name: str, **meta: Any) -> None:
+        """Merge ``meta`` into the metadata of the current version. Call it holding :meth:`publisher`."""
+        pointer = self.pointer(name)
+        if pointer is not None:
+            pointer['meta'] = {**pointer['meta'], **meta}
+            self._write_pointer(name, pointer)
+
+    def _write_pointer(self, name: str, pointer: Dict[str, Any]) -> None:
+        directory = self._dir(name)
+        partial = directory / f'.{POINTER}.partial'
+        partial.write_text(json.dumps(pointer))
+        os.replace(partial, directory / POINTER)
+
+    def _prune(self, name: str, keep: set[str]) -> None:
+        for path in self._dir(name).glob('*.arrow'):
+            if path.name.split('.', 1)[0] not in keep:
+                path.unlink(missing_ok=True)
+
+    @contextmanager
+    def publisher(self, name: str) -> Iterator[bool]:
+        """Whether this process is the publisher of ``name`` for the duration of the block, never waits."""
+        if fcntl is None:
+            yield True
+            return
+        with open(self._dir(name) / PUBLISH_LOCK, 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
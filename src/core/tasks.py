@@ -0,0 +1,38 @@
+"""Periodic background tasks running on the event loop of each worker."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+
+from src.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BackgroundTasks:
+    """Keep track of the periodic tasks started by the application lifespan."""
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def start(self, name: str, interval: float, fn: Callable[[], Awaitable[object]]) -> None:
+        """Run ``fn`` every ``interval`` seconds until :meth:`stop` is called."""
+        if name in self._tasks:
+            return
+        self._tasks[name] = asyncio.create_task(self._run(name, interval, fn), name=name)
+
+    async def stop(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    @staticmethod
+    async def _run(name: str, interval: float, fn: Callable[[], Awaitable[object]]) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await fn()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f'Background task {name} failed')
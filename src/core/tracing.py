@@ -0,0 +1,363 @@
+"""Lightweight in-process request tracing.
+
+A trace is started per sampled HTTP request by :class:`TracingMiddleware`, its id is the request's correlation
+id (or the trace id of an incoming W3C ``traceparent``) so traces and log lines can be joined. Code marks
+the work it does with :func:`span`; spans nest through a context variable, so they follow the request into
+``asyncio.to_thread`` and the services, and every SQL statement becomes a span through SQLAlchemy cursor
+events (:func:`instrument_engine`).
+
+Unsampled requests only pay for one context variable lookup per :func:`span`. Finished traces are handed
+to a background thread that writes them as JSON lines or posts them to an OTLP/HTTP collector. Traces
+slower than ``TRACING_SLOW_MS`` get the ``EXPLAIN`` plan of their slowest statements attached first.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import asgi_correlation_id
+import httpx
+from sqlalchemy import Engine, event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+_HEX32 = re.compile(r'^[0-9a-f]{32}$')
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    attributes: dict[str, Any] = field(default_factory=dict)
+    duration_ns: int = 0
+    error: Optional[str] = None
+    # Statement and parameters of database spans, kept out of the export, used for EXPLAIN
+    statement: Optional[str] = field(default=None, repr=False)
+    parameters: Any = field(default=None, repr=False)
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    spans: list[Span] = field(default_factory=list)
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar('trace', default=None)
+_span: ContextVar[Optional[Span]] = ContextVar('span', default=None)
+
+
+def _new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.trace_id if trace else None
+
+
+def current_span_id() -> Optional[str]:
+    current = _span.get()
+    return current.span_id if current else None
+
+
+def _open(trace: Trace, name: str, attributes: dict[str, Any]) -> Span:
+    parent = _span.get()
+    new = Span(
+        name=name,
+        span_id=_new_span_id(),
+        parent_id=parent.span_id if parent else None,
+        start_ns=time.time_ns(),
+        attributes=attributes,
+    )
+    # list.append is atomic, spans of the request's threads land in the same trace
+    trace.spans.append(new)
+    return new
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the enclosed block as a child of the current span, a no-op outside of a sampled trace."""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    current = _open(trace, name, attributes)
+    token = _span.set(current)
+    started = time.perf_counter_ns()
+    try:
+        yield current
+    except BaseException as exc:
+        current.error = repr(exc)
+        raise
+    finally:
+        current.duration_ns = time.perf_counter_ns() - started
+        _span.reset(token)
+
+
+# --- Database spans ---
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    trace = _trace.get()
+    if trace is None:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ''
+    current = _open(trace, f'db.{operation.lower() or "statement"}', {'db.statement': statement[:2000]})
+    if not executemany:
+        current.statement, current.parameters = statement, parameters
+    conn.info.setdefault('trace_spans', []).append((current, time.perf_counter_ns()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    pending = conn.info.get('trace_spans')
+    if not pending:
+        return
+    current, started = pending.pop()
+    current.duration_ns = time.perf_counter_ns() - started
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        current.attributes['db.rows'] = cursor.rowcount
+
+
+def _handle_error(context) -> None:
+    pending = context.connection.info.get('trace_spans') if context.connection is not None else None
+    if pending:
+        current, started = pending.pop()
+        current.duration_ns = time.perf_counter_ns() - started
+        current.error = repr(context.original_exception)
+
+
+def instrument_engine(engine: Engine, explain: bool = False) -> None:
+    """Record every statement of ``engine`` as a span of the current trace.
+
+    With ``explain`` the engine is also used to ``EXPLAIN`` the statements of slow traces, it must be the
+    engine that ran them since statements are kept in the driver's parameter style.
+    """
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+    if explain:
+        exporter.explain_engine = engine
+        exporter.explain_dialect = engine.dialect.name
+
+
+# --- Export ---
+
+
+class Exporter:
+    """Exports finished traces from a daemon thread, started with the first trace.
+
+    The queue is bounded: with the collector slow or down, traces past ``TRACING_QUEUE_SIZE`` are dropped and
+    counted in ``dropped`` instead of piling up in memory.
+    """
+
+    def __init__(self):
+        self.explain_engine: Optional[Engine] = None
+        self.explain_dialect: Optional[str] = None
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=settings.TRACING_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+
+    def submit(self, trace: Trace, duration_ms: float) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((trace, duration_ms))
+        except queue.Full:
+            self.dropped += 1
+            # Logged at 1, 2, 4, 8... drops, not once per request
+            if self.dropped & (self.dropped - 1) == 0:
+                logger.warning(f'Trace exporter behind, {self.dropped} traces dropped so far')
+
+    def _run(self) -> None:
+        while True:
+            trace, duration_ms = self._queue.get()
+            try:
+                if duration_ms >= settings.TRACING_SLOW_MS and settings.TRACING_EXPLAIN_SLOW:
+                    self._explain(trace)
+                if settings.TRACING_EXPORTER == 'otlp':
+                    self._post_otlp(trace)
+                else:
+                    self._write_file(trace)
+            except Exception:
+                logger.exception(f'Could not export trace {trace.trace_id}')
+
+    def _explain(self, trace: Trace) -> None:
+        """Attach the plan of the slowest statements, without ANALYZE so nothing runs a second time."""
+        if self.explain_engine is None:
+            return
+        candidates = sorted(
+            (
+                current
+                for current in trace.spans
+                if current.statement is not None and current.statement.lstrip()[:6].upper() == 'SELECT'
+            ),
+            key=lambda current: current.duration_ns,
+            reverse=True,
+        )[: settings.TRACING_EXPLAIN_MAX_STATEMENTS]
+        if not candidates:
+            return
+        with self.explain_engine.connect() as connection:
+            for current in candidates:
+                try:
+                    plan = connection.exec_driver_sql(
+                        f'EXPLAIN (FORMAT JSON) {current.statement}', current.parameters or {}
+                    ).scalar_one()
+                    current.attributes['db.plan'] = plan[0]['Plan']
+                except Exception as exc:
+                    # Statements of another driver or parameter style, e.g. asyncpg
+                    current.attributes['db.plan_error'] = repr(exc)
+                    connection.rollback()
+
+    @staticmethod
+    def _span_dict(trace: Trace, current: Span) -> dict[str, Any]:
+        return {
+            'trace_id': trace.trace_id,
+            'span_id': current.span_id,
+            'parent_id': current.parent_id,
+            'name': current.name,
+            'start_ns': current.start_ns,
+            'duration_ms': current.duration_ns / 1e6,
+            'error': current.error,
+            'attributes': current.attributes,
+        }
+
+    def _write_file(self, trace: Trace) -> None:
+        path = settings.TRACING_FILE
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a') as file:
+            for current in trace.spans:
+                file.write(json.dumps(self._span_dict(trace, current), default=str) + '\n')
+
+    @staticmethod
+    def _otlp_value(value: Any) -> dict[str, Any]:
+        if isinstance(value, bool):
+            return {'boolValue': value}
+        if isinstance(value, int):
+            return {'intValue': str(value)}
+        if isinstance(value, float):
+            return {'doubleValue': value}
+        if isinstance(value, str):
+            return {'stringValue': value}
+        return {'stringValue': json.dumps(value, default=str)}
+
+    def _post_otlp(self, trace: Trace) -> None:
+        """OTLP/HTTP with the JSON encoding, accepted by the OpenTelemetry collector, Jaeger, Tempo..."""
+        spans = [
+            {
+                'traceId': trace.trace_id,
+                'spanId': current.span_id,
+                **({'parentSpanId': current.parent_id} if current.parent_id else {}),
+                'name': current.name,
+                # The root is the server span, it may have a remote parent from `traceparent`
+                'kind': 2 if current is trace.spans[0] else 1,
+                'startTimeUnixNano': str(current.start_ns),
+                'endTimeUnixNano': str(current.start_ns + current.duration_ns),
+                'attributes': [
+                    {'key': key, 'value': self._otlp_value(value)} for key, value in current.attributes.items()
+                ],
+                'status': {'code': 2, 'message': current.error} if current.error else {},
+            }
+            for current in trace.spans
+        ]
+        payload = {
+            'resourceSpans': [
+                {
+                    'resource': {
+                        'attributes': [
+                            {'key': 'service.name', 'value': {'stringValue': settings.TRACING_SERVICE_NAME}},
+                            {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}},
+                        ]
+                    },
+                    'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+                }
+            ]
+        }
+        if self._client is None:
+            self._client = httpx.Client(timeout=5)
+        self._client.post(settings.TRACING_OTLP_ENDPOINT, json=payload).raise_for_status()
+
+
+exporter = Exporter()
+
+
+# --- Requests ---
+
+
+def _trace_context(scope: Scope) -> tuple[str, Optional[str], bool]:
+    """Trace id, remote parent span id and whether the caller asked for sampling."""
+    headers = dict(scope.get('headers') or [])
+    traceparent = _TRACEPARENT.match(headers.get(b'traceparent', b'').decode('latin-1').strip())
+    if traceparent:
+        trace_id, parent_id, flags = traceparent.groups()
+        return trace_id, parent_id, int(flags, 16) & 1 == 1
+    correlation_id = (asgi_correlation_id.context.correlation_id.get() or '').replace('-', '').lower()
+    return (correlation_id if _HEX32.match(correlation_id) else os.urandom(16).hex()), None, False
+
+
+class TracingMiddleware:
+    """Start a trace for a sample of the requests, the root span lasts until the response is sent."""
+
+    def __init__(self, app: ASGIApp, sample_rate: float):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        trace_id, parent_id, forced = _trace_context(scope)
+        if not forced and random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(trace_id=trace_id)
+        root = Span(
+            name=f'{scope["method"]} {scope["path"]}',
+            span_id=_new_span_id(),
+            parent_id=parent_id,
+            start_ns=time.time_ns(),
+            attributes={'http.method': scope['method'], 'http.target': scope['path']},
+        )
+        trace.spans.append(root)
+        trace_token, span_token = _trace.set(trace), _span.set(root)
+
+        async def send_wrapper(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                root.attributes['http.status_code'] = message['status']
+            await send(message)
+
+        started = time.perf_counter_ns()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as exc:
+            root.error = repr(exc)
+            raise
+        finally:
+            root.duration_ns = time.perf_counter_ns() - started
+            _span.reset(span_token)
+            _trace.reset(trace_token)
+            # Time of the root not covered by child spans: routing, validation, response serialization
+            children = sum(current.duration_ns for current in trace.spans if current.parent_id == root.span_id)
+            root.attributes['self_ms'] = max(0, root.duration_ns - children) / 1e6
+            exporter.submit(trace, root.duration_ns / 1e6)
@@ -1,19 +1,35 @@
 from contextlib import asynccontextmanager
 
 from dependency_injector.wiring import Provide, inject
+from asgi_correlation_id import CorrelationIdMiddleware
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse
 from starlette.requests import Request
 
+from src.api.routers.admin import admin_router
+from src.api.routers.analytics import analytics_router
 from src.api.routers.common import common_router
+from src.api.routers.event import event_router
+from src.api.routers.file import file_router
+from src.api.routers.job import job_router
 from src.container import Container
+from src.core.admission import AdmissionControlMiddleware
 from src.core.config import settings
 from src.core.db import Database
-from src.core.logger import setup_logging
+from src.core.logger import get_logger, setup_logging
+from src.core.tracing import TracingMiddleware
+from src.core.tasks import BackgroundTasks
 from src.custom_app import CustomAPIApp
 from src.schemas.base_response import BaseResponse
 from src.schemas.exceptions.base import AppException
+from src.services.job import JobRunner
+from src.services.reference import ReferenceDataCache
+from src.services.suggestion import SuggestionService
+from src.services.user import UserService
+from src.services.user_index import UserIndex
+
+logger = get_logger(__name__)
 
 
 @asynccontextmanager
@@ -21,6 +37,12 @@ from src.schemas.exceptions.base import AppException
 async def lifespan(
     app: CustomAPIApp,
     db: Database = Provide[Container.db],
+    background_tasks: BackgroundTasks = Provide[Container.background_tasks],
+    user_service: UserService = Provide[Container.user_service],
+    suggestion_service: SuggestionService = Provide[Container.suggestion_service],
+    user_index: UserIndex = Provide[Container.user_index],
+    reference_data: ReferenceDataCache = Provide[Container.reference_data],
+    job_runner: JobRunner = Provide[Container.job_runner],
 ):
     """Lifespan event handler for the FastAPI application.
 
@@ -31,10 +53,49 @@ async def lifespan(
     Args:
         app (CustomAPIApp): The FastAPI application instance.
         db: The database instance from the dependency injection container.
+        background_tasks: Periodic tasks of this worker, stopped before the database is closed.
+        user_service: Refreshes the precomputed user facet counts and folds the users change log.
+        suggestion_service: Typeahead snapshot, built before the first request is served.
+        user_index: Columnar users snapshot serving searches from memory when ``USERS_INDEX_ENABLED`` is set,
+            mapped from the snapshot published by one worker of the host.
+        reference_data: Event types cache, kept in sync with the database through LISTEN/NOTIFY.
+        job_runner: Executes background jobs in this worker when ``JOBS_RUN_IN_APP`` is set.
     """
     # Initialize any resources or services here if needed
+    await reference_data.load()
+    await reference_data.subscribe()
+    background_tasks.start(
+        'reload-reference-data', settings.REFERENCE_DATA_RELOAD_INTERVAL_SECONDS, reference_data.load
+    )
+    try:
+        await suggestion_service.rebuild()
+    except Exception:
+        # Serving empty suggestions beats refusing to start, the periodic refresh retries the build
+        logger.exception('Could not build the suggestion snapshot')
+    background_tasks.start(
+        'refresh-suggestions', settings.SUGGEST_REFRESH_INTERVAL_SECONDS, suggestion_service.refresh
+    )
+    if settings.USERS_INDEX_ENABLED:
+        try:
+            await user_index.load()
+        except Exception:
+            # Searches go to SQL until the periodic refresh manages to build it
+            logger.exception('Could not load the user index')
+        background_tasks.start(
+            'refresh-user-index', settings.USERS_INDEX_REFRESH_INTERVAL_SECONDS, user_index.refresh
+        )
+    background_tasks.start(
+        'refresh-user-facet-counts', settings.FACET_REFRESH_INTERVAL_SECONDS, user_service.refresh_facet_counts
+    )
+    background_tasks.start(
+        'fold-user-data-version', settings.DATA_VERSION_FOLD_INTERVAL_SECONDS, user_service.fold_data_version
+    )
+    if settings.JOBS_RUN_IN_APP:
+        await job_runner.start()
     yield
     # Cleanup code can be added here if needed
+    await job_runner.stop()
+    await background_tasks.stop()
     # Call cleanup function of injected db
     await db.cleanup()
 
@@ -48,15 +109,21 @@ def init_router(app_: FastAPI):
     Args:
         app_ (FastAPI): The FastAPI application instance.
     """
-    routers = [common_router]
+    routers = [common_router, event_router, job_router, analytics_router, file_router]
+    # Not even mounted elsewhere, like the docs
+    if settings.ENVIRONMENT in settings.ADMIN_ENVIRONMENTS:
+        routers.append(admin_router)
 
     for router in routers:
         app_.include_router(router)
 
 
-def init_middleware(app_: FastAPI):
+def init_middleware(app_: CustomAPIApp):
     """Initialize middleware for the FastAPI application."""
     # Add middleware here if needed
+    if settings.ADMISSION_CONTROL_ENABLED:
+        # Added first so it runs innermost: CORS headers are still set on the 503 it sends when shedding load
+        app_.add_middleware(AdmissionControlMiddleware, controller=app_.container.admission_controller())
     origins = [
         '*',
     ]
@@ -67,6 +134,11 @@ def init_middleware(app_: FastAPI):
         allow_methods=['*'],  # Allow all HTTP methods (GET, POST, PUT, DELETE, etc.)
         allow_headers=['*'],  # Allow all headers
     )
+    if settings.TRACING_ENABLED:
+        # Inside the correlation id middleware, traces take the request's correlation id as their id
+        app_.add_middleware(TracingMiddleware, sample_rate=settings.TRACING_SAMPLE_RATE)
+    # Outermost, every log line of the request carries its correlation id
+    app_.add_middleware(CorrelationIdMiddleware)
 
 
 def init_listeners(app_: FastAPI) -> None:
@@ -106,6 +178,9 @@ def create_app() -> CustomAPIApp:
         openapi_url='/openapi.json' if settings.ENVIRONMENT == 'local' else None,
     )
 
+    # Register the container with the app, middleware below pulls its singletons from it
+    app.container = Container()
+
     # Initialize middleware
     init_middleware(app)
 
@@ -115,9 +190,6 @@ def create_app() -> CustomAPIApp:
     # Initialize routers
     init_router(app)
 
-    # Register the container with the app
-    app.container = Container()
-
     return app
 
 
@@ -1,12 +1,21 @@
+from src.models.archive import ArchivedUserCount, ArchiveFile
 from src.models.base import Base
 from src.models.event import Event, EventType
-from src.models.registration import Registration
+from src.models.job import Job
+from src.models.registration import EventSeats, Registration
+from src.models.table_version import TableChange, TableVersion
 from src.models.user import User
 
 __all__ = [
+    'ArchiveFile',
+    'ArchivedUserCount',
     'Base',
     'Event',
+    'EventSeats',
     'EventType',
+    'Job',
     'Registration',
+    'TableChange',
+    'TableVersion',
     'User',
 ]
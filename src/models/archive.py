@@ -0,0 +1,49 @@
+import datetime
+import uuid
+
+from sqlalchemy import UUID, DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from src.models.base import Base, BaseModelWithAuditAndId
+
+
+class ArchiveFile(BaseModelWithAuditAndId):
+    """
+    SQLAlchemy model for the 'archive_files' table.
+    Manifest of the Parquet files of the cold tier. A file is part of the archive once its row is committed,
+    in the same transaction that deleted its rows from the hot table, so readers never see a row twice.
+    """
+
+    __tablename__ = 'archive_files'
+    __table_args__ = (Index('ix_archive_files_table_name_max_event_timestamp', 'table_name', 'max_event_timestamp'),)
+
+    table_name: Mapped[str] = mapped_column(String(100), nullable=False)
+    storage_key: Mapped[str] = mapped_column(String(500), nullable=False, unique=True)
+    row_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Range of the timestamps of the archived events (of their event for registrations), to prune scans
+    min_event_timestamp: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    max_event_timestamp: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<ArchiveFile(table_name='{self.table_name}', storage_key='{self.storage_key}')>"
+
+
+class ArchivedUserCount(Base):
+    """
+    SQLAlchemy model for the 'archived_user_counts' table.
+    Events hosted and attended per user that moved to the cold tier, so counters recomputed from the hot
+    tables still include them.
+    """
+
+    __tablename__ = 'archived_user_counts'
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('users.id'), primary_key=True)
+    events_hosted: Mapped[int] = mapped_column(Integer, nullable=False, server_default='0')
+    events_attended: Mapped[int] = mapped_column(Integer, nullable=False, server_default='0')
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    def __repr__(self):
+        return f"<ArchivedUserCount(user_id='{self.user_id}', hosted={self.events_hosted}, attended={self.events_attended})>"
@@ -6,6 +6,8 @@ from sqlalchemy.dialects.postgresql import TIMESTAMP
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy.sql import func
 
+from src.utils.ids import uuid7
+
 
 class Base(DeclarativeBase):
     """Base class for all models in the application.
@@ -22,13 +24,15 @@ class UUIDMixin:
     """Mixin for UUID primary key.
 
     This mixin provides a consistent UUID primary key implementation
-    across all models that need it, using PostgreSQL's gen_random_uuid() function.
+    across all models that need it. Ids are time-ordered UUIDv7 generated in Python, so new rows
+    append to the primary key index; rows inserted with raw SQL get the same from uuid_generate_v7().
     """
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID,
         primary_key=True,
-        default=text('gen_random_uuid()'),
+        default=uuid7,
+        server_default=text('uuid_generate_v7()'),
         nullable=False,
     )
 
@@ -2,15 +2,16 @@ import datetime
 import uuid
 
 from sqlalchemy import (
-    JSON,
     UUID,
     Boolean,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -40,7 +41,7 @@ class EventType(BaseModelWithAuditAndId):
     extend_existing = True
 
     def __repr__(self):
-        return f"<EventType(id='{self.event_type_id}', name='{self.type_name}', category='{self.category}')>"
+        return f"<EventType(id='{self.id}', name='{self.type_name}', category='{self.category}')>"
 
 
 class Event(BaseModelWithAuditAndId):
@@ -50,7 +51,14 @@ class Event(BaseModelWithAuditAndId):
     """
 
     __tablename__ = 'events'
-    # __table_args__ = {'extend_existing': True}  # noqa: RUF012
+    __table_args__ = (
+        Index(
+            'ix_events_event_details',
+            'event_details',
+            postgresql_using='gin',
+            postgresql_ops={'event_details': 'jsonb_path_ops'},
+        ),
+    )
 
     owner_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
     event_type_id: Mapped[uuid.UUID] = mapped_column(
@@ -60,7 +68,8 @@ class Event(BaseModelWithAuditAndId):
     event_status: Mapped[str] = mapped_column(String(50), nullable=True)
     duration_minutes: Mapped[int] = mapped_column(Integer, nullable=True)
     notes: Mapped[str] = mapped_column(Text, nullable=True)
-    event_details: Mapped[dict] = mapped_column(JSON, nullable=True)  # JSONB for PostgreSQL, JSON for others
+    # GIN indexed with jsonb_path_ops: containment (@>) and jsonpath (@?, @@) filters
+    event_details: Mapped[dict] = mapped_column(JSONB, nullable=True)
     recorded_by_user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey('users.id'), nullable=True
     )
@@ -73,4 +82,5 @@ class Event(BaseModelWithAuditAndId):
     registrations = relationship('Registration', back_populates='event', lazy=True)
 
     def __repr__(self):
-        return f"<Event(id='{self.event_id}', user_id='{self.owner_id}', type='{self.event_type.type_name if self.event_type else 'N/A'}', timestamp='{self.event_timestamp}')>"
+        # Only the foreign key, resolving event_type here would issue a lazy load (use the reference data cache)
+        return f"<Event(id='{self.id}', user_id='{self.owner_id}', type_id='{self.event_type_id}', timestamp='{self.event_timestamp}')>"
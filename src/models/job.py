@@ -0,0 +1,58 @@
+import datetime
+from enum import StrEnum
+from typing import Any, Optional
+
+from sqlalchemy import Boolean, DateTime, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from src.models.base import BaseModelWithAuditAndId
+
+
+class JobStatus(StrEnum):
+    queued = 'queued'
+    running = 'running'
+    succeeded = 'succeeded'
+    failed = 'failed'
+    cancelled = 'cancelled'
+
+
+class Job(BaseModelWithAuditAndId):
+    """
+    SQLAlchemy model for the 'jobs' table.
+    Queue of background work (maintenance, imports, exports) picked up by the job runners.
+    """
+
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Only the jobs waiting to run, the runners poll it in run_after order
+        Index(
+            'ix_jobs_queued_run_after',
+            'run_after',
+            postgresql_where=text("status = 'queued'"),
+        ),
+        Index('ix_jobs_status', 'status'),
+    )
+
+    kind: Mapped[str] = mapped_column(String(100), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default=JobStatus.queued)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False, default=dict)
+    result: Mapped[Optional[dict[str, Any]]] = mapped_column(JSONB, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    progress_done: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    progress_total: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    run_after: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    # Runner holding the job and its last sign of life, jobs of a runner that went silent are requeued
+    worker: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    heartbeat_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    started_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<Job(id='{self.id}', kind='{self.kind}', status='{self.status}')>"
@@ -3,15 +3,19 @@ import uuid
 
 from sqlalchemy import (
     UUID,
+    CheckConstraint,
     DateTime,
     ForeignKey,
+    Index,
+    Integer,
     String,
     Text,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
-from src.models.base import BaseModelWithAuditAndId
+from src.models.base import Base, BaseModelWithAuditAndId
 
 
 class Registration(BaseModelWithAuditAndId):
@@ -21,7 +25,11 @@ class Registration(BaseModelWithAuditAndId):
     """
 
     __tablename__ = 'registrations'
-    # __table_args__ = {'extend_existing': True}  # noqa: RUF012
+    __table_args__ = (
+        # A user registers once per event, a cancelled registration is reactivated instead of duplicated
+        UniqueConstraint('user_id', 'event_id', name='uq_registrations_user_event'),
+        Index('ix_registrations_event_id', 'event_id'),
+    )
 
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
     event_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('events.id'), nullable=False)
@@ -41,3 +49,32 @@ class Registration(BaseModelWithAuditAndId):
 
     def __repr__(self):
         return f"<Registration(id='{self.registration_id}', user_id='{self.user_id}', event_id='{self.event_id}', status='{self.status}')>"
+
+
+class EventSeats(Base):
+    """
+    SQLAlchemy model for the 'event_seats' table.
+    Capacity of an event and its number of active registrations, maintained by the registration API. A narrow
+    row of its own: registering a batch locks it once without touching the events row, and the check
+    constraint rejects any counter update that would over-subscribe the event. Registrations written around
+    the API do not move the counter.
+    """
+
+    __tablename__ = 'event_seats'
+    __table_args__ = (
+        CheckConstraint('registered >= 0', name='ck_event_seats_registered'),
+        CheckConstraint('capacity IS NULL OR registered <= capacity', name='ck_event_seats_capacity'),
+    )
+
+    event_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey('events.id', ondelete='CASCADE'), primary_key=True
+    )
+    # NULL: no limit, registrations are still counted
+    capacity: Mapped[int] = mapped_column(Integer, nullable=True)
+    registered: Mapped[int] = mapped_column(Integer, nullable=False, server_default='0')
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    def __repr__(self):
+        return f"<EventSeats(event_id='{self.event_id}', capacity={self.capacity}, registered={self.registered})>"
@@ -0,0 +1,39 @@
+import datetime
+
+from sqlalchemy import BigInteger, DateTime, Identity, String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from src.models.base import Base
+
+
+class TableVersion(Base):
+    """
+    SQLAlchemy model for the 'table_versions' table.
+    Change counter per table. event_types is bumped by the bump_table_version trigger on every write
+    statement, users only holds the base its table_changes are folded into.
+    """
+
+    __tablename__ = 'table_versions'
+
+    table_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default='0')
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self):
+        return f"<TableVersion(table_name='{self.table_name}', version='{self.version}')>"
+
+
+class TableChange(Base):
+    """
+    SQLAlchemy model for the 'table_changes' table.
+    One row per write statement to users, appended by the log_table_change trigger: concurrent writers do not
+    wait on each other, unlike updates of one counter row. Periodically folded into ``TableVersion``.
+    """
+
+    __tablename__ = 'table_changes'
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    table_name: Mapped[str] = mapped_column(String(100), nullable=False)
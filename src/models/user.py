@@ -1,6 +1,7 @@
 import datetime
 
-from sqlalchemy import DateTime, Integer, String
+from sqlalchemy import DateTime, Index, Integer, String
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.models.base import BaseModelWithAuditAndId
@@ -13,7 +14,14 @@ class User(BaseModelWithAuditAndId):
     """
 
     __tablename__ = 'users'
-    # __table_args__ = {'extend_existing': True}  # noqa: RUF012
+    __table_args__ = (
+        Index('ix_users_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_users_updated_at', 'updated_at'),
+        Index('ix_users_created_at', 'created_at'),
+        Index('ix_users_last_activity_at', 'last_activity_at'),
+        Index('ix_users_crm_status_last_activity_at', 'crm_status', 'last_activity_at'),
+        Index('ix_users_crm_status_created_at', 'crm_status', 'created_at'),
+    )
 
     first_name: Mapped[str] = mapped_column(String(100), nullable=False)
     last_name: Mapped[str] = mapped_column(String(100), nullable=False)
@@ -28,6 +36,8 @@ class User(BaseModelWithAuditAndId):
     lead_source: Mapped[str] = mapped_column(String(100), nullable=True)
     number_events_hosted: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
     number_events_attended: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    # Maintained by the users_search_vector_update trigger, never written by the application
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, nullable=True, deferred=True)
 
     # Define relationships
     # One User can have many Events
@@ -1,5 +1,13 @@
+from .archive import ArchiveRepo
+from .event import EventRepo
+from .job import JobRepo
+from .registration import RegistrationRepo
 from .user import UserRepo
 
 __all__ = [
+    'ArchiveRepo',
+    'EventRepo',
+    'JobRepo',
+    'RegistrationRepo',
     'UserRepo',
 ]
@@ -0,0 +1,176 @@
+import datetime
+import uuid
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import BigInteger, Delete, Insert, Select, String, Text, cast, delete, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.core.db import Database
+from src.models import ArchivedUserCount, ArchiveFile, Event, Registration
+
+# Columns written to the archive, ids and JSON as text so the Parquet files need no extension types
+ARCHIVE_EVENT_COLUMNS = (
+    cast(Event.id, String).label('id'),
+    cast(Event.owner_id, String).label('owner_id'),
+    cast(Event.event_type_id, String).label('event_type_id'),
+    Event.event_timestamp,
+    Event.event_status,
+    Event.duration_minutes,
+    Event.notes,
+    cast(Event.event_details, Text).label('event_details'),
+    cast(Event.recorded_by_user_id, String).label('recorded_by_user_id'),
+    Event.created_at,
+    Event.updated_at,
+)
+ARCHIVE_REGISTRATION_COLUMNS = (
+    cast(Registration.id, String).label('id'),
+    cast(Registration.user_id, String).label('user_id'),
+    cast(Registration.event_id, String).label('event_id'),
+    Registration.registration_timestamp,
+    # Registrations are archived with their event, and partitioned by its time
+    Event.event_timestamp,
+    Registration.status,
+    Registration.notes,
+    Registration.created_at,
+    Registration.updated_at,
+)
+
+
+def _in_range(stm: Select, since: Optional[datetime.datetime], until: Optional[datetime.datetime]) -> Select:
+    """``stm`` limited to the events with ``event_timestamp`` in ``[since, until)``."""
+    if since is not None:
+        stm = stm.where(Event.event_timestamp >= since)
+    if until is not None:
+        stm = stm.where(Event.event_timestamp < until)
+    return stm
+
+
+class ArchiveRepo:
+    def __init__(self, db: Database):
+        self.db = db
+
+    @staticmethod
+    def count_old_events(cutoff: datetime.datetime) -> Select:
+        return select(func.count()).select_from(Event).where(Event.event_timestamp < cutoff)
+
+    @staticmethod
+    def old_events(cutoff: datetime.datetime, after_id: Optional[uuid.UUID], limit: int) -> Select:
+        """Next batch of events older than ``cutoff`` in id order, locked until they are deleted."""
+        stm = (
+            select(Event.id.label('key'), *ARCHIVE_EVENT_COLUMNS)
+            .where(Event.event_timestamp < cutoff)
+            .order_by(Event.id)
+            .limit(limit)
+            .with_for_update(of=Event)
+        )
+        if after_id is not None:
+            stm = stm.where(Event.id > after_id)
+        return stm
+
+    @staticmethod
+    def registrations_of(event_ids: list[uuid.UUID]) -> Select:
+        return (
+            select(*ARCHIVE_REGISTRATION_COLUMNS)
+            .join(Event, Event.id == Registration.event_id)
+            .where(Registration.event_id.in_(event_ids))
+            .order_by(Registration.id)
+            .with_for_update(of=Registration)
+        )
+
+    @staticmethod
+    def add_archived_counts(hosted: Counter, attended: Counter) -> Optional[Insert]:
+        """Add the counts of the archived rows per user, ``None`` when there is nothing to add."""
+        rows = [
+            {'user_id': user_id, 'events_hosted': hosted[user_id], 'events_attended': attended[user_id]}
+            for user_id in hosted.keys() | attended.keys()
+        ]
+        if not rows:
+            return None
+        stm = pg_insert(ArchivedUserCount).values(rows)
+        return stm.on_conflict_do_update(
+            index_elements=[ArchivedUserCount.user_id],
+            set_={
+                'events_hosted': ArchivedUserCount.events_hosted + stm.excluded.events_hosted,
+                'events_attended': ArchivedUserCount.events_attended + stm.excluded.events_attended,
+                'updated_at': func.now(),
+            },
+        )
+
+    @staticmethod
+    def delete_registrations(event_ids: list[uuid.UUID]) -> Delete:
+        return delete(Registration).where(Registration.event_id.in_(event_ids))
+
+    @staticmethod
+    def delete_events(event_ids: list[uuid.UUID]) -> Delete:
+        return delete(Event).where(Event.id.in_(event_ids))
+
+    @staticmethod
+    def add_file(  # noqa: PLR0913
+        table_name: str,
+        storage_key: str,
+        row_count: int,
+        min_event_timestamp: datetime.datetime,
+        max_event_timestamp: datetime.datetime,
+    ) -> Insert:
+        return insert(ArchiveFile).values(
+            table_name=table_name,
+            storage_key=storage_key,
+            row_count=row_count,
+            min_event_timestamp=min_event_timestamp,
+            max_event_timestamp=max_event_timestamp,
+        )
+
+    @staticmethod
+    def files(
+        table_name: str, since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None
+    ) -> Select:
+        """Storage keys of the archive files of ``table_name`` that may hold events in ``[since, until)``."""
+        stm = select(ArchiveFile.storage_key).where(ArchiveFile.table_name == table_name).order_by(ArchiveFile.id)
+        if since is not None:
+            stm = stm.where(ArchiveFile.max_event_timestamp >= since)
+        if until is not None:
+            stm = stm.where(ArchiveFile.min_event_timestamp < until)
+        return stm
+
+    @staticmethod
+    def hot_events(since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None) -> Select:
+        return _in_range(select(*ARCHIVE_EVENT_COLUMNS), since, until)
+
+    @staticmethod
+    def hot_registrations(
+        since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None
+    ) -> Select:
+        """Registrations of the events in ``[since, until)``."""
+        stm = select(*ARCHIVE_REGISTRATION_COLUMNS).join(Event, Event.id == Registration.event_id)
+        return _in_range(stm, since, until)
+
+    @staticmethod
+    def hot_monthly_event_stats(
+        since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None
+    ) -> Select:
+        """Events, registrations and durations of the events in ``[since, until)`` per UTC month, event type
+        and host: one row per group rather than per event, hosts stay countable once merged with the archive."""
+        registrations = _in_range(
+            select(Registration.event_id, func.count().label('registrations'))
+            .join(Event, Event.id == Registration.event_id)
+            .group_by(Registration.event_id),
+            since,
+            until,
+        ).subquery()
+        month = func.to_char(func.timezone('UTC', Event.event_timestamp), 'YYYY-MM')
+        stm = (
+            select(
+                month.label('month'),
+                cast(Event.event_type_id, String).label('event_type_id'),
+                cast(Event.owner_id, String).label('owner_id'),
+                func.count().label('events'),
+                cast(func.coalesce(func.sum(registrations.c.registrations), 0), BigInteger)
+                .label('registrations'),
+                func.sum(Event.duration_minutes).label('duration_minutes'),
+                func.count(Event.duration_minutes).label('durations'),
+            )
+            .outerjoin(registrations, registrations.c.event_id == Event.id)
+            .group_by(month, Event.event_type_id, Event.owner_id)
+        )
+        return _in_range(stm, since, until)
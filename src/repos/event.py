@@ -0,0 +1,52 @@
+import json
+
+from sqlalchemy import Select, func, select
+
+from src.core.db import Database
+from src.models import Event, EventType, TableVersion
+from src.schemas.dto.event import EventFilterCriteria
+
+
+class EventRepo:
+    def __init__(self, db: Database):
+        self.db = db
+
+    def retrieve_event_using_criteria(self, criteria: EventFilterCriteria) -> Select:
+        # No join on event_types, type names are attached from the reference data cache
+        stm = select(Event)
+        if criteria.owner_id:
+            stm = stm.where(Event.owner_id == criteria.owner_id)
+        if criteria.event_type_id:
+            stm = stm.where(Event.event_type_id == criteria.event_type_id)
+        if criteria.event_status:
+            stm = stm.where(Event.event_status == criteria.event_status)
+        if criteria.details:
+            stm = stm.where(Event.event_details.contains(criteria.details))
+        for path in criteria.details_has or []:
+            stm = stm.where(Event.event_details.path_exists(EventRepo.details_path(path)))
+        return stm
+
+    @staticmethod
+    def details_path(path: str) -> str:
+        """jsonpath of a dotted key path, keys are quoted so any character is taken literally.
+
+        ``'venue.city'`` -> ``$."venue"."city"``
+        """
+        return '$' + ''.join(f'.{json.dumps(key)}' for key in path.split('.'))
+
+    @staticmethod
+    def count(stm: Select) -> Select:
+        return select(func.count()).select_from(stm.subquery())
+
+    @staticmethod
+    def data_range(stm: Select, limit: int, offset: int) -> Select:
+        return stm.order_by(Event.event_timestamp.desc(), Event.id).limit(limit).offset(offset)
+
+    @staticmethod
+    def event_types() -> Select:
+        return select(EventType)
+
+    @staticmethod
+    def event_types_version() -> Select:
+        """Change counter of the event_types table, bumped on every write statement."""
+        return select(TableVersion.version).where(TableVersion.table_name == EventType.__tablename__)
@@ -0,0 +1,119 @@
+import datetime
+import uuid
+from typing import Any, Optional
+
+from sqlalchemy import Insert, Select, Update, case, func, insert, select, update
+
+from src.core.db import Database
+from src.models.job import Job, JobStatus
+
+# Notified on every enqueue so idle runners wake up before their next poll
+JOBS_CHANNEL = 'jobs_enqueued'
+
+
+class JobRepo:
+    def __init__(self, db: Database):
+        self.db = db
+
+    @staticmethod
+    def enqueue(kind: str, payload: dict[str, Any], max_attempts: int) -> Insert:
+        return insert(Job).values(kind=kind, payload=payload, max_attempts=max_attempts).returning(Job)
+
+    @staticmethod
+    def notify_enqueued(kind: str) -> Select:
+        return select(func.pg_notify(JOBS_CHANNEL, kind))
+
+    @staticmethod
+    def get(job_id: uuid.UUID) -> Select:
+        return select(Job).where(Job.id == job_id)
+
+    @staticmethod
+    def dequeue(worker: str, kinds: list[str]) -> Update:
+        """Claim the next due job, ``SKIP LOCKED`` lets concurrent runners claim different jobs without waiting."""
+        next_job = (
+            select(Job.id)
+            .where(Job.status == JobStatus.queued, Job.run_after <= func.now(), Job.kind.in_(kinds))
+            .order_by(Job.run_after)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        return (
+            update(Job)
+            .where(Job.id == next_job)
+            .values(
+                status=JobStatus.running,
+                attempts=Job.attempts + 1,
+                worker=worker,
+                started_at=func.now(),
+                heartbeat_at=func.now(),
+                error=None,
+            )
+            .returning(Job)
+        )
+
+    @staticmethod
+    def heartbeat(job_id: uuid.UUID, worker: str, done: int, total: Optional[int]) -> Update:
+        """Record progress and renew the lease, returns whether cancellation was requested."""
+        return (
+            update(Job)
+            .where(Job.id == job_id, Job.worker == worker, Job.status == JobStatus.running)
+            .values(heartbeat_at=func.now(), progress_done=done, progress_total=total)
+            .returning(Job.cancel_requested)
+        )
+
+    @staticmethod
+    def finish(job_id: uuid.UUID, worker: str, status: JobStatus, **values: Any) -> Update:
+        return (
+            update(Job)
+            .where(Job.id == job_id, Job.worker == worker, Job.status == JobStatus.running)
+            .values(status=status, finished_at=func.now(), heartbeat_at=func.now(), **values)
+        )
+
+    @staticmethod
+    def retry(job_id: uuid.UUID, worker: str, error: str, delay: datetime.timedelta) -> Update:
+        return (
+            update(Job)
+            .where(Job.id == job_id, Job.worker == worker, Job.status == JobStatus.running)
+            .values(status=JobStatus.queued, error=error, worker=None, run_after=func.now() + delay)
+        )
+
+    @staticmethod
+    def release(job_id: uuid.UUID, worker: str) -> Update:
+        """Give a job back to the queue without counting the attempt, used when a runner shuts down."""
+        return (
+            update(Job)
+            .where(Job.id == job_id, Job.worker == worker, Job.status == JobStatus.running)
+            .values(status=JobStatus.queued, worker=None, attempts=Job.attempts - 1)
+        )
+
+    @staticmethod
+    def requeue_expired(lease: datetime.timedelta) -> Update:
+        """Jobs whose runner stopped heartbeating are retried, or failed once out of attempts."""
+        out_of_attempts = Job.attempts >= Job.max_attempts
+        return (
+            update(Job)
+            .where(Job.status == JobStatus.running, Job.heartbeat_at < func.now() - lease)
+            .values(
+                status=case((out_of_attempts, JobStatus.failed), else_=JobStatus.queued),
+                finished_at=case((out_of_attempts, func.now()), else_=None),
+                error='The runner executing the job stopped responding',
+                worker=None,
+            )
+            .returning(Job.id)
+        )
+
+    @staticmethod
+    def request_cancel(job_id: uuid.UUID) -> Update:
+        """Queued jobs are cancelled right away, running ones are flagged and stopped by their runner."""
+        queued = Job.status == JobStatus.queued
+        return (
+            update(Job)
+            .where(Job.id == job_id, Job.status.in_([JobStatus.queued, JobStatus.running]))
+            .values(
+                status=case((queued, JobStatus.cancelled), else_=Job.status),
+                finished_at=case((queued, func.now()), else_=Job.finished_at),
+                cancel_requested=True,
+            )
+            .returning(Job)
+        )
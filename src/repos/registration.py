@@ -0,0 +1,149 @@
+import uuid
+from typing import Optional
+
+from sqlalchemy import (
+    UUID,
+    Boolean,
+    DateTime,
+    Insert,
+    Select,
+    TextualSelect,
+    Update,
+    exists,
+    func,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.core.db import Database
+from src.models import Event, EventSeats, Registration, User
+
+CANCELLED = 'Cancelled'
+REGISTERED = 'Registered'
+
+
+class RegistrationRepo:
+    def __init__(self, db: Database):
+        self.db = db
+
+    @staticmethod
+    def event_exists(event_id: uuid.UUID) -> Select:
+        return select(exists().where(Event.id == event_id))
+
+    @staticmethod
+    def seats(event_id: uuid.UUID, lock: bool = False) -> Select:
+        stm = select(EventSeats.capacity, EventSeats.registered).where(EventSeats.event_id == event_id)
+        return stm.with_for_update() if lock else stm
+
+    @staticmethod
+    def active_count(event_id: uuid.UUID) -> Select:
+        return (
+            select(func.count())
+            .select_from(Registration)
+            .where(Registration.event_id == event_id, Registration.status != CANCELLED)
+        )
+
+    @staticmethod
+    def create_seats(event_id: uuid.UUID) -> Insert:
+        """Seats row of an event, counting the registrations it already has. No-op when it exists."""
+        return (
+            pg_insert(EventSeats)
+            .values(event_id=event_id, registered=RegistrationRepo.active_count(event_id).scalar_subquery())
+            .on_conflict_do_nothing(index_elements=[EventSeats.event_id])
+        )
+
+    @staticmethod
+    def update_seats(event_id: uuid.UUID, registered_delta: int = 0, **values) -> Update:
+        return (
+            update(EventSeats)
+            .where(EventSeats.event_id == event_id)
+            .values(registered=EventSeats.registered + registered_delta, updated_at=func.now(), **values)
+            .returning(EventSeats.capacity, EventSeats.registered)
+        )
+
+    @staticmethod
+    def register(
+        event_id: uuid.UUID, user_ids: list[uuid.UUID], notes: list[Optional[str]], seats: Optional[int]
+    ) -> TextualSelect:
+        """Register the existing users of ``user_ids`` not already registered, in order, at most ``seats``.
+
+        A cancelled registration is reactivated. Returns the registrations written, ``inserted`` is false for
+        the reactivated ones. ``seats=None`` registers them all.
+        """
+        return text(
+            """
+            WITH requested AS (
+                SELECT r.user_id, r.notes, r.position
+                FROM unnest(CAST(:user_ids AS uuid[]), CAST(:notes AS text[]))
+                    WITH ORDINALITY AS r(user_id, notes, position)
+                JOIN users u ON u.id = r.user_id
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM registrations x
+                    WHERE x.user_id = r.user_id
+                        AND x.event_id = CAST(:event_id AS uuid)
+                        AND x.status <> :cancelled
+                )
+                ORDER BY r.position
+                LIMIT :seats
+            )
+            INSERT INTO registrations (user_id, event_id, status, notes)
+            SELECT user_id, CAST(:event_id AS uuid), :registered, notes FROM requested ORDER BY position
+            ON CONFLICT (user_id, event_id) DO UPDATE SET
+                status = excluded.status,
+                notes = excluded.notes,
+                registration_timestamp = now(),
+                updated_at = now()
+            WHERE registrations.status = :cancelled
+            RETURNING id, user_id, registration_timestamp, xmax = 0 AS inserted
+            """
+        ).bindparams(
+            event_id=event_id,
+            user_ids=user_ids,
+            notes=notes,
+            seats=seats,
+            cancelled=CANCELLED,
+            registered=REGISTERED,
+        ).columns(
+            id=UUID(as_uuid=True),
+            user_id=UUID(as_uuid=True),
+            registration_timestamp=DateTime(timezone=True),
+            inserted=Boolean,
+        )
+
+    @staticmethod
+    def registration_states(event_id: uuid.UUID, user_ids: list[uuid.UUID]) -> Select:
+        """Which of ``user_ids`` exist, and whether they hold an active registration to the event."""
+        active = exists().where(
+            Registration.user_id == User.id,
+            Registration.event_id == event_id,
+            Registration.status != CANCELLED,
+        )
+        return select(User.id, active.label('registered')).where(User.id.in_(user_ids))
+
+    @staticmethod
+    def add_attended(user_ids: list[uuid.UUID]) -> Update:
+        """Count one more attended event for each of ``user_ids``.
+
+        Rows are locked in id order first, so batches of different events sharing users cannot deadlock.
+        """
+        locked = select(User.id).where(User.id.in_(user_ids)).order_by(User.id).with_for_update()
+        return (
+            update(User)
+            .where(User.id.in_(locked))
+            .values(number_events_attended=User.number_events_attended + 1)
+        )
+
+    @staticmethod
+    def cancel(event_id: uuid.UUID, user_id: uuid.UUID) -> Update:
+        return (
+            update(Registration)
+            .where(
+                Registration.event_id == event_id,
+                Registration.user_id == user_id,
+                Registration.status != CANCELLED,
+            )
+            .values(status=CANCELLED)
+            .returning(Registration.id, Registration.registration_timestamp)
+        )
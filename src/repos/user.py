@@ -1,10 +1,123 @@
+import re
+import uuid
 from typing import Optional
-from sqlalchemy import and_, select, text, true
-from sqlalchemy.orm import Query
+
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    String,
+    TextClause,
+    Update,
+    cast,
+    func,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.orm import InstrumentedAttribute, Query
 
 from src.core.db import Database
-from src.models import User
-from src.schemas.dto.user import UserFilterCriteria
+from src.models import ArchivedUserCount, Event, Registration, TableChange, TableVersion, User
+from src.schemas.dto.user import DateRange, NumRange, UserFilterCriteria
+
+# Columns the search box autocompletes
+SUGGEST_FIELDS = ('company_name', 'city', 'state', 'job_title')
+# Columns the filter UI can request counts for
+FACET_FIELDS = ('state', 'crm_status', 'lead_source', 'company_name')
+
+SORT_COLUMNS = {
+    'first_name': User.first_name,
+    'last_name': User.last_name,
+    'email': User.email,
+    'company_name': User.company_name,
+    'job_title': User.job_title,
+    'city': User.city,
+    'state': User.state,
+    'created_at': User.created_at,
+    'events_hosted_count': User.number_events_hosted,
+    'events_attended_count': User.number_events_attended,
+}
+# Columns of a search result row, labelled after the UserBase fields
+USER_RESPONSE_COLUMNS = (
+    User.id.label('user_id'),
+    User.first_name,
+    User.last_name,
+    User.email,
+    User.company_name,
+    User.job_title,
+    User.city,
+    User.state,
+    User.crm_status,
+    User.created_at,
+    User.last_activity_at,
+)
+# Columns of the in-memory user index: what the filters, sorts and facets read, plus the response columns
+USER_INDEX_COLUMNS = (
+    cast(User.id, String).label('id'),
+    User.first_name,
+    User.last_name,
+    User.email,
+    User.company_name,
+    User.job_title,
+    User.city,
+    User.state,
+    User.crm_status,
+    User.lead_source,
+    User.created_at,
+    User.last_activity_at,
+    User.number_events_hosted,
+    User.number_events_attended,
+    User.updated_at,
+)
+# Columns of a users export, labelled after the spreadsheet headers
+USER_EXPORT_COLUMNS = (
+    cast(User.id, String).label('user_id'),
+    User.first_name,
+    User.last_name,
+    User.email,
+    User.phone_number,
+    User.company_name,
+    User.job_title,
+    User.city,
+    User.state,
+    User.crm_status,
+    User.lead_source,
+    User.last_activity_at,
+    User.created_at,
+    User.number_events_hosted.label('events_hosted'),
+    User.number_events_attended.label('events_attended'),
+)
+# Columns a users import file can fill, with their maximum length (None for timestamps)
+IMPORT_COLUMNS = {
+    'first_name': 100,
+    'last_name': 100,
+    'email': 255,
+    'phone_number': 100,
+    'company_name': 255,
+    'job_title': 100,
+    'city': 100,
+    'state': 100,
+    'last_activity_at': None,
+    'crm_status': 100,
+    'lead_source': 100,
+}
+IMPORT_REQUIRED = ('first_name', 'last_name', 'email')
+IMPORT_STAGING = 'users_import_staging'
+SORT_BY_RELEVANCE = 'relevance'
+# Must match the text search configuration used by the users_search_vector_update trigger
+SEARCH_CONFIG = 'simple'
+
+
+def to_prefix_tsquery(q: str) -> Optional[str]:
+    """Turn free text into a tsquery where every word is a prefix, e.g. ``jane acm`` -> ``jane:* & acm:*``.
+
+    Only word characters are kept so user input can never inject tsquery operators.
+    """
+    words = re.findall(r'\w+', q.lower())
+    if not words:
+        return None
+    return ' & '.join(f'{word}:*' for word in words)
 
 
 class UserRepo:
@@ -13,6 +126,10 @@ class UserRepo:
 
     def retrieve_user_using_criteria(self, criteria: UserFilterCriteria) -> Query:
         stm = Query(User)
+        # --- Full-text search over name, email, company and job title, served by the GIN index ---
+        tsquery = self.search_query(criteria.q)
+        if tsquery is not None:
+            stm = stm.filter(User.search_vector.op('@@')(tsquery))
         # --- Apply Text Filters (case-insensitive, partial match) ---
         # We can go with == operator with exact match, or migrate to ES for better perf for i-like search
         if criteria.company_name:
@@ -22,25 +139,264 @@ class UserRepo:
         if criteria.city:
             stm = stm.filter(User.city.ilike(f'%{criteria.city}%'))
         if criteria.state:
-            stm = stm.filter(User.state.ilike(criteria))
+            stm = stm.filter(User.state.ilike(criteria.state))
+        # Exact match, so (crm_status, last_activity_at) and (crm_status, created_at) serve status segments
+        if criteria.crm_status:
+            stm = stm.filter(User.crm_status == criteria.crm_status)
+        # --- Date ranges ---
+        stm = stm.filter(*self.date_range_filters(User.last_activity_at, criteria.last_activity))
+        # created_at is a naive UTC timestamp
+        stm = stm.filter(*self.date_range_filters(User.created_at, criteria.created, naive=True))
         # In order to maintain consistency for min_number, max_number. An update on user's analytics data when they
         # register for an event is need. Since the cost of group by and count when querying maybe a huge problem
-        if criteria.event_hosted:
-            if criteria.event_hosted.min_number:
-                stm = stm.filter(User.number_events_hosted > criteria.event_hosted.min_number)
-            if criteria.event_hosted.max_number:
-                stm = stm.filter(User.number_events_hosted < criteria.event_hosted.max_number)
-
-        if criteria.event_attended:
-            if criteria.event_attended.min_number:
-                stm = stm.filter(User.number_events_attended > criteria.event_attended.min_number)
-            if criteria.event_attended.max_number:
-                stm = stm.filter(User.number_events_attended < criteria.event_attended.max_number)
+        stm = stm.filter(*self.num_range_filters(User.number_events_hosted, criteria.event_hosted))
+        stm = stm.filter(*self.num_range_filters(User.number_events_attended, criteria.event_attended))
         return stm
 
-    def data_range(self, stm: Query, limit: int, offset: int, sort_by: str, sort_order: str) -> Query:  # noqa: F821
+    @staticmethod
+    def date_range_filters(
+        column: InstrumentedAttribute, date_range: Optional[DateRange], naive: bool = False
+    ) -> list[ColumnElement]:
+        """Conditions of ``date_range`` on ``column``, start inclusive and end exclusive."""
+        if date_range is None:
+            return []
+        start, end = date_range.start, date_range.end
+        if naive:
+            start = start and start.replace(tzinfo=None)
+            end = end and end.replace(tzinfo=None)
+        filters = []
+        if start:
+            filters.append(column >= start)
+        if end:
+            filters.append(column < end)
+        return filters
+
+    @staticmethod
+    def num_range_filters(column: InstrumentedAttribute, num_range: Optional[NumRange]) -> list[ColumnElement]:
+        """Conditions of ``num_range`` on ``column``, both bounds exclusive."""
+        if num_range is None:
+            return []
+        filters = []
+        if num_range.min_number:
+            filters.append(column > num_range.min_number)
+        if num_range.max_number:
+            filters.append(column < num_range.max_number)
+        return filters
+
+    @staticmethod
+    def search_query(q: Optional[str]) -> Optional[ColumnElement]:
+        tsquery = to_prefix_tsquery(q) if q else None
+        if tsquery is None:
+            return None
+        return func.to_tsquery(SEARCH_CONFIG, tsquery)
+
+    def data_range(  # noqa: PLR0913
+        self, stm: Query, limit: int, offset: int, sort_by: str, sort_order: str, q: Optional[str] = None
+    ) -> Query:
         # Since it was just an simple assignment. I dont want to spend too much time on this once so I go with the naive
         # approach using offset & limit. We can enhance it using keyset pagination
-        stm = stm.order_by(text(f'{sort_by} {sort_order}'))
+        tsquery = self.search_query(q)
+        if sort_by == SORT_BY_RELEVANCE and tsquery is not None:
+            # Best match first whatever the sort order, like any search engine
+            order = func.ts_rank(User.search_vector, tsquery).desc()
+        else:
+            column = SORT_COLUMNS.get(sort_by, User.email)
+            order = column.desc() if sort_order == 'desc' else column.asc()
+        # id breaks ties so pages do not overlap when the sort key has duplicates
+        stm = stm.order_by(order, User.id)
         stm = stm.limit(limit).offset(offset)
         return stm
+
+    def export_rows(self, criteria: UserFilterCriteria) -> Select:
+        """Every user matching ``criteria``, :data:`USER_EXPORT_COLUMNS` in the search order, unpaginated."""
+        query = self.retrieve_user_using_criteria(criteria)
+        ordered = self.data_range(query, None, 0, criteria.sort_by, criteria.sort_order, criteria.q)
+        return ordered.with_entities(*USER_EXPORT_COLUMNS).statement
+
+    @staticmethod
+    def count_of(stm: Select) -> Select:
+        return select(func.count()).select_from(stm.order_by(None).subquery())
+
+    def facet_counts(self, stm: Query, facets: list[str], max_values: int) -> Select:
+        """Count users per value of every requested facet in a single statement.
+
+        The filtered users are grouped with ``GROUPING SETS`` so each facet gets its own set, plus the empty
+        set ``()`` which yields the total count and lets the caller skip the separate count query.
+        Only the ``max_values`` most frequent values are kept per facet.
+        """
+        sub = stm.subquery()
+        columns = [sub.c[facet] for facet in facets]
+        groupings = [func.grouping(column).label(f'g_{facet}') for facet, column in zip(facets, columns)]
+        rank = (
+            func.row_number()
+            .over(partition_by=[func.grouping(column) for column in columns], order_by=func.count().desc())
+            .label('rn')
+        )
+        grouped = (
+            select(*columns, *groupings, func.count().label('cnt'), rank)
+            .group_by(func.grouping_sets(*columns, text('()')))
+            .subquery()
+        )
+        return select(grouped).where(grouped.c.rn <= max_values)
+
+    def precomputed_facet_counts(self, facets: list[str], max_values: int) -> TextClause:
+        """Read facet counts of the whole users table from the ``user_facet_counts`` materialized view."""
+        return text(
+            """
+            SELECT facet, value, cnt
+            FROM (
+                SELECT facet, value, cnt, row_number() OVER (PARTITION BY facet ORDER BY cnt DESC) AS rn
+                FROM user_facet_counts
+                WHERE facet = ANY(:facets)
+            ) ranked
+            WHERE rn <= :max_values
+            """
+        ).bindparams(facets=facets, max_values=max_values)
+
+    @staticmethod
+    def refresh_facet_counts() -> TextClause:
+        return text('REFRESH MATERIALIZED VIEW CONCURRENTLY user_facet_counts')
+
+    @staticmethod
+    def value_counts(field: str, values: Optional[list[str]] = None) -> Select:
+        """Number of users per distinct non-null value of ``field``, optionally restricted to ``values``."""
+        column = getattr(User, field)
+        stm = select(column, func.count()).where(column.is_not(None)).group_by(column)
+        if values is not None:
+            stm = stm.where(column.in_(values))
+        return stm
+
+    @staticmethod
+    def values_updated_since(field: str, since) -> Select:
+        column = getattr(User, field)
+        return select(column).distinct().where(User.updated_at > since, column.is_not(None))
+
+    @staticmethod
+    def max_updated_at() -> Select:
+        return select(func.max(User.updated_at))
+
+    @staticmethod
+    def data_version() -> Select:
+        """Change counter of the users table, moved by every committed write statement.
+
+        The folded base plus the changes logged since, read in one statement: a concurrent fold is seen whole
+        or not at all, and the sum stays the same across it.
+        """
+        pending = (
+            select(func.count())
+            .select_from(TableChange)
+            .where(TableChange.table_name == User.__tablename__)
+            .scalar_subquery()
+        )
+        return select(TableVersion.version + pending).where(TableVersion.table_name == User.__tablename__)
+
+    @staticmethod
+    def fold_changes() -> TextClause:
+        """Move the logged changes of users into the base of its version, which keeps its value."""
+        return text(
+            """
+            WITH folded AS (DELETE FROM table_changes WHERE table_name = 'users' RETURNING id)
+            UPDATE table_versions SET version = version + (SELECT count(*) FROM folded), updated_at = now()
+            WHERE table_name = 'users'
+            """
+        )
+
+    @staticmethod
+    def index_rows(since=None) -> Select:
+        """Rows of the in-memory user index, only those updated after ``since`` when given."""
+        stm = select(*USER_INDEX_COLUMNS)
+        if since is not None:
+            stm = stm.where(User.updated_at > since)
+        return stm
+
+    @staticmethod
+    def count_all() -> Select:
+        return select(func.count()).select_from(User)
+
+    @staticmethod
+    def sorted_strings(values: list[str]) -> TextClause:
+        """``values`` sorted by the database's default collation, the one the user columns sort by."""
+        return text('SELECT array_agg(v ORDER BY v) FROM unnest(CAST(:values AS text[])) AS v').bindparams(
+            values=values
+        )
+
+    @staticmethod
+    def id_batch(after_id: Optional[uuid.UUID], limit: int) -> Select:
+        """Next ``limit`` user ids after ``after_id`` in primary key order, for keyed batches."""
+        stm = select(User.id).order_by(User.id).limit(limit)
+        if after_id is not None:
+            stm = stm.where(User.id > after_id)
+        return stm
+
+    @staticmethod
+    def recount_events(ids: list[uuid.UUID]) -> Update:
+        """Recompute the hosted/attended counters of ``ids`` from events, registrations and the archived counts.
+
+        Users whose counters are already right are not written, so no new row version or updated_at change.
+        """
+        hosted = select(func.count()).select_from(Event).where(Event.owner_id == User.id).scalar_subquery()
+        attended = (
+            select(func.count()).select_from(Registration).where(Registration.user_id == User.id).scalar_subquery()
+        )
+        # Plus what moved to the cold tier
+        archived = select(ArchivedUserCount).where(ArchivedUserCount.user_id == User.id)
+        hosted = hosted + func.coalesce(archived.with_only_columns(ArchivedUserCount.events_hosted).scalar_subquery(), 0)
+        attended = attended + func.coalesce(
+            archived.with_only_columns(ArchivedUserCount.events_attended).scalar_subquery(), 0
+        )
+        return (
+            update(User)
+            .where(
+                User.id.in_(ids),
+                or_(User.number_events_hosted != hosted, User.number_events_attended != attended),
+            )
+            .values(number_events_hosted=hosted, number_events_attended=attended)
+        )
+
+    @staticmethod
+    def create_import_staging() -> TextClause:
+        """Staging table of one import batch, private to the session and dropped at commit."""
+        columns = ', '.join(
+            f'{name} {"text" if length else "timestamptz"}{" NOT NULL" if name in IMPORT_REQUIRED else ""}'
+            for name, length in IMPORT_COLUMNS.items()
+        )
+        return text(f'CREATE TEMP TABLE {IMPORT_STAGING} ({columns}) ON COMMIT DROP')
+
+    @staticmethod
+    def copy_import_staging() -> str:
+        """``COPY`` loading CSV rows, in the :data:`IMPORT_COLUMNS` order, into the staging table."""
+        return f'COPY {IMPORT_STAGING} ({", ".join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)'
+
+    @staticmethod
+    def insert_from_import_staging() -> TextClause:
+        """Insert the staged users whose email is new, :meth:`update_from_import_staging` updates the others.
+
+        ``ON CONFLICT DO NOTHING`` waits for a concurrent insert of the same email and skips it, the update
+        statement that follows sees it.
+        """
+        columns = ', '.join(IMPORT_COLUMNS)
+        values = ', '.join(
+            "coalesce(crm_status, 'Lead')" if name == 'crm_status' else name for name in IMPORT_COLUMNS
+        )
+        return text(
+            f'INSERT INTO users ({columns}, number_events_hosted, number_events_attended) '
+            f'SELECT {values}, 0, 0 FROM {IMPORT_STAGING} '
+            'ON CONFLICT (email) DO NOTHING'
+        )
+
+    @staticmethod
+    def update_from_import_staging() -> TextClause:
+        """Update the existing users from the staged rows, a blank optional value keeps the current one.
+
+        Users the rows would not change, including those just inserted, are not written.
+        """
+        names = [name for name in IMPORT_COLUMNS if name != 'email']
+        staged = [
+            f's.{name}' if name in IMPORT_REQUIRED else f'coalesce(s.{name}, u.{name})' for name in names
+        ]
+        assignments = ', '.join(f'{name} = {value}' for name, value in zip(names, staged))
+        current = ', '.join(f'u.{name}' for name in names)
+        return text(
+            f'UPDATE users u SET {assignments}, updated_at = now() FROM {IMPORT_STAGING} s '
+            f'WHERE u.email = s.email AND ({current}) IS DISTINCT FROM ({", ".join(staged)})'
+        )
@@ -0,0 +1,20 @@
+import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class MonthlyEventStats(BaseModel):
+    month: str
+    event_type_id: str
+    event_type_name: Optional[str] = None
+    events: int
+    hosts: int
+    registrations: int
+    avg_duration_minutes: Optional[float] = None
+
+
+class MonthlyEventStatsResponse(BaseModel):
+    since: Optional[datetime.datetime] = None
+    until: Optional[datetime.datetime] = None
+    stats: List[MonthlyEventStats]
@@ -0,0 +1,49 @@
+import datetime
+import uuid
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class EventTypeRecord(BaseModel):
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+
+    id: uuid.UUID
+    type_name: str
+    description: Optional[str] = None
+    category: Optional[str] = None
+    is_active: bool
+
+
+class EventBase(BaseModel):
+    event_id: uuid.UUID
+    owner_id: uuid.UUID
+    event_type_id: uuid.UUID
+    event_type_name: Optional[str] = None
+    event_type_category: Optional[str] = None
+    event_timestamp: datetime.datetime
+    event_status: Optional[str] = None
+    duration_minutes: Optional[int] = None
+    notes: Optional[str] = None
+    event_details: Optional[Dict[str, Any]] = None
+    recorded_by_user_id: Optional[uuid.UUID] = None
+    created_at: datetime.datetime
+
+
+class PaginatedEventsResponse(BaseModel):
+    total_count: int
+    page: int
+    page_size: int
+    events: List[EventBase]
+
+
+class EventFilterCriteria(BaseModel):
+    owner_id: Optional[uuid.UUID] = None
+    event_type_id: Optional[uuid.UUID] = None
+    event_status: Optional[str] = None
+    # event_details must contain this document
+    details: Optional[Dict[str, Any]] = None
+    # Dotted key paths that must exist in event_details, e.g. 'venue.city'
+    details_has: Optional[List[str]] = None
+    page_size: Optional[int] = 10
+    page: Optional[int] = 1
@@ -0,0 +1,28 @@
+import datetime
+import uuid
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+
+class JobCreateRequest(BaseModel):
+    kind: str
+    payload: Dict[str, Any] = Field(default_factory=dict)
+    max_attempts: Optional[int] = Field(None, ge=1, le=10)
+
+
+class JobResponse(BaseModel):
+    job_id: uuid.UUID
+    kind: str
+    status: str
+    payload: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    progress_done: int
+    progress_total: Optional[int] = None
+    attempts: int
+    max_attempts: int
+    cancel_requested: bool
+    created_at: datetime.datetime
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
@@ -0,0 +1,30 @@
+import datetime
+import uuid
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class RegistrationCreateRequest(BaseModel):
+    user_id: uuid.UUID
+    notes: Optional[str] = Field(None, max_length=1000)
+
+
+class RegistrationResponse(BaseModel):
+    registration_id: uuid.UUID
+    event_id: uuid.UUID
+    user_id: uuid.UUID
+    status: str
+    registration_timestamp: datetime.datetime
+
+
+class EventCapacityRequest(BaseModel):
+    # None removes the limit
+    capacity: Optional[int] = Field(None, ge=0)
+
+
+class EventSeatsResponse(BaseModel):
+    event_id: uuid.UUID
+    capacity: Optional[int] = None
+    registered: int
+    available: Optional[int] = None
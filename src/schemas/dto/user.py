@@ -1,8 +1,8 @@
 import datetime
 import uuid
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class UserBase(BaseModel):
@@ -22,11 +22,30 @@ class UserBase(BaseModel):
         orm_mode = True  # Enable ORM mode for Pydantic to read from SQLAlchemy models
 
 
+class FacetCount(BaseModel):
+    value: Optional[str] = None
+    count: int
+
+
 class PaginatedUsersResponse(BaseModel):
     total_count: int
+    # Set when matching every user was too expensive and total_count is the planner's estimate
+    total_count_estimated: bool = False
     page: int
     page_size: int
     users: List[UserBase]
+    facets: Optional[Dict[str, List[FacetCount]]] = None
+
+
+class Suggestion(BaseModel):
+    value: str
+    count: int
+
+
+class SuggestionResponse(BaseModel):
+    field: str
+    prefix: str
+    suggestions: List[Suggestion]
 
 
 class NumRange(BaseModel):
@@ -34,15 +53,106 @@ class NumRange(BaseModel):
     max_number: Optional[int] = 1000
 
 
+def _as_utc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.UTC)
+    return value.astimezone(datetime.UTC)
+
+
+class DateRange(BaseModel):
+    """Timestamps from ``start`` (inclusive) to ``end`` (exclusive), in UTC."""
+
+    start: Optional[datetime.datetime] = None
+    end: Optional[datetime.datetime] = None
+
+    @classmethod
+    def between(
+        cls, start: Optional[datetime.datetime], end: Optional[datetime.datetime]
+    ) -> Optional['DateRange']:
+        """The range of the given bounds, ``None`` without any. Naive bounds are taken as UTC."""
+        if start is None and end is None:
+            return None
+        return cls(start=_as_utc(start), end=_as_utc(end))
+
+
 class UserFilterCriteria(BaseModel):
+    q: Optional[str] = None
     company_name: Optional[str]
     job_title: Optional[str] = None
     city: Optional[str] = None
     state: Optional[str] = None
+    crm_status: Optional[str] = None
     event_hosted: Optional[NumRange] = None
     event_attended: Optional[NumRange] = None
+    last_activity: Optional[DateRange] = None
+    created: Optional[DateRange] = None
     page_last_id: Optional[int] = None
     page_size: Optional[int] = 10
     page: Optional[int] = 1
     sort_by: Optional[str] = 'email'
     sort_order: Optional[str] = 'asc'
+    facets: Optional[List[str]] = None
+
+    def has_filters(self) -> bool:
+        """Whether any filter narrowing down the users table is set."""
+        return any(
+            (
+                self.q,
+                self.company_name,
+                self.job_title,
+                self.city,
+                self.state,
+                self.crm_status,
+                self.event_hosted,
+                self.event_attended,
+                self.last_activity,
+                self.created,
+            )
+        )
+
+
+class UserExportRequest(BaseModel):
+    """Filters and order of a users export, those of the ``/api/users`` search."""
+
+    q: Optional[str] = Field(None, max_length=200)
+    company_name: Optional[str] = None
+    job_title: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    crm_status: Optional[str] = None
+    min_events_hosted: Optional[int] = Field(None, ge=0)
+    max_events_hosted: Optional[int] = Field(None, ge=0)
+    min_events_attended: Optional[int] = Field(None, ge=0)
+    max_events_attended: Optional[int] = Field(None, ge=0)
+    last_activity_from: Optional[datetime.datetime] = None
+    last_activity_to: Optional[datetime.datetime] = None
+    created_from: Optional[datetime.datetime] = None
+    created_to: Optional[datetime.datetime] = None
+    sort_by: Optional[str] = Field(
+        None,
+        pattern='^(relevance|first_name|last_name|email|company_name|job_title|city|state|created_at'
+        '|events_hosted_count|events_attended_count)$',
+    )
+    sort_order: str = Field('asc', pattern='^(asc|desc)$')
+
+    def criteria(self) -> UserFilterCriteria:
+        return UserFilterCriteria(
+            q=self.q,
+            company_name=self.company_name,
+            job_title=self.job_title,
+            city=self.city,
+            state=self.state,
+            crm_status=self.crm_status,
+            event_hosted=NumRange(min_number=self.min_events_hosted, max_number=self.max_events_hosted)
+            if self.min_events_hosted or self.max_events_hosted
+            else None,
+            event_attended=NumRange(min_number=self.min_events_attended, max_number=self.max_events_attended)
+            if self.min_events_attended or self.max_events_attended
+            else None,
+            last_activity=DateRange.between(self.last_activity_from, self.last_activity_to),
+            created=DateRange.between(self.created_from, self.created_to),
+            sort_by=self.sort_by or ('relevance' if self.q else 'email'),
+            sort_order=self.sort_order,
+        )
@@ -8,7 +8,10 @@ class ErrorCode(IntEnum):
     INTERNAL_SERVER_ERROR = 500
     BAD_REQUEST = 400
     NOT_FOUND = 404
+    CONFLICT = 409
     EXTERNAL_SERVICE_ERROR = 503
+    SERVICE_UNAVAILABLE = 503
+    GATEWAY_TIMEOUT = 504
 
 
 class InternalErrorCode(IntEnum):
@@ -67,6 +70,21 @@ class NotFoundException(AppException):
         super().__init__(message, error_code)
 
 
+class ConflictException(AppException):
+    def __init__(self, message: str, error_code: ErrorCode = ErrorCode.CONFLICT):
+        super().__init__(message, error_code)
+
+
 class InternalServerException(AppException):
     def __init__(self, message: str, error_code: ErrorCode = ErrorCode.INTERNAL_SERVER_ERROR):
         super().__init__(message, error_code)
+
+
+class ServiceUnavailableException(AppException):
+    def __init__(self, message: str, error_code: ErrorCode = ErrorCode.SERVICE_UNAVAILABLE):
+        super().__init__(message, error_code)
+
+
+class QueryTimeoutException(AppException):
+    def __init__(self, message: str, error_code: ErrorCode = ErrorCode.GATEWAY_TIMEOUT):
+        super().__init__(message, error_code)
@@ -0,0 +1,193 @@
+"""Production server: migrations, then a pre-forked pool of uvicorn workers::
+
+    uv run python -m src.server
+
+The master process
+
+1. runs ``alembic upgrade head`` holding a Postgres advisory lock, replicas starting together wait for the
+   first one instead of racing it and then find nothing left to apply (``SERVER_RUN_MIGRATIONS=false`` skips
+   this when migrations run as a separate deployment step);
+2. imports the application once, before forking: the workers share the pages of the imported code instead of
+   each importing it again, and an import error stops the server before it binds the port;
+3. binds the listening socket and forks ``SERVER_WORKERS`` workers, one per CPU this container may use by
+   default, serving it with uvloop and httptools;
+4. replaces the workers that exit. A worker restarts after ``SERVER_MAX_REQUESTS`` requests plus a random
+   jitter, so slow leaks are bounded and the workers do not all restart at the same time, after finishing the
+   requests in progress. A worker failing its startup (lifespan error) stops the server, its orchestrator
+   restarts it.
+
+SIGTERM/SIGINT stop the workers gracefully, they are killed after ``SERVER_GRACEFUL_TIMEOUT_SECONDS``.
+
+uvicorn's own ``--workers`` starts its workers with ``multiprocessing`` spawn, each importing the application
+from scratch, hence this small supervisor.
+"""
+
+import math
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.pool import NullPool
+
+from src.core.config import settings
+from src.core.logger import get_logger, setup_logging
+
+logger = get_logger(__name__)
+
+# Delay before replacing a worker that crashed, a crash loop does not fork as fast as it can
+RESPAWN_DELAY_SECONDS = 1
+# Exit status of a worker whose startup failed, the one the uvicorn CLI uses
+STARTUP_FAILURE = 3
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on, capped by the cgroup v2 CPU quota of its container."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def migrate() -> None:
+    """Apply the pending migrations, one replica at a time."""
+    engine = create_engine(settings.SYNC_DB_URL, poolclass=NullPool)
+    try:
+        # Session level lock on an autocommit connection: it holds no snapshot, migrations building indexes
+        # concurrently do not wait for it
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            logger.info('Waiting for the migration lock')
+            connection.execute(select(func.pg_advisory_lock(settings.MIGRATION_LOCK_ID)))
+            try:
+                logger.info('Running database migrations')
+                subprocess.run([sys.executable, '-m', 'alembic', 'upgrade', 'head'], check=True)
+            finally:
+                connection.execute(select(func.pg_advisory_unlock(settings.MIGRATION_LOCK_ID)))
+    finally:
+        engine.dispose()
+
+
+class Arbiter:
+    def __init__(self, app, workers: int):
+        self.config = uvicorn.Config(
+            app,
+            host=settings.SERVER_HOST,
+            port=settings.SERVER_PORT,
+            loop='uvloop',
+            http='httptools',
+            lifespan='on',
+            backlog=settings.SERVER_BACKLOG,
+            timeout_keep_alive=settings.SERVER_KEEP_ALIVE_SECONDS,
+            timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+            limit_max_requests=settings.SERVER_MAX_REQUESTS or None,
+            # Logging is configured by the application
+            log_config=None,
+        )
+        self.workers = workers
+        self.children: set[int] = set()
+        self.stopping = False
+        self.exit_code = 0
+        self.sock: Optional[socket.socket] = None
+
+    def run(self) -> int:
+        self.sock = self.config.bind_socket()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._stop)
+        signal.signal(signal.SIGALRM, self._kill)
+        logger.info(f'Starting {self.workers} workers')
+        for _ in range(self.workers):
+            self._spawn()
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            self.children.discard(pid)
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                continue
+            if code == STARTUP_FAILURE:
+                logger.error(f'Worker {pid} failed to start, stopping the server')
+                self.exit_code = STARTUP_FAILURE
+                self._stop(signal.SIGTERM, None)
+                continue
+            if code != 0:
+                logger.warning(f'Worker {pid} exited with status {code}, replacing it')
+                time.sleep(RESPAWN_DELAY_SECONDS)
+            self._spawn()
+        self.sock.close()
+        logger.info('Server stopped')
+        return self.exit_code
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            return
+        code = 1
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGALRM):
+                signal.signal(sig, signal.SIG_DFL)
+            # The children inherit the random state of the master, the max requests jitter would be the same
+            random.seed()
+            if self.config.limit_max_requests:
+                self.config.limit_max_requests += random.randint(0, settings.SERVER_MAX_REQUESTS_JITTER)
+            server = uvicorn.Server(self.config)
+            server.run(sockets=[self.sock])
+            # Server.run returns without starting when the lifespan startup fails
+            code = 0 if server.started else STARTUP_FAILURE
+        except SystemExit as exc:
+            code = exc.code if isinstance(exc.code, int) else 1
+        except BaseException:
+            logger.exception('Worker crashed')
+        finally:
+            # Skip the master's atexit handlers and buffered state
+            os._exit(code)
+
+    def _stop(self, sig: int, frame) -> None:
+        if self.stopping:
+            # Second signal: do not wait for the requests in progress
+            self._kill(sig, frame)
+            return
+        logger.info(f'Stopping {len(self.children)} workers')
+        self.stopping = True
+        self._signal(signal.SIGTERM)
+        # Margin for the lifespan shutdown after the requests
+        signal.alarm(settings.SERVER_GRACEFUL_TIMEOUT_SECONDS + 5)
+
+    def _kill(self, sig: int, frame) -> None:
+        logger.warning(f'Killing {len(self.children)} workers')
+        self._signal(signal.SIGKILL)
+
+    def _signal(self, sig: int) -> None:
+        for pid in list(self.children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                self.children.discard(pid)
+
+
+def main() -> int:
+    setup_logging()
+    if settings.SERVER_RUN_MIGRATIONS:
+        migrate()
+    # Imported after the migrations, the app reads the schema at import, and before forking the workers
+    from src.main import app  # noqa: PLC0415
+
+    return Arbiter(app, settings.SERVER_WORKERS or available_cpus()).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
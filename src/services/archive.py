@@ -0,0 +1,295 @@
+"""Cold tier for old events and their registrations.
+
+:meth:`ArchiveService.archive_events` moves events older than a cutoff, with their registrations, to Parquet
+files in the object storage, one short transaction per batch: the batch is written to the storage, then its
+rows are deleted and its files recorded in ``archive_files`` in the same transaction. Files whose transaction
+did not commit are not in the manifest and never read.
+
+:meth:`ArchiveService.events` and :meth:`ArchiveService.registrations` give polars frames over both tiers: the
+hot rows read from Postgres and the archived files scanned lazily, manifest and hot rows read from the same
+snapshot so a row is seen exactly once even while archiving runs.
+"""
+
+import asyncio
+import datetime
+import io
+import uuid
+from collections import Counter
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any, Optional
+
+import polars as pl
+from sqlalchemy import Row
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.repos.archive import ArchiveRepo
+from src.schemas.exceptions.base import BadRequestException
+from src.services.job import JobContext
+from src.services.storage.client import StorageClient
+from src.utils.ids import uuid7
+
+logger = get_logger(__name__)
+
+EVENTS_SCHEMA = pl.Schema(
+    {
+        'id': pl.String,
+        'owner_id': pl.String,
+        'event_type_id': pl.String,
+        'event_timestamp': pl.Datetime('us', 'UTC'),
+        'event_status': pl.String,
+        'duration_minutes': pl.Int32,
+        'notes': pl.String,
+        'event_details': pl.String,
+        'recorded_by_user_id': pl.String,
+        'created_at': pl.Datetime('us'),
+        'updated_at': pl.Datetime('us'),
+    }
+)
+REGISTRATIONS_SCHEMA = pl.Schema(
+    {
+        'id': pl.String,
+        'user_id': pl.String,
+        'event_id': pl.String,
+        'registration_timestamp': pl.Datetime('us', 'UTC'),
+        'event_timestamp': pl.Datetime('us', 'UTC'),
+        'status': pl.String,
+        'notes': pl.String,
+        'created_at': pl.Datetime('us'),
+        'updated_at': pl.Datetime('us'),
+    }
+)
+SCHEMAS = {'events': EVENTS_SCHEMA, 'registrations': REGISTRATIONS_SCHEMA}
+# Partial monthly stats per event type and host, the hot tier's are aggregated by Postgres
+MONTHLY_SCHEMA = pl.Schema(
+    {
+        'month': pl.String,
+        'event_type_id': pl.String,
+        'owner_id': pl.String,
+        'events': pl.Int64,
+        'registrations': pl.Int64,
+        'duration_minutes': pl.Int64,
+        'durations': pl.Int64,
+    }
+)
+
+
+class ArchiveService:
+    def __init__(self, archive_repo: ArchiveRepo, storage: StorageClient):
+        self.archive_repo = archive_repo
+        self.storage = storage
+
+    # --- Archiving ---
+
+    async def archive_events(self, ctx: JobContext) -> dict[str, Any]:
+        """Job handler moving old events and their registrations to the cold tier.
+
+        Payload: ``before`` (ISO date, at most and by default ``ARCHIVE_AFTER_DAYS`` ago), ``batch_size``
+        (optional).
+        """
+        latest = datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+        cutoff = latest
+        if 'before' in ctx.payload:
+            cutoff = datetime.datetime.fromisoformat(ctx.payload['before'])
+            cutoff = cutoff if cutoff.tzinfo else cutoff.replace(tzinfo=datetime.UTC)
+            if cutoff > latest:
+                raise BadRequestException(
+                    f'before must be {latest.date()} or earlier, the events of the last '
+                    f'{settings.ARCHIVE_AFTER_DAYS} days stay in the database'
+                )
+        batch_size = int(ctx.payload.get('batch_size', settings.ARCHIVE_BATCH_SIZE))
+        async with self.archive_repo.db.session() as session:
+            ctx.progress(0, await session.scalar(self.archive_repo.count_old_events(cutoff)))
+
+        last_id: Optional[uuid.UUID] = None
+        events = registrations = files = 0
+        while True:
+            # One batch per thread hop, a cancellation stops the job between two committed batches
+            batch = await asyncio.to_thread(self._archive_batch, cutoff, last_id, batch_size)
+            if batch is None:
+                break
+            last_id, batch_events, batch_registrations, batch_files = batch
+            events += batch_events
+            registrations += batch_registrations
+            files += batch_files
+            ctx.progress(events)
+        logger.info(f'Archived {events} events and {registrations} registrations older than {cutoff}')
+        return {'cutoff': cutoff.isoformat(), 'events': events, 'registrations': registrations, 'files': files}
+
+    def _archive_batch(
+        self, cutoff: datetime.datetime, after_id: Optional[uuid.UUID], batch_size: int
+    ) -> Optional[tuple[uuid.UUID, int, int, int]]:
+        uploaded: list[str] = []
+        with self.archive_repo.db.sync_session(lock_timeout=settings.EVENTS_LOCK_TIMEOUT_MS) as session:
+            try:
+                rows = session.execute(self.archive_repo.old_events(cutoff, after_id, batch_size)).all()
+                if not rows:
+                    return None
+                keys = [row.key for row in rows]
+                registrations = session.execute(self.archive_repo.registrations_of(keys)).all()
+
+                for table, frame in (
+                    ('events', self._frame(rows, EVENTS_SCHEMA)),
+                    ('registrations', self._frame(registrations, REGISTRATIONS_SCHEMA)),
+                ):
+                    for storage_key, part in self._write_parts(table, frame):
+                        uploaded.append(storage_key)
+                        session.execute(
+                            self.archive_repo.add_file(
+                                table,
+                                storage_key,
+                                part.height,
+                                part['event_timestamp'].min(),
+                                part['event_timestamp'].max(),
+                            )
+                        )
+
+                hosted = Counter(uuid.UUID(row.owner_id) for row in rows)
+                attended = Counter(uuid.UUID(row.user_id) for row in registrations)
+                if (stm := self.archive_repo.add_archived_counts(hosted, attended)) is not None:
+                    session.execute(stm)
+                session.execute(self.archive_repo.delete_registrations(keys))
+                session.execute(self.archive_repo.delete_events(keys))
+            except BaseException:
+                session.rollback()
+                self._discard(uploaded)
+                raise
+            # Files are kept from here on: a commit that raises may still have landed, files in the manifest
+            session.commit()
+        return keys[-1], len(rows), len(registrations), len(uploaded)
+
+    @staticmethod
+    def _frame(rows: Sequence[Row], schema: pl.Schema) -> pl.DataFrame:
+        return pl.DataFrame(
+            [tuple(row._mapping[name] for name in schema) for row in rows], schema=schema, orient='row'
+        )
+
+    def _write_parts(self, table: str, frame: pl.DataFrame) -> Iterator[tuple[str, pl.DataFrame]]:
+        """Upload ``frame`` as one Parquet file per month of ``event_timestamp``."""
+        if frame.is_empty():
+            return
+        month = pl.col('event_timestamp').dt.strftime('year=%Y/month=%m')
+        for (partition,), part in frame.group_by(month, maintain_order=True):
+            storage_key = f'{settings.ARCHIVE_PREFIX}/{table}/{partition}/{uuid7()}.parquet'
+            buffer = io.BytesIO()
+            part.write_parquet(buffer, compression='zstd', statistics=True)
+            self.storage.put_bytes(storage_key, buffer.getvalue(), content_type='application/vnd.apache.parquet')
+            yield storage_key, part
+
+    def _discard(self, keys: list[str]) -> None:
+        for key in keys:
+            try:
+                self.storage.delete(key)
+            except Exception:
+                logger.exception(f'Could not delete the unreferenced archive file {key}')
+
+    # --- Reading both tiers ---
+
+    @contextmanager
+    def _snapshot(self) -> Iterator[Session]:
+        """Session whose statements all see the same snapshot, the manifest matches the hot rows."""
+        with self.archive_repo.db.sync_session() as session:
+            session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+            try:
+                yield session
+            finally:
+                session.rollback()
+
+    def _cold(
+        self,
+        table: str,
+        keys: Sequence[str],
+        since: Optional[datetime.datetime],
+        until: Optional[datetime.datetime],
+    ) -> pl.LazyFrame:
+        schema = SCHEMAS[table]
+        if not keys:
+            return pl.LazyFrame(schema=schema)
+        cold = pl.scan_parquet(
+            [self.storage.uri(key) for key in keys], storage_options=self.storage.scan_options()
+        ).select([pl.col(name).cast(dtype) for name, dtype in schema.items()])
+        # Files are pruned on their time range only, rows are filtered one by one
+        if since is not None:
+            cold = cold.filter(pl.col('event_timestamp') >= since)
+        if until is not None:
+            cold = cold.filter(pl.col('event_timestamp') < until)
+        return cold
+
+    def _union(
+        self,
+        table: str,
+        hot_stm,
+        since: Optional[datetime.datetime],
+        until: Optional[datetime.datetime],
+    ) -> pl.LazyFrame:
+        with self._snapshot() as session:
+            keys = session.scalars(self.archive_repo.files(table, since, until)).all()
+            hot = self._frame(session.execute(hot_stm).all(), SCHEMAS[table])
+        if not keys:
+            return hot.lazy()
+        return pl.concat([hot.lazy(), self._cold(table, keys, since, until)], how='vertical')
+
+    def events(
+        self, since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None
+    ) -> pl.LazyFrame:
+        """Events of both tiers with ``event_timestamp`` in ``[since, until)``. Blocking, reads the hot rows."""
+        return self._union('events', self.archive_repo.hot_events(since, until), since, until)
+
+    def registrations(
+        self, since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None
+    ) -> pl.LazyFrame:
+        """Registrations of both tiers to the events in ``[since, until)``. Blocking, reads the hot rows."""
+        return self._union('registrations', self.archive_repo.hot_registrations(since, until), since, until)
+
+    def monthly_event_stats(
+        self, since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None
+    ) -> list[dict[str, Any]]:
+        """Events, distinct hosts and registrations per month and event type, over both tiers.
+
+        Postgres aggregates the hot tier per month, event type and host, so the rows read stay bounded by the
+        hosts of each month whatever the range. Archived rows are aggregated the same way, lazily.
+        """
+        with self._snapshot() as session:
+            event_keys = session.scalars(self.archive_repo.files('events', since, until)).all()
+            registration_keys = session.scalars(self.archive_repo.files('registrations', since, until)).all()
+            hot = self._frame(
+                session.execute(self.archive_repo.hot_monthly_event_stats(since, until)).all(), MONTHLY_SCHEMA
+            )
+        partials = [hot.lazy()]
+        if event_keys:
+            registrations = (
+                self._cold('registrations', registration_keys, since, until)
+                .group_by('event_id')
+                .agg(pl.len().cast(pl.Int64).alias('registrations'))
+            )
+            month = pl.col('event_timestamp').dt.strftime('%Y-%m').alias('month')
+            cold = (
+                self._cold('events', event_keys, since, until)
+                .join(registrations, left_on='id', right_on='event_id', how='left')
+                .group_by(month, 'event_type_id', 'owner_id')
+                .agg(
+                    pl.len().cast(pl.Int64).alias('events'),
+                    pl.col('registrations').fill_null(0).sum().alias('registrations'),
+                    pl.col('duration_minutes').cast(pl.Int64).sum().alias('duration_minutes'),
+                    pl.col('duration_minutes').count().cast(pl.Int64).alias('durations'),
+                )
+            )
+            partials.append(cold.select(MONTHLY_SCHEMA.names()))
+        durations = pl.col('durations').sum()
+        return (
+            pl.concat(partials, how='vertical')
+            .group_by('month', 'event_type_id')
+            .agg(
+                pl.col('events').sum().alias('events'),
+                pl.col('owner_id').n_unique().alias('hosts'),
+                pl.col('registrations').sum().alias('registrations'),
+                pl.when(durations > 0)
+                .then(pl.col('duration_minutes').sum() / durations)
+                .alias('avg_duration_minutes'),
+            )
+            .sort('month', 'event_type_id')
+            .collect()
+            .to_dicts()
+        )
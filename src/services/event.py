@@ -0,0 +1,41 @@
+from typing import Tuple
+
+from src.core.config import settings
+from src.models import Event
+from src.repos.event import EventRepo
+from src.schemas.dto.event import EventBase, EventFilterCriteria
+from src.services.reference import ReferenceDataCache
+
+
+class EventService:
+    def __init__(self, event_repo: EventRepo, reference_data: ReferenceDataCache):
+        self.event_repo = event_repo
+        self.reference_data = reference_data
+
+    async def filter_event(self, criteria: EventFilterCriteria) -> Tuple[int, list[EventBase]]:
+        async with self.event_repo.db.session(
+            statement_timeout=settings.EVENTS_STATEMENT_TIMEOUT_MS, lock_timeout=settings.EVENTS_LOCK_TIMEOUT_MS
+        ) as session:
+            stm = self.event_repo.retrieve_event_using_criteria(criteria)
+            cnt = await session.scalar(self.event_repo.count(stm))
+            offset = (criteria.page - 1) * criteria.page_size
+            records = await session.scalars(self.event_repo.data_range(stm, criteria.page_size, offset))
+            events = [self.mapperEventModelToEventResponse(record) for record in records]
+        return cnt, events
+
+    def mapperEventModelToEventResponse(self, event: Event) -> EventBase:
+        event_type = self.reference_data.event_type(event.event_type_id)
+        return EventBase(
+            event_id=event.id,
+            owner_id=event.owner_id,
+            event_type_id=event.event_type_id,
+            event_type_name=event_type.type_name if event_type else None,
+            event_type_category=event_type.category if event_type else None,
+            event_timestamp=event.event_timestamp,
+            event_status=event.event_status,
+            duration_minutes=event.duration_minutes,
+            notes=event.notes,
+            event_details=event.event_details,
+            recorded_by_user_id=event.recorded_by_user_id,
+            created_at=event.created_at,
+        )
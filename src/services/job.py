@@ -0,0 +1,203 @@
+"""Postgres backed background jobs.
+
+Jobs are rows of the ``jobs`` table. Any number of runners (the API workers and/or ``python -m src.worker``)
+claim them with ``FOR UPDATE SKIP LOCKED``, each running at most ``JOBS_CONCURRENCY`` jobs at a time. A runner
+heartbeats the jobs it holds; jobs of a runner that died are requeued by the others once the lease expires.
+"""
+
+import asyncio
+import contextlib
+import datetime
+import os
+import socket
+import uuid
+from collections.abc import Awaitable, Callable, Mapping
+from typing import Any, Optional
+
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.models.job import Job, JobStatus
+from src.repos.job import JOBS_CHANNEL, JobRepo
+from src.schemas.exceptions.base import BadRequestException, NotFoundException
+
+logger = get_logger(__name__)
+
+
+class JobContext:
+    """Handle given to a job handler to read its payload and report progress.
+
+    :meth:`progress` only records the numbers, the runner writes them with the next heartbeat so handlers can
+    call it on every batch, from the event loop or from a worker thread. Async handlers are cancelled when a
+    cancellation is requested, blocking handlers running in a thread should check :attr:`cancelled`.
+    """
+
+    def __init__(self, job: Job):
+        self.job_id = job.id
+        self.kind = job.kind
+        self.payload = job.payload
+        self.attempt = job.attempts
+        self.done = 0
+        self.total: Optional[int] = None
+        self.cancelled = False
+
+    def progress(self, done: int, total: Optional[int] = None) -> None:
+        self.done = done
+        if total is not None:
+            self.total = total
+
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[dict[str, Any]]]]
+
+
+class JobService:
+    def __init__(self, job_repo: JobRepo, handlers: Mapping[str, JobHandler]):
+        self.job_repo = job_repo
+        self.kinds = sorted(handlers)
+
+    async def enqueue(self, kind: str, payload: Optional[dict[str, Any]] = None, max_attempts: int = 0) -> Job:
+        if kind not in self.kinds:
+            raise BadRequestException(f'Unknown job kind {kind}, expected one of {", ".join(self.kinds)}')
+        async with self.job_repo.db.session() as session, session.begin():
+            job = await session.scalar(
+                self.job_repo.enqueue(kind, payload or {}, max_attempts or settings.JOBS_MAX_ATTEMPTS)
+            )
+            # Delivered on commit, runners of every worker wake up
+            await session.execute(self.job_repo.notify_enqueued(kind))
+        logger.info(f'Enqueued job {job.id} ({kind})')
+        return job
+
+    async def get(self, job_id: uuid.UUID) -> Job:
+        async with self.job_repo.db.session() as session:
+            job = await session.scalar(self.job_repo.get(job_id))
+        if job is None:
+            raise NotFoundException(f'Job {job_id} not found')
+        return job
+
+    async def cancel(self, job_id: uuid.UUID) -> Job:
+        async with self.job_repo.db.session() as session, session.begin():
+            job = await session.scalar(self.job_repo.request_cancel(job_id))
+        if job is None:
+            # Either unknown or already finished, get() tells which
+            job = await self.get(job_id)
+            raise BadRequestException(f'Job {job_id} is already {job.status}')
+        return job
+
+
+class JobRunner:
+    """Claims and executes jobs on the event loop of this process."""
+
+    def __init__(self, job_repo: JobRepo, handlers: Mapping[str, JobHandler], concurrency: int):
+        self.job_repo = job_repo
+        self.handlers = dict(handlers)
+        self.concurrency = concurrency
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        await self.job_repo.db.listen(JOBS_CHANNEL, lambda _kind: self._wakeup.set())
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f'job-runner-{index}') for index in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._requeue_expired(), name='job-runner-lease'))
+        logger.info(f'Job runner {self.worker_id} started with {self.concurrency} slots')
+
+    async def stop(self) -> None:
+        """Stop claiming jobs, the jobs in progress are given back to the queue for another runner."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Could not claim a job')
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOBS_POLL_INTERVAL_SECONDS)
+                continue
+            await self._execute(job)
+
+    async def _claim(self) -> Optional[Job]:
+        async with self.job_repo.db.session() as session, session.begin():
+            return await session.scalar(self.job_repo.dequeue(self.worker_id, list(self.handlers)))
+
+    async def _execute(self, job: Job) -> None:
+        logger.info(f'Running job {job.id} ({job.kind}), attempt {job.attempts}/{job.max_attempts}')
+        ctx = JobContext(job)
+        task = asyncio.create_task(self.handlers[job.kind](ctx), name=f'job-{job.id}')
+        heartbeat = asyncio.create_task(self._heartbeat(ctx, task))
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # The runner is shutting down, not the job being cancelled
+                await self._finish(self.job_repo.release(job.id, self.worker_id))
+                raise
+            logger.info(f'Job {job.id} cancelled')
+            await self._finish(self._update(job, ctx, JobStatus.cancelled))
+        except Exception as exc:
+            logger.exception(f'Job {job.id} failed')
+            if job.attempts < job.max_attempts:
+                delay = datetime.timedelta(seconds=settings.JOBS_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+                await self._finish(self.job_repo.retry(job.id, self.worker_id, repr(exc), delay))
+            else:
+                await self._finish(self._update(job, ctx, JobStatus.failed, error=repr(exc)))
+        else:
+            logger.info(f'Job {job.id} succeeded')
+            await self._finish(self._update(job, ctx, JobStatus.succeeded, result=result))
+        finally:
+            heartbeat.cancel()
+
+    def _update(self, job: Job, ctx: JobContext, status: JobStatus, **values: Any):
+        return self.job_repo.finish(
+            job.id, self.worker_id, status, progress_done=ctx.done, progress_total=ctx.total, **values
+        )
+
+    async def _finish(self, stm) -> None:
+        try:
+            async with self.job_repo.db.session() as session, session.begin():
+                await session.execute(stm)
+        except Exception:
+            # The lease expires and another runner picks the job up again
+            logger.exception('Could not record the job outcome')
+
+    async def _heartbeat(self, ctx: JobContext, task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(settings.JOBS_HEARTBEAT_SECONDS)
+            try:
+                async with self.job_repo.db.session() as session, session.begin():
+                    cancel_requested = await session.scalar(
+                        self.job_repo.heartbeat(ctx.job_id, self.worker_id, ctx.done, ctx.total)
+                    )
+            except Exception:
+                logger.exception(f'Heartbeat of job {ctx.job_id} failed')
+                continue
+            # None: the lease expired and the job was handed to another runner
+            if cancel_requested is None or cancel_requested:
+                ctx.cancelled = True
+                task.cancel()
+                return
+
+    async def _requeue_expired(self) -> None:
+        lease = datetime.timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+        while True:
+            await asyncio.sleep(settings.JOBS_LEASE_SECONDS / 2)
+            try:
+                async with self.job_repo.db.session() as session, session.begin():
+                    expired = (await session.scalars(self.job_repo.requeue_expired(lease))).all()
+            except Exception:
+                logger.exception('Could not requeue expired jobs')
+                continue
+            if expired:
+                logger.warning(f'Requeued {len(expired)} jobs of unresponsive runners')
+                self._wakeup.set()
@@ -0,0 +1,53 @@
+"""Data maintenance run as background jobs instead of inside migrations or requests."""
+
+import asyncio
+from typing import Any, Optional
+
+from sqlalchemy import func, select
+
+from scripts.seeding import seeding_data
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.models import User
+from src.repos.user import UserRepo
+from src.services.job import JobContext
+
+logger = get_logger(__name__)
+
+
+class MaintenanceService:
+    def __init__(self, user_repo: UserRepo):
+        self.user_repo = user_repo
+
+    async def recount_user_events(self, ctx: JobContext) -> dict[str, Any]:
+        """Recompute the event counters of every user, one short transaction per batch of users.
+
+        Payload: ``batch_size`` (optional).
+        """
+        batch_size = int(ctx.payload.get('batch_size', settings.JOBS_BATCH_SIZE))
+        async with self.user_repo.db.session() as session:
+            ctx.progress(0, await session.scalar(select(func.count()).select_from(User)))
+
+        last_id: Optional[Any] = None
+        done = updated = 0
+        while True:
+            async with self.user_repo.db.session() as session, session.begin():
+                ids = (await session.scalars(self.user_repo.id_batch(last_id, batch_size))).all()
+                if not ids:
+                    break
+                result = await session.execute(self.user_repo.recount_events(ids))
+            last_id = ids[-1]
+            done += len(ids)
+            updated += result.rowcount
+            ctx.progress(done)
+        return {'users': done, 'updated': updated}
+
+    async def seed(self, ctx: JobContext) -> dict[str, Any]:
+        """Insert the sample dataset into empty tables."""
+
+        def run() -> None:
+            with self.user_repo.db.sync_session() as session:
+                seeding_data(session)
+
+        await asyncio.to_thread(run)
+        return {}
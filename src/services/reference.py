@@ -0,0 +1,102 @@
+import asyncio
+import uuid
+from types import MappingProxyType
+from typing import List, Mapping, Optional
+
+import polars as pl
+
+from src.core.logger import get_logger
+from src.core.snapshots import SnapshotStore
+from src.repos.event import EventRepo
+from src.schemas.dto.event import EventTypeRecord
+
+logger = get_logger(__name__)
+
+# Fired by the event_types_notify_change trigger on every write to event_types
+EVENT_TYPES_CHANNEL = 'event_types_changed'
+REFERENCE_SNAPSHOT = 'reference'
+EVENT_TYPES_SCHEMA = pl.Schema(
+    {
+        'id': pl.String,
+        'type_name': pl.String,
+        'description': pl.String,
+        'category': pl.String,
+        'is_active': pl.Boolean,
+    }
+)
+
+
+class ReferenceDataCache:
+    """Small, rarely changing tables kept in memory by every worker.
+
+    The maps are immutable and replaced as a whole on reload, so readers never need a lock. Each worker
+    listens on a Postgres channel and reloads as soon as any worker or migration writes to the table.
+
+    Tables are read from the snapshot store while its version matches the table's, a single primary key
+    lookup, so starting a worker does not read them again. A worker reading them from the database publishes
+    them.
+    """
+
+    def __init__(self, event_repo: EventRepo, store: SnapshotStore):
+        self.event_repo = event_repo
+        self.store = store
+        self._event_types: Mapping[uuid.UUID, EventTypeRecord] = MappingProxyType({})
+        self._reload_task: Optional[asyncio.Task] = None
+        self._reload_pending = False
+
+    @property
+    def event_types(self) -> Mapping[uuid.UUID, EventTypeRecord]:
+        return self._event_types
+
+    def event_type(self, event_type_id: uuid.UUID) -> Optional[EventTypeRecord]:
+        return self._event_types.get(event_type_id)
+
+    async def load(self) -> None:
+        async with self.event_repo.db.session() as session:
+            version = await session.scalar(self.event_repo.event_types_version()) or 0
+            records = await asyncio.to_thread(self._published, version)
+            if records is None:
+                rows = (await session.scalars(self.event_repo.event_types())).all()
+                records = [EventTypeRecord.model_validate(row) for row in rows]
+                await asyncio.to_thread(self._publish, records, version)
+                logger.info(f'Loaded {len(rows)} event types')
+        self._event_types = MappingProxyType({record.id: record for record in records})
+
+    def _published(self, version: int) -> Optional[List[EventTypeRecord]]:
+        """Event types of the published snapshot, ``None`` unless it is at ``version``."""
+        pointer = self.store.pointer(REFERENCE_SNAPSHOT)
+        if pointer is None or pointer['meta'].get('event_types_version') != version:
+            return None
+        frame = self.store.load(REFERENCE_SNAPSHOT, pointer).frames['event_types']
+        return [
+            EventTypeRecord(**{**row, 'id': uuid.UUID(row['id'])}) for row in frame.iter_rows(named=True)
+        ]
+
+    def _publish(self, records: List[EventTypeRecord], version: int) -> None:
+        frame = pl.DataFrame(
+            [{**record.model_dump(), 'id': str(record.id)} for record in records], schema=EVENT_TYPES_SCHEMA
+        )
+        with self.store.publisher(REFERENCE_SNAPSHOT) as publishing:
+            # Another worker publishing the same version is just as good
+            if publishing:
+                self.store.publish(
+                    REFERENCE_SNAPSHOT, {'event_types': frame}, {'event_types_version': version}
+                )
+
+    async def subscribe(self) -> None:
+        await self.event_repo.db.listen(EVENT_TYPES_CHANNEL, self._on_change)
+
+    def _on_change(self, _payload: str) -> None:
+        # Notifications arriving during a reload are folded into a single extra reload
+        self._reload_pending = True
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.create_task(self._reload())
+
+    async def _reload(self) -> None:
+        while self._reload_pending:
+            self._reload_pending = False
+            try:
+                await self.load()
+            except Exception:
+                logger.exception('Could not reload event types')
+
@@ -0,0 +1,180 @@
+"""Event registrations, built for many users registering to the same event at once.
+
+Each worker batches the registrations of an event (:class:`MicroBatcher`): one transaction per batch locks
+the ``event_seats`` row of the event, writes the whole batch with one statement and moves the counter once.
+However many users register, at most one transaction per worker waits on that row, instead of one per
+request queueing on it. A request is answered once its batch committed.
+
+The unique ``(user_id, event_id)`` constraint rejects a second registration whatever the writer. Capacity
+holds for the writes of this service only: the check constraint of ``event_seats`` bounds the counter this
+service moves, inserts into ``registrations`` from elsewhere (``scripts/sync.py``, the seeding, imports)
+neither move nor check it.
+"""
+
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.batching import MicroBatcher
+from src.core.config import settings
+from src.repos.registration import CANCELLED, REGISTERED, RegistrationRepo
+from src.schemas.dto.registration import EventSeatsResponse, RegistrationResponse
+from src.schemas.exceptions.base import AppException, ConflictException, NotFoundException
+
+
+@dataclass(frozen=True)
+class RegistrationRequest:
+    user_id: uuid.UUID
+    notes: Optional[str] = None
+
+
+class RegistrationService:
+    def __init__(self, registration_repo: RegistrationRepo, batcher: MicroBatcher):
+        self.registration_repo = registration_repo
+        self.batcher = batcher
+
+    async def register(
+        self, event_id: uuid.UUID, user_id: uuid.UUID, notes: Optional[str] = None
+    ) -> RegistrationResponse:
+        return await self.batcher.submit(event_id, RegistrationRequest(user_id, notes), self._register_batch)
+
+    async def _register_batch(
+        self, event_id: uuid.UUID, requests: list[RegistrationRequest]
+    ) -> list[RegistrationResponse | AppException]:
+        repo = self.registration_repo
+        # First request of each user, the others are duplicates
+        first: dict[uuid.UUID, int] = {}
+        for position, request in enumerate(requests):
+            first.setdefault(request.user_id, position)
+        unique = [requests[position] for position in first.values()]
+
+        async with repo.db.session(lock_timeout=settings.REGISTRATION_LOCK_TIMEOUT_MS) as session:
+            written = {}
+            seats = (await session.execute(repo.seats(event_id))).one_or_none()
+            # Sold out events are answered without waiting for the lock, only a cancellation frees a seat
+            if seats is None or seats.capacity is None or seats.registered < seats.capacity:
+                seats = await self._lock_seats(session, event_id)
+                if seats is None:
+                    return [NotFoundException(f'Event {event_id} not found')] * len(requests)
+                free = None if seats.capacity is None else seats.capacity - seats.registered
+                if free != 0:
+                    user_ids = [request.user_id for request in unique]
+                    stm = repo.register(event_id, user_ids, [request.notes for request in unique], free)
+                    written = {row.user_id: row for row in await session.execute(stm)}
+                if written:
+                    await session.execute(repo.update_seats(event_id, len(written)))
+                    if inserted := sorted(row.user_id for row in written.values() if row.inserted):
+                        await session.execute(repo.add_attended(inserted))
+                await session.commit()
+
+            rejected = [request.user_id for request in unique if request.user_id not in written]
+            states = {}
+            if rejected:
+                states = dict((await session.execute(repo.registration_states(event_id, rejected))).all())
+
+        return self._results(event_id, requests, first, written, states)
+
+    @staticmethod
+    def _results(
+        event_id: uuid.UUID,
+        requests: list[RegistrationRequest],
+        first: dict[uuid.UUID, int],
+        written: dict[uuid.UUID, Row],
+        states: dict[uuid.UUID, bool],
+    ) -> list[RegistrationResponse | AppException]:
+        """Answer of each request: the registration written for it, or why none was."""
+        results: list[RegistrationResponse | AppException] = []
+        for position, request in enumerate(requests):
+            row = written.get(request.user_id)
+            if row is not None and first[request.user_id] == position:
+                results.append(
+                    RegistrationResponse(
+                        registration_id=row.id,
+                        event_id=event_id,
+                        user_id=request.user_id,
+                        status=REGISTERED,
+                        registration_timestamp=row.registration_timestamp,
+                    )
+                )
+            elif row is None and request.user_id not in states:
+                results.append(NotFoundException(f'User {request.user_id} not found'))
+            elif row is not None or states[request.user_id]:
+                results.append(
+                    ConflictException(f'User {request.user_id} is already registered to event {event_id}')
+                )
+            else:
+                results.append(ConflictException(f'Event {event_id} is full'))
+        return results
+
+    async def _lock_seats(self, session: AsyncSession, event_id: uuid.UUID):
+        """Lock the seats row of the event, created on its first registration. ``None`` without event."""
+        repo = self.registration_repo
+        seats = (await session.execute(repo.seats(event_id, lock=True))).one_or_none()
+        if seats is None:
+            if not await session.scalar(repo.event_exists(event_id)):
+                return None
+            # Concurrent creations wait for the first one, then find its row
+            await session.execute(repo.create_seats(event_id))
+            seats = (await session.execute(repo.seats(event_id, lock=True))).one()
+        return seats
+
+    async def cancel(self, event_id: uuid.UUID, user_id: uuid.UUID) -> RegistrationResponse:
+        repo = self.registration_repo
+        row = None
+        async with repo.db.session(lock_timeout=settings.REGISTRATION_LOCK_TIMEOUT_MS) as session:
+            if (seats := await self._lock_seats(session, event_id)) is not None:
+                row = (await session.execute(repo.cancel(event_id, user_id))).one_or_none()
+            if row is not None:
+                await session.execute(repo.update_seats(event_id, -1))
+                await session.commit()
+        if seats is None:
+            raise NotFoundException(f'Event {event_id} not found')
+        if row is None:
+            raise NotFoundException(f'User {user_id} has no active registration to event {event_id}')
+        return RegistrationResponse(
+            registration_id=row.id,
+            event_id=event_id,
+            user_id=user_id,
+            status=CANCELLED,
+            registration_timestamp=row.registration_timestamp,
+        )
+
+    async def seats(self, event_id: uuid.UUID) -> EventSeatsResponse:
+        repo = self.registration_repo
+        async with repo.db.session() as session:
+            seats = (await session.execute(repo.seats(event_id))).one_or_none()
+            if seats is not None:
+                return self._seats_response(event_id, seats.capacity, seats.registered)
+            # No registration through the API yet
+            exists = await session.scalar(repo.event_exists(event_id))
+            registered = await session.scalar(repo.active_count(event_id)) if exists else 0
+        if not exists:
+            raise NotFoundException(f'Event {event_id} not found')
+        return self._seats_response(event_id, None, registered)
+
+    async def set_capacity(self, event_id: uuid.UUID, capacity: Optional[int]) -> EventSeatsResponse:
+        repo = self.registration_repo
+        async with repo.db.session(lock_timeout=settings.REGISTRATION_LOCK_TIMEOUT_MS) as session:
+            seats = await self._lock_seats(session, event_id)
+            # Lowering the capacity below the registrations would violate ck_event_seats_capacity
+            if seats is not None and (capacity is None or capacity >= seats.registered):
+                seats = (await session.execute(repo.update_seats(event_id, capacity=capacity))).one()
+                await session.commit()
+                return self._seats_response(event_id, seats.capacity, seats.registered)
+        if seats is None:
+            raise NotFoundException(f'Event {event_id} not found')
+        raise ConflictException(
+            f'{seats.registered} users are registered to event {event_id}, the capacity cannot be lower'
+        )
+
+    @staticmethod
+    def _seats_response(event_id: uuid.UUID, capacity: Optional[int], registered: int) -> EventSeatsResponse:
+        return EventSeatsResponse(
+            event_id=event_id,
+            capacity=capacity,
+            registered=registered,
+            available=None if capacity is None else capacity - registered,
+        )
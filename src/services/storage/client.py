@@ -0,0 +1,200 @@
+"""Object storage for files produced or received by the application: archives, exports, imports.
+
+Two backends with the same interface, picked with ``STORAGE_BACKEND``: a local directory for development
+and single host deployments, and MinIO or any S3 compatible service. Calls are blocking, run them in a
+thread from async code.
+"""
+
+import hashlib
+import hmac
+import io
+import os
+import shutil
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote, urlencode
+
+from minio import Minio
+from minio.error import S3Error
+
+from src.core.config import settings
+
+
+class StorageClient(ABC):
+    """Keys are ``/`` separated paths relative to the bucket (or the root directory).
+
+    Backends implement the abstract methods, the other capabilities are optional.
+    """
+
+    @abstractmethod
+    def put_bytes(self, key: str, data: bytes, content_type: str = 'application/octet-stream') -> None:
+        ...
+
+    @abstractmethod
+    def put_file(self, key: str, path: str, content_type: str = 'application/octet-stream') -> None:
+        ...
+
+    @abstractmethod
+    def get_bytes(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def get_file(self, key: str, path: str) -> None:
+        """Download ``key`` to the local file ``path``, without holding it in memory."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete ``key``, a missing key is not an error."""
+
+    @abstractmethod
+    def uri(self, key: str) -> str:
+        """Location of ``key`` for readers going to the storage directly, e.g. ``polars.scan_parquet``."""
+
+    def scan_options(self) -> Optional[dict[str, str]]:
+        """``storage_options`` of polars scans over :meth:`uri` locations."""
+        return None
+
+    def presigned_url(self, key: str, expires: timedelta) -> Optional[str]:
+        """Temporary download link to ``key``, ``None`` when the backend cannot serve files itself."""
+        return None
+
+    def verify_signature(self, key: str, expires: int, signature: str) -> bool:
+        """Whether a link of :meth:`presigned_url` served by the application itself is genuine and valid."""
+        return False
+
+
+class LocalStorageClient(StorageClient):
+    """Files under ``root``. Download links point to ``url_prefix``, the API route serving the files, and are
+    signed with ``signing_key`` so that any worker can check them."""
+
+    def __init__(self, root: str, signing_key: str = '', url_prefix: str = '/api/files'):
+        self.root = Path(root).resolve()
+        self.signing_key = signing_key.encode()
+        self.url_prefix = url_prefix
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root):
+            raise ValueError(f'Storage key {key} is outside of the storage root')
+        return path
+
+    def _write(self, key: str, write) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Readers never see a partial file
+        partial = path.with_name(f'.{path.name}.partial')
+        write(partial)
+        os.replace(partial, path)
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = 'application/octet-stream') -> None:
+        self._write(key, lambda partial: partial.write_bytes(data))
+
+    def put_file(self, key: str, path: str, content_type: str = 'application/octet-stream') -> None:
+        self._write(key, lambda partial: shutil.copyfile(path, partial))
+
+    def get_bytes(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def get_file(self, key: str, path: str) -> None:
+        shutil.copyfile(self._path(key), path)
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def uri(self, key: str) -> str:
+        return str(self._path(key))
+
+    def _signature(self, key: str, expires: int) -> str:
+        return hmac.new(self.signing_key, f'{key}\n{expires}'.encode(), hashlib.sha256).hexdigest()
+
+    def presigned_url(self, key: str, expires: timedelta) -> Optional[str]:
+        if not self.signing_key:
+            return None
+        deadline = int(time.time() + expires.total_seconds())
+        query = urlencode({'expires': deadline, 'signature': self._signature(key, deadline)})
+        return f'{self.url_prefix}/{quote(key)}?{query}'
+
+    def verify_signature(self, key: str, expires: int, signature: str) -> bool:
+        if not self.signing_key or expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(key, expires), signature)
+
+
+class MinioStorageClient(StorageClient):
+    def __init__(  # noqa: PLR0913
+        self, endpoint: str, access_key: str, secret_key: str, bucket: str, secure: bool, region: str
+    ):
+        self.endpoint = endpoint
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.bucket = bucket
+        self.secure = secure
+        self.region = region
+        self.client = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure, region=region)
+        self._bucket_checked = False
+
+    def _ensure_bucket(self) -> None:
+        if self._bucket_checked:
+            return
+        if not self.client.bucket_exists(self.bucket):
+            try:
+                self.client.make_bucket(self.bucket)
+            except S3Error as exc:
+                # Created by another worker in the meantime
+                if exc.code not in ('BucketAlreadyOwnedByYou', 'BucketAlreadyExists'):
+                    raise
+        self._bucket_checked = True
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = 'application/octet-stream') -> None:
+        self._ensure_bucket()
+        self.client.put_object(self.bucket, key, io.BytesIO(data), len(data), content_type=content_type)
+
+    def put_file(self, key: str, path: str, content_type: str = 'application/octet-stream') -> None:
+        self._ensure_bucket()
+        # Multipart upload for large files
+        self.client.fput_object(self.bucket, key, path, content_type=content_type)
+
+    def get_bytes(self, key: str) -> bytes:
+        response = self.client.get_object(self.bucket, key)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def get_file(self, key: str, path: str) -> None:
+        self.client.fget_object(self.bucket, key, path)
+
+    def delete(self, key: str) -> None:
+        self.client.remove_object(self.bucket, key)
+
+    def uri(self, key: str) -> str:
+        return f's3://{self.bucket}/{key}'
+
+    def scan_options(self) -> Optional[dict[str, str]]:
+        return {
+            'aws_endpoint_url': f'{"https" if self.secure else "http"}://{self.endpoint}',
+            'aws_access_key_id': self.access_key,
+            'aws_secret_access_key': self.secret_key,
+            'aws_region': self.region,
+            'aws_allow_http': str(not self.secure).lower(),
+        }
+
+    def presigned_url(self, key: str, expires: timedelta) -> Optional[str]:
+        return self.client.presigned_get_object(self.bucket, key, expires=expires)
+
+
+def create_storage_client() -> StorageClient:
+    if settings.STORAGE_BACKEND == 'minio':
+        return MinioStorageClient(
+            endpoint=settings.MINIO_ENDPOINT,
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            bucket=settings.STORAGE_BUCKET,
+            secure=settings.MINIO_SECURE,
+            region=settings.MINIO_REGION,
+        )
+    return LocalStorageClient(settings.STORAGE_LOCAL_ROOT, signing_key=settings.STORAGE_LOCAL_SIGNING_KEY)
@@ -0,0 +1,138 @@
+import asyncio
+import heapq
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.repos.user import SUGGEST_FIELDS, UserRepo
+from src.schemas.dto.user import Suggestion
+
+logger = get_logger(__name__)
+
+
+class PrefixIndex:
+    """Immutable, sorted snapshot of the distinct values of one column with their frequencies.
+
+    Values are sorted by their case-folded form so every prefix maps to a contiguous range found by
+    bisection. The top-K of short prefixes, which match the most values, are computed once up front.
+    """
+
+    __slots__ = ('_counts', '_keys', '_top', '_top_k', '_values')
+
+    def __init__(self, counts: Dict[str, int], top_k: int, precomputed_prefix_length: int):
+        self._top_k = top_k
+        items = sorted(counts.items(), key=lambda item: (item[0].casefold(), item[0]))
+        self._keys = [value.casefold() for value, _ in items]
+        self._values = [value for value, _ in items]
+        self._counts = [count for _, count in items]
+
+        candidates: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+        for key, value, count in zip(self._keys, self._values, self._counts):
+            for length in range(min(len(key), precomputed_prefix_length) + 1):
+                candidates[key[:length]].append((count, value))
+        self._top: Dict[str, List[Tuple[str, int]]] = {
+            prefix: [(value, count) for count, value in heapq.nlargest(top_k, entries)]
+            for prefix, entries in candidates.items()
+        }
+
+    def suggest(self, prefix: str, limit: int) -> List[Tuple[str, int]]:
+        key = prefix.casefold()
+        top = self._top.get(key)
+        # A list shorter than top_k already holds every value matching the prefix
+        if top is not None and (limit <= len(top) or len(top) < self._top_k):
+            return top[:limit]
+        lo = bisect_left(self._keys, key)
+        # Every key starting with the prefix sorts before prefix + the highest code point
+        hi = bisect_left(self._keys, key + '\U0010ffff', lo)
+        matches = zip(self._values[lo:hi], self._counts[lo:hi])
+        return heapq.nlargest(limit, matches, key=lambda match: match[1])
+
+
+class SuggestionService:
+    """Typeahead over the distinct values of a few low-cardinality user columns, served from memory.
+
+    The snapshot is fully built at startup and then refreshed incrementally: only the values of rows updated
+    after the watermark are recounted, and only the indexes of the fields with such values are rebuilt, in a
+    thread. The old value of an updated row is not known, so a value that lost users to an update (a user
+    moving from company A to B) keeps its inflated count, and a value left without users stays suggested,
+    until the next full rebuild: at most ``SUGGEST_FULL_REBUILD_INTERVAL_SECONDS``. Acceptable since counts
+    only rank the suggestions.
+    """
+
+    def __init__(self, user_repo: UserRepo):
+        self.user_repo = user_repo
+        self._counts: Dict[str, Dict[str, int]] = {field: {} for field in SUGGEST_FIELDS}
+        self._indexes: Dict[str, PrefixIndex] = {}
+        self._watermark: Optional[datetime] = None
+        self._rebuilt_at = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._indexes)
+
+    def suggest(self, field: str, prefix: str, limit: int) -> List[Suggestion]:
+        index = self._indexes.get(field)
+        if index is None:
+            return []
+        return [Suggestion(value=value, count=count) for value, count in index.suggest(prefix, limit)]
+
+    async def refresh(self) -> None:
+        if (
+            not self.ready
+            or self._watermark is None
+            or time.monotonic() - self._rebuilt_at > settings.SUGGEST_FULL_REBUILD_INTERVAL_SECONDS
+        ):
+            await self.rebuild()
+            return
+        await self._refresh_since_watermark()
+
+    async def rebuild(self) -> None:
+        async with self.user_repo.db.session() as session:
+            # Read the watermark first so changes made while counting are picked up by the next refresh
+            watermark = await session.scalar(self.user_repo.max_updated_at())
+            counts = {}
+            for field in SUGGEST_FIELDS:
+                rows = await session.execute(self.user_repo.value_counts(field))
+                counts[field] = dict(rows.tuples().all())
+        await self._publish(counts, watermark, list(SUGGEST_FIELDS))
+        self._rebuilt_at = time.monotonic()
+        logger.info(f'Suggestion snapshot rebuilt with {sum(map(len, counts.values()))} values')
+
+    async def _refresh_since_watermark(self) -> None:
+        since = self._watermark - timedelta(seconds=settings.SUGGEST_WATERMARK_OVERLAP_SECONDS)
+        async with self.user_repo.db.session() as session:
+            watermark = await session.scalar(self.user_repo.max_updated_at())
+            if watermark is None or watermark <= self._watermark:
+                return
+            counts = dict(self._counts)
+            fields = []
+            for field in SUGGEST_FIELDS:
+                changed = (await session.scalars(self.user_repo.values_updated_since(field, since))).all()
+                if not changed:
+                    continue
+                rows = await session.execute(self.user_repo.value_counts(field, changed))
+                counts[field] = {**counts[field], **dict.fromkeys(changed, 0), **dict(rows.tuples().all())}
+                counts[field] = {value: count for value, count in counts[field].items() if count}
+                fields.append(field)
+        await self._publish(counts, watermark, fields)
+
+    async def _publish(
+        self, counts: Dict[str, Dict[str, int]], watermark: Optional[datetime], fields: List[str]
+    ) -> None:
+        # Sorting a high-cardinality field takes long enough to stall every request of the worker
+        built = await asyncio.to_thread(self._build_indexes, {field: counts[field] for field in fields})
+        # Indexes are rebuilt off to the side and swapped in one assignment, readers never see a partial state
+        self._counts = counts
+        self._indexes = {**self._indexes, **built}
+        self._watermark = watermark or self._watermark
+
+    @staticmethod
+    def _build_indexes(counts: Dict[str, Dict[str, int]]) -> Dict[str, PrefixIndex]:
+        return {
+            field: PrefixIndex(values, settings.SUGGEST_TOP_K, settings.SUGGEST_PRECOMPUTED_PREFIX_LENGTH)
+            for field, values in counts.items()
+        }
@@ -1,38 +1,236 @@
-from typing import Tuple
+import asyncio
+import hashlib
+from typing import Dict, List, Optional, Tuple
 
+from sqlalchemy import Row, func, select
+
+from src.core.config import settings
+from src.core.db import explain
+from src.core.logger import get_logger
+from src.core.singleflight import SingleFlight
+from src.core.tracing import span
 from src.models.user import User
-from src.repos.user import UserRepo
-from src.schemas.dto.user import UserBase, UserFilterCriteria
+from src.repos.user import USER_RESPONSE_COLUMNS, UserRepo
+from src.schemas.dto.user import FacetCount, UserBase, UserFilterCriteria
+from src.schemas.exceptions.base import BadRequestException
+from src.services.user_index import UserIndex, UserSnapshot
+
+logger = get_logger(__name__)
+
+# UserBase field of every USER_RESPONSE_COLUMNS entry
+USER_RESPONSE_FIELDS = tuple(column.key for column in USER_RESPONSE_COLUMNS)
 
 
 class UserService:
-    def __init__(self, user_repo: UserRepo):
+    def __init__(
+        self,
+        user_repo: UserRepo,
+        search_flight: Optional[SingleFlight] = None,
+        user_index: Optional[UserIndex] = None,
+    ):
         self.user_repo = user_repo
+        self.search_flight = search_flight or SingleFlight('user_search')
+        self.user_index = user_index
 
     def construct_criteria() -> UserFilterCriteria:
         return None
 
+    def index_snapshot(self, criteria: UserFilterCriteria, engine: str = 'auto') -> Optional[UserSnapshot]:
+        """Snapshot of the in-memory index to serve ``criteria`` from, ``None`` when it goes to SQL."""
+        if self.user_index is None:
+            return None
+        return self.user_index.select(criteria, engine)
+
+    async def search_users(
+        self,
+        criteria: UserFilterCriteria,
+        snapshot: Optional[UserSnapshot] = None,
+    ) -> Tuple[int, list[UserBase], Optional[Dict[str, List[FacetCount]]], bool]:
+        """Run :meth:`filter_user` off the event loop, sharing it with identical concurrent searches.
+
+        Served from ``snapshot`` instead when one is given.
+        """
+        if snapshot is not None:
+            cnt, rows, facets, estimated = await asyncio.to_thread(
+                self.filter_user_in_memory, criteria, snapshot
+            )
+            return cnt, [UserBase(**dict(zip(USER_RESPONSE_FIELDS, row))) for row in rows], facets, estimated
+        return await self.search_flight.do(
+            ('users', criteria.model_dump_json()), lambda: asyncio.to_thread(self.filter_user, criteria)
+        )
+
+    async def search_user_rows(
+        self,
+        criteria: UserFilterCriteria,
+        snapshot: Optional[UserSnapshot] = None,
+    ) -> Tuple[int, list[Row], Optional[Dict[str, List[FacetCount]]], bool]:
+        if snapshot is not None:
+            return await asyncio.to_thread(self.filter_user_in_memory, criteria, snapshot)
+        return await self.search_flight.do(
+            ('rows', criteria.model_dump_json()), lambda: asyncio.to_thread(self.filter_user_rows, criteria)
+        )
+
+    def filter_user_in_memory(
+        self,
+        criteria: UserFilterCriteria,
+        snapshot: UserSnapshot,
+    ) -> Tuple[int, list[tuple], Optional[Dict[str, List[FacetCount]]], bool]:
+        """Same search as :meth:`filter_user_rows` over the in-memory index, counts are always exact."""
+        with span('users.index_search', version=snapshot.version) as searching:
+            cnt, rows, facets = snapshot.search(criteria)
+            if searching is not None:
+                searching.attributes['rows'] = len(rows)
+        return cnt, rows, facets, False
+
     def filter_user(
         self,
         criteria: UserFilterCriteria,
-    ) -> Tuple[int, list[UserBase]]:
+    ) -> Tuple[int, list[UserBase], Optional[Dict[str, List[FacetCount]]], bool]:
+        """Returns the total count, the page of users, the facet counts and whether the total is an estimate."""
+        with self.search_session() as session:
+            query, cnt, facets, estimated = self.prepare_search(session, criteria)
+            with span('users.page_query'):
+                records = session.execute(query).scalars().all()
+            with span('users.hydrate', rows=len(records)):
+                users = list(map(UserService.mapperUserModelToUserResponse, records))
+        return cnt, users, facets, estimated
 
-        with self.user_repo.db.sync_session() as session:
+    def filter_user_rows(
+        self,
+        criteria: UserFilterCriteria,
+    ) -> Tuple[int, list[Row], Optional[Dict[str, List[FacetCount]]], bool]:
+        """Same search as :meth:`filter_user` returning plain row tuples, for the binary encoders."""
+        with self.search_session() as session:
+            query, cnt, facets, estimated = self.prepare_search(session, criteria)
+            with span('users.page_query'):
+                rows = session.execute(query.with_entities(*USER_RESPONSE_COLUMNS)).all()
+        return cnt, rows, facets, estimated
+
+    def search_session(self):
+        return self.user_repo.db.sync_session(
+            statement_timeout=settings.USERS_STATEMENT_TIMEOUT_MS, lock_timeout=settings.USERS_LOCK_TIMEOUT_MS
+        )
+
+    def prepare_search(self, session, criteria: UserFilterCriteria):
+        """Count the matching users and build the page query.
+
+        The page query is checked with ``EXPLAIN`` first, searches the planner expects to be too expensive
+        are rejected before anything runs.
+        """
+        with span('users.build_query'):
             query = self.user_repo.retrieve_user_using_criteria(criteria=criteria)
-            print(query)
-            cnt = session.query(query.subquery()).count()
             offset = (criteria.page - 1) * criteria.page_size
-            query = self.user_repo.data_range(
+            page_query = self.user_repo.data_range(
                 query,
                 limit=criteria.page_size,
                 offset=offset,
                 sort_by=criteria.sort_by,
                 sort_order=criteria.sort_order,
+                q=criteria.q,
             )
+        if settings.USERS_MAX_PAGE_COST:
+            with span('users.cost_guard') as guard:
+                plan = explain(session, page_query.statement)
+                if guard is not None:
+                    guard.attributes['db.cost'] = plan['Total Cost']
+            if plan['Total Cost'] > settings.USERS_MAX_PAGE_COST:
+                logger.warning(f'Rejected user search with estimated cost {plan["Total Cost"]}: {criteria}')
+                raise BadRequestException('The search is too broad, add filters or pick a page closer to the start')
+
+        facets = None
+        estimated = False
+        if criteria.facets:
+            with span('users.facets', facets=','.join(criteria.facets)):
+                cnt, facets, estimated = self.count_facets(session, query, criteria)
+        else:
+            with span('users.count') as counting:
+                cnt, estimated = self.count_users(session, query)
+                if counting is not None:
+                    counting.attributes['estimated'] = estimated
+        return page_query, cnt, facets, estimated
+
+    def count_users(self, session, query) -> Tuple[int, bool]:
+        """Exact count of ``query``, or the planner's row estimate when counting would scan too much."""
+        if settings.USERS_EXACT_COUNT_MAX_COST:
+            plan = explain(session, query.statement)
+            if plan['Total Cost'] > settings.USERS_EXACT_COUNT_MAX_COST:
+                return int(plan['Plan Rows']), True
+        return session.query(query.subquery()).count(), False
+
+    def count_facets(
+        self, session, query, criteria: UserFilterCriteria
+    ) -> Tuple[int, Dict[str, List[FacetCount]], bool]:
+        """Total and facet counts of ``query``, and whether the total is an estimate."""
+        facets: Dict[str, List[FacetCount]] = {facet: [] for facet in criteria.facets}
+        total = 0
+        if not criteria.has_filters():
+            # Unfiltered facet counts are served from the periodically refreshed materialized view. The total
+            # is counted live like without facets, it must agree with the page
+            stm = self.user_repo.precomputed_facet_counts(criteria.facets, settings.FACET_MAX_VALUES)
+            for facet, value, cnt in session.execute(stm):
+                facets[facet].append(FacetCount(value=value, count=cnt))
+            total, estimated = self.count_users(session, query)
+            return total, facets, estimated
 
-            records = session.execute(query).scalars()
-            users = list(map(UserService.mapperUserModelToUserResponse, records))
-        return cnt, users
+        if settings.USERS_EXACT_COUNT_MAX_COST:
+            plan = explain(session, query.statement)
+            if plan['Total Cost'] > settings.USERS_EXACT_COUNT_MAX_COST:
+                # Unlike the total, facet counts have no cheap estimate to fall back to
+                raise BadRequestException('Too many users match to count facets, add filters or drop facets')
+        # The empty grouping set of the facet query carries the total, no separate count needed
+        stm = self.user_repo.facet_counts(query, criteria.facets, settings.FACET_MAX_VALUES)
+        for row in session.execute(stm).mappings():
+            facet = next((facet for facet in criteria.facets if row[f'g_{facet}'] == 0), None)
+            if facet is None:
+                total = row['cnt']
+            else:
+                facets[facet].append(FacetCount(value=row[facet], count=row['cnt']))
+        return total, facets, False
+
+    def user_etag(
+        self,
+        criteria: UserFilterCriteria,
+        media_type: str = 'application/json',
+        snapshot: Optional[UserSnapshot] = None,
+    ) -> str:
+        """Entity tag of a search result: the users data version combined with the normalized criteria.
+
+        Every representation (JSON, MessagePack, Arrow) of the same result gets its own tag, and so does each
+        engine. Results served from ``snapshot`` are tagged with the version it was read at.
+
+        Costs a primary key lookup and a count of the changes not folded yet, so it can be checked before
+        running the search itself.
+        """
+        if snapshot is not None:
+            version, engine = snapshot.version, 'memory'
+        else:
+            with self.search_session() as session:
+                version = session.scalar(self.user_repo.data_version()) or 0
+            engine = 'sql'
+        digest = hashlib.blake2b(
+            f'{media_type}:{engine}:{criteria.model_dump_json()}'.encode(), digest_size=12
+        ).hexdigest()
+        return f'"{version}-{digest}"'
+
+    async def refresh_facet_counts(self) -> bool:
+        """Refresh the ``user_facet_counts`` view, only one worker at a time does the work."""
+        async with self.user_repo.db.session() as session, session.begin():
+            locked = await session.scalar(select(func.pg_try_advisory_xact_lock(settings.FACET_REFRESH_LOCK_ID)))
+            if not locked:
+                return False
+            await session.execute(self.user_repo.refresh_facet_counts())
+        return True
+
+    async def fold_data_version(self) -> bool:
+        """Fold the users change log into the base of its data version, keeps the version cheap to read."""
+        async with self.user_repo.db.session() as session, session.begin():
+            locked = await session.scalar(
+                select(func.pg_try_advisory_xact_lock(settings.DATA_VERSION_FOLD_LOCK_ID))
+            )
+            if not locked:
+                return False
+            await session.execute(self.user_repo.fold_changes())
+        return True
 
     @staticmethod
     def mapperUserModelToUserResponse(user: User) -> UserBase:
@@ -43,8 +241,8 @@ class UserService:
             email=user.email,
             company_name=user.company_name,
             job_title=user.job_title,
-            city='newyork',
-            state='carolina',
+            city=user.city,
+            state=user.state,
             crm_status=user.crm_status,
             created_at=user.created_at,
             last_activity_at=user.last_activity_at,
@@ -0,0 +1,138 @@
+"""XLSX exports of users, run as a background job.
+
+The ``export_users`` job streams the matching users from a server-side cursor, ``USERS_EXPORT_BATCH_SIZE``
+rows at a time, into an xlsxwriter workbook in ``constant_memory`` mode: each row is flushed to a temporary
+file as soon as it is written, so the memory held is one batch of rows whatever the size of the export. The
+finished file is uploaded to the storage (a multipart upload on MinIO) and the job result carries a download
+link valid for ``USERS_EXPORT_LINK_EXPIRY_SECONDS``. ``tests/test_user_export.py`` checks the bound.
+"""
+
+import asyncio
+import datetime
+import os
+import tempfile
+from collections.abc import Iterable, Sequence
+from typing import Any, Optional
+
+import xlsxwriter
+
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.repos.user import USER_EXPORT_COLUMNS, UserRepo
+from src.schemas.dto.user import UserExportRequest
+from src.services.job import JobContext
+from src.services.storage.client import StorageClient
+
+logger = get_logger(__name__)
+
+EXPORT_JOB_KIND = 'export_users'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Rows of a worksheet, the header included, the export continues on a new sheet past it
+MAX_SHEET_ROWS = 1_048_576
+COLUMN_WIDTHS = {'user_id': 38, 'email': 32, 'company_name': 28, 'last_activity_at': 20, 'created_at': 20}
+
+
+def write_xlsx(path: str, header: Sequence[str], batches: Iterable[Sequence[Sequence[Any]]]) -> int:
+    """Write the rows of ``batches`` under ``header`` to a new workbook at ``path``, returns the row count.
+
+    Rows must be written in order in ``constant_memory`` mode, one sheet is filled before the next starts.
+    Timestamps are written without their time zone, they are UTC.
+    """
+    workbook = xlsxwriter.Workbook(
+        path,
+        {
+            'constant_memory': True,
+            'tmpdir': os.path.dirname(os.path.abspath(path)),
+            'remove_timezone': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+            # Cell values are data, never formulas or links, whatever they start with
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+        },
+    )
+    bold = workbook.add_format({'bold': True})
+    worksheet, row, rows = None, MAX_SHEET_ROWS, 0
+    try:
+        for batch in batches:
+            for values in batch:
+                if row == MAX_SHEET_ROWS:
+                    worksheet = workbook.add_worksheet(f'Users {len(workbook.worksheets()) + 1}')
+                    worksheet.freeze_panes(1, 0)
+                    for position, name in enumerate(header):
+                        worksheet.set_column(position, position, COLUMN_WIDTHS.get(name, 16))
+                    worksheet.write_row(0, 0, header, bold)
+                    row = 1
+                worksheet.write_row(row, 0, values)
+                row += 1
+                rows += 1
+        if worksheet is None:
+            worksheet = workbook.add_worksheet('Users 1')
+            worksheet.write_row(0, 0, header, bold)
+    finally:
+        workbook.close()
+    return rows
+
+
+class UserExportService:
+    def __init__(self, user_repo: UserRepo, storage: StorageClient):
+        self.user_repo = user_repo
+        self.storage = storage
+
+    async def export_users(self, ctx: JobContext) -> dict[str, Any]:
+        """Job handler writing the users matching the payload filters to an XLSX file in the storage.
+
+        Payload: the fields of :class:`UserExportRequest`, ``batch_size`` (optional).
+        """
+        batch_size = int(ctx.payload.get('batch_size', settings.USERS_EXPORT_BATCH_SIZE))
+        request = UserExportRequest.model_validate(
+            {name: value for name, value in ctx.payload.items() if name != 'batch_size'}
+        )
+        storage_key = f'{settings.USERS_EXPORT_PREFIX}/{ctx.job_id}.xlsx'
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.xlsx')
+            rows = await asyncio.to_thread(self._write, ctx, request, path, batch_size)
+            size = os.path.getsize(path)
+            await asyncio.to_thread(self.storage.put_file, storage_key, path, XLSX_CONTENT_TYPE)
+        download_url, expires_at = await asyncio.to_thread(self.download_link, storage_key)
+        logger.info(f'Exported {rows} users to {storage_key} ({size} bytes)')
+        return {
+            'rows': rows,
+            'bytes': size,
+            'storage_key': storage_key,
+            'download_url': download_url,
+            'expires_at': expires_at.isoformat() if expires_at else None,
+        }
+
+    def _write(self, ctx: JobContext, request: UserExportRequest, path: str, batch_size: int) -> int:
+        stm = self.user_repo.export_rows(request.criteria())
+        with self.user_repo.db.sync_session() as session:
+            # The count and the rows come from the same snapshot
+            session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+            try:
+                ctx.progress(0, session.scalar(self.user_repo.count_of(stm)))
+                # yield_per streams from a server-side cursor, one batch of rows in memory at a time
+                result = session.execute(stm.execution_options(yield_per=batch_size))
+                done = 0
+
+                def batches():
+                    nonlocal done
+                    for part in result.partitions():
+                        # The job was cancelled, its task is gone and the file is dropped
+                        if ctx.cancelled:
+                            return
+                        yield part
+                        done += len(part)
+                        ctx.progress(done)
+
+                header = [column.name for column in USER_EXPORT_COLUMNS]
+                return write_xlsx(path, header, batches())
+            finally:
+                session.rollback()
+
+    def download_link(self, storage_key: str) -> tuple[Optional[str], Optional[datetime.datetime]]:
+        """A fresh download link to an export and its expiry, ``(None, None)`` if the storage gives none."""
+        expiry = datetime.timedelta(seconds=settings.USERS_EXPORT_LINK_EXPIRY_SECONDS)
+        url = self.storage.presigned_url(storage_key, expiry)
+        if url is None:
+            return None, None
+        return url, datetime.datetime.now(datetime.UTC) + expiry
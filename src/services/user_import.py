@@ -0,0 +1,347 @@
+"""Bulk import of users from CSV and XLSX files.
+
+The upload is stored as is and the ``import_users`` job reads it back in batches of
+``USERS_IMPORT_BATCH_SIZE`` rows: CSV with the batched polars reader, XLSX with openpyxl in read-only mode,
+which streams the rows of the sheet where fastexcel loads the whole sheet at once. Memory follows the batch
+size, not the file size.
+
+Each batch is validated with polars expressions over the whole frame, then its valid rows are loaded with
+``COPY`` into a temporary staging table and upserted on the unique email, in one transaction per batch. A row
+that fails validation is written to an error report with the reason and does not stop the import. Batches
+are idempotent, a job retried after a failure writes again what it wrote before.
+"""
+
+import asyncio
+import datetime
+import io
+import itertools
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from collections import Counter
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, Optional
+
+import openpyxl
+import polars as pl
+from fastapi import UploadFile
+from openpyxl.utils.exceptions import InvalidFileException
+
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.repos.user import IMPORT_COLUMNS, IMPORT_REQUIRED, UserRepo
+from src.schemas.exceptions.base import (
+    BadRequestException,
+    BadRequestExceptionWithDetails,
+    InternalErrorCode,
+)
+from src.services.job import JobContext
+from src.services.storage.client import StorageClient
+from src.utils.ids import uuid7
+
+logger = get_logger(__name__)
+
+IMPORT_JOB_KIND = 'import_users'
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Other names of the columns found in CRM exports, after normalize_header
+HEADER_ALIASES = {
+    'email_address': 'email',
+    'e_mail': 'email',
+    'first': 'first_name',
+    'firstname': 'first_name',
+    'last': 'last_name',
+    'lastname': 'last_name',
+    'phone': 'phone_number',
+    'company': 'company_name',
+    'title': 'job_title',
+    'status': 'crm_status',
+    'source': 'lead_source',
+    'last_activity': 'last_activity_at',
+}
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+# Tried in order once a trailing Z is turned into +00:00 and a space separator into T, naive values are UTC
+DATETIME_FORMATS = ('%Y-%m-%dT%H:%M:%S%.f%#z', '%Y-%m-%dT%H:%M:%S%.f', '%Y-%m-%dT%H:%M', '%Y-%m-%d')
+ERROR_REPORT_SCHEMA = pl.Schema({'row': pl.Int64, 'email': pl.String, 'error': pl.String})
+
+
+def normalize_header(name: Any) -> str:
+    """``"E-mail Address "`` -> ``e_mail_address``, then the canonical column name when it is an alias."""
+    name = re.sub(r'[^a-z0-9]+', '_', str(name or '').strip().lower()).strip('_')
+    return HEADER_ALIASES.get(name, name)
+
+
+def resolve_columns(header: list[str]) -> dict[str, str]:
+    """Header name -> import column, for the header names that are import columns."""
+    columns: dict[str, str] = {}
+    for name in header:
+        column = normalize_header(name)
+        if column not in IMPORT_COLUMNS:
+            continue
+        if column in columns.values():
+            raise BadRequestExceptionWithDetails(
+                f'Several columns of the file are {column}',
+                details={'column': column, 'header': header},
+                internal_error_code=InternalErrorCode.INVALID_DATA,
+            )
+        columns[name] = column
+    if missing := [column for column in IMPORT_REQUIRED if column not in columns.values()]:
+        raise BadRequestExceptionWithDetails(
+            f'Missing required columns: {", ".join(missing)}',
+            details={'missing': missing, 'header': header},
+            internal_error_code=InternalErrorCode.MISSING_COLUMN,
+        )
+    return columns
+
+
+def _cell(value: Any) -> Optional[str]:
+    """An XLSX cell as the text it would be in a CSV export."""
+    if value is None:
+        return None
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    # Phone numbers typed as numbers come back as floats
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _open_sheet(workbook, sheet: Optional[str]):
+    if sheet is None:
+        return workbook.worksheets[0]
+    if sheet not in workbook.sheetnames:
+        raise BadRequestExceptionWithDetails(
+            f'Sheet {sheet} not found',
+            details={'sheet': sheet, 'sheets': workbook.sheetnames},
+            internal_error_code=InternalErrorCode.MISSING_SHEET,
+        )
+    return workbook[sheet]
+
+
+def _xlsx_batches(path: str, sheet: Optional[str], batch_size: int) -> Iterator[pl.DataFrame]:
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = _open_sheet(workbook, sheet).iter_rows(values_only=True)
+        header = [_cell(value) or f'column_{position}' for position, value in enumerate(next(rows, ()))]
+        width = len(header)
+        for chunk in itertools.batched(rows, batch_size):
+            # Trailing empty cells may be left out of a row
+            values = [row[:width] + (None,) * (width - len(row)) for row in chunk]
+            yield pl.DataFrame(
+                {name: [_cell(row[position]) for row in values] for position, name in enumerate(header)},
+                schema=dict.fromkeys(header, pl.String),
+            )
+    finally:
+        workbook.close()
+
+
+def _csv_batches(path: str, batch_size: int) -> Iterator[pl.DataFrame]:
+    reader = pl.read_csv_batched(
+        path, infer_schema_length=0, batch_size=batch_size, truncate_ragged_lines=True, encoding='utf8-lossy'
+    )
+    while frames := reader.next_batches(1):
+        # Batches are cut on file chunks, the row count is only a hint
+        for frame in frames:
+            yield from frame.iter_slices(batch_size)
+
+
+def read_header(path: str, file_format: str, sheet: Optional[str] = None) -> list[str]:
+    """Column names of the first row. Raises :class:`BadRequestException` on an empty or unreadable file."""
+    try:
+        if file_format == 'csv':
+            header = pl.read_csv(path, n_rows=0, infer_schema_length=0, encoding='utf8-lossy').columns
+        else:
+            workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+            try:
+                first = next(_open_sheet(workbook, sheet).iter_rows(values_only=True, max_row=1), ())
+                header = [_cell(value) or f'column_{position}' for position, value in enumerate(first)]
+            finally:
+                workbook.close()
+    except pl.exceptions.NoDataError:
+        header = []
+    except (pl.exceptions.ComputeError, InvalidFileException, zipfile.BadZipFile, KeyError, OSError) as exc:
+        raise BadRequestException(f'Could not read the file as {file_format.upper()}: {exc}') from exc
+    if not header:
+        raise BadRequestExceptionWithDetails(
+            'The file is empty', details={}, internal_error_code=InternalErrorCode.EMPTY_FILE
+        )
+    return header
+
+
+def read_batches(
+    path: str, file_format: str, sheet: Optional[str], batch_size: int
+) -> Iterator[pl.DataFrame]:
+    """Frames of at most ``batch_size`` rows, in file order, every column a string named after the header."""
+    if file_format == 'csv':
+        return _csv_batches(path, batch_size)
+    return _xlsx_batches(path, sheet, batch_size)
+
+
+def validate(frame: pl.DataFrame) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Split a batch into the rows to upsert, in :data:`IMPORT_COLUMNS` order, and the rejected ones.
+
+    ``frame`` has a ``row`` column and import columns, all strings. Rejected rows come as
+    ``row, email, error``, ``error`` listing every problem of the row. Blank rows are in neither.
+    """
+    names = list(IMPORT_COLUMNS)
+    frame = frame.with_columns(
+        pl.lit(None, dtype=pl.String).alias(name) for name in names if name not in frame.columns
+    )
+    # Surrounding spaces dropped, blank cells are missing values
+    frame = frame.with_columns(
+        pl.when(pl.col(name).str.strip_chars() != '').then(pl.col(name).str.strip_chars()).alias(name)
+        for name in names
+    ).filter(pl.any_horizontal(pl.col(names).is_not_null()))
+
+    text = pl.col('last_activity_at').str.replace(r'Z$', '+00:00').str.replace(' ', 'T', literal=True)
+    last_activity_at = pl.coalesce(
+        text.str.to_datetime(fmt, time_zone='UTC', strict=False) for fmt in DATETIME_FORMATS
+    )
+    checks = [pl.when(pl.col(name).is_null()).then(pl.lit(f'{name} is missing')) for name in IMPORT_REQUIRED]
+    checks += [
+        pl.when(pl.col(name).str.len_chars() > length).then(
+            pl.lit(f'{name} is longer than {length} characters')
+        )
+        for name, length in IMPORT_COLUMNS.items()
+        if length is not None
+    ]
+    checks += [
+        pl.when(~pl.col('email').str.contains(EMAIL_PATTERN)).then(pl.lit('email is not a valid address')),
+        pl.when(pl.col('last_activity_at').is_not_null() & last_activity_at.is_null()).then(
+            pl.lit('last_activity_at is not a date')
+        ),
+    ]
+    frame = frame.with_columns(
+        pl.concat_str(checks, separator='; ', ignore_nulls=True).alias('error'),
+        last_activity_at.alias('last_activity_at'),
+    )
+    invalid = frame.filter(pl.col('error') != '')
+    valid = frame.filter(pl.col('error') == '')
+
+    # One statement cannot write a row twice, the last occurrence of an email in the batch wins
+    latest = pl.col('email').is_last_distinct()
+    # Taken before the winning rows are filtered out of the repeated ones
+    valid = valid.with_columns(pl.col('row').last().over('email').alias('imported_row'))
+    repeated = valid.filter(~latest).with_columns(
+        pl.format('email appears again on row {}, which is imported', pl.col('imported_row')).alias('error')
+    )
+    rejected = pl.concat(
+        [part.select(ERROR_REPORT_SCHEMA.names()) for part in (invalid, repeated)]
+    ).sort('row')
+    return valid.filter(latest).select(names), rejected
+
+
+class UserImportService:
+    def __init__(self, user_repo: UserRepo, storage: StorageClient):
+        self.user_repo = user_repo
+        self.storage = storage
+
+    async def store_upload(self, file: UploadFile, sheet: Optional[str] = None) -> dict[str, Any]:
+        """Check the header of an uploaded file and store it, returns the payload of its import job."""
+        suffix = Path(file.filename or '').suffix.lower()
+        file_format = suffix.lstrip('.')
+        if file_format not in CONTENT_TYPES:
+            raise BadRequestException(f'Unsupported file type {suffix or "(none)"}, expected .csv or .xlsx')
+        if file.size is not None and file.size > settings.USERS_IMPORT_MAX_FILE_BYTES:
+            raise BadRequestException(f'The file is larger than {settings.USERS_IMPORT_MAX_FILE_BYTES} bytes')
+        storage_key = f'{settings.USERS_IMPORT_PREFIX}/{uuid7()}{suffix}'
+
+        def store() -> list[str]:
+            with tempfile.NamedTemporaryFile(suffix=suffix) as upload:
+                shutil.copyfileobj(file.file, upload)
+                upload.flush()
+                columns = resolve_columns(read_header(upload.name, file_format, sheet))
+                self.storage.put_file(storage_key, upload.name, content_type=CONTENT_TYPES[file_format])
+            return list(columns.values())
+
+        columns = await asyncio.to_thread(store)
+        logger.info(f'Stored users import {file.filename} as {storage_key}, columns {", ".join(columns)}')
+        return {'storage_key': storage_key, 'format': file_format, 'sheet': sheet, 'filename': file.filename}
+
+    async def import_users(self, ctx: JobContext) -> dict[str, Any]:
+        """Job handler upserting the users of a stored CSV / XLSX file.
+
+        Payload: ``storage_key``, ``format`` (``csv`` or ``xlsx``), ``sheet`` (optional, the first one by
+        default), ``batch_size`` (optional).
+        """
+        storage_key, file_format = ctx.payload['storage_key'], ctx.payload['format']
+        batch_size = int(ctx.payload.get('batch_size', settings.USERS_IMPORT_BATCH_SIZE))
+        totals: Counter = Counter()
+        errors: list[dict[str, Any]] = []
+        errors_key = None
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'users.{file_format}')
+            await asyncio.to_thread(self.storage.get_file, storage_key, path)
+            header = await asyncio.to_thread(read_header, path, file_format, ctx.payload.get('sheet'))
+            columns = resolve_columns(header)
+            batches = read_batches(path, file_format, ctx.payload.get('sheet'), batch_size)
+            report_path = os.path.join(directory, 'errors.csv')
+            with open(report_path, 'wb') as report:
+                while True:
+                    # One batch per thread hop, a cancellation stops the job between two committed batches
+                    batch = await asyncio.to_thread(self._import_batch, batches, columns, totals['rows'])
+                    if batch is None:
+                        break
+                    counts, rejected = batch
+                    totals.update(counts)
+                    if not rejected.is_empty():
+                        rejected.write_csv(report, include_header=totals['rejected'] == 0)
+                        totals['rejected'] += rejected.height
+                        room = settings.USERS_IMPORT_MAX_REPORTED_ERRORS - len(errors)
+                        errors.extend(rejected.head(max(room, 0)).to_dicts())
+                    ctx.progress(totals['rows'])
+            if totals['rejected']:
+                errors_key = f'{settings.USERS_IMPORT_PREFIX}/{ctx.job_id}.errors.csv'
+                await asyncio.to_thread(self.storage.put_file, errors_key, report_path, 'text/csv')
+        await asyncio.to_thread(self.storage.delete, storage_key)
+
+        logger.info(
+            f'Imported {ctx.payload.get("filename") or storage_key}: {totals["inserted"]} users inserted, '
+            f'{totals["updated"]} updated, {totals["rejected"]} rows rejected out of {totals["rows"]}'
+        )
+        return {
+            'rows': totals['rows'],
+            'inserted': totals['inserted'],
+            'updated': totals['updated'],
+            'unchanged': totals['upserted'] - totals['inserted'] - totals['updated'],
+            'rejected': totals['rejected'],
+            'ignored_columns': [name for name in header if name not in columns],
+            'errors': errors,
+            'errors_key': errors_key,
+        }
+
+    def _import_batch(
+        self, batches: Iterator[pl.DataFrame], columns: dict[str, str], done: int
+    ) -> Optional[tuple[Counter, pl.DataFrame]]:
+        frame = next(batches, None)
+        if frame is None:
+            return None
+        # Row numbers of the file, the header is row 1
+        frame = frame.select(pl.col(name).alias(column) for name, column in columns.items()).with_row_index(
+            'row', offset=done + 2
+        )
+        valid, rejected = validate(frame.with_columns(pl.col('row').cast(pl.Int64)))
+        counts = Counter(rows=frame.height, upserted=valid.height)
+        if valid.is_empty():
+            return counts, rejected
+
+        buffer = io.BytesIO()
+        valid.write_csv(buffer, include_header=False)
+        buffer.seek(0)
+        repo = self.user_repo
+        with repo.db.sync_session(lock_timeout=settings.USERS_LOCK_TIMEOUT_MS) as session:
+            session.execute(repo.create_import_staging())
+            cursor = session.connection().connection.cursor()
+            try:
+                cursor.copy_expert(repo.copy_import_staging(), buffer)
+            finally:
+                cursor.close()
+            counts['inserted'] = session.execute(repo.insert_from_import_staging()).rowcount
+            counts['updated'] = session.execute(repo.update_from_import_staging()).rowcount
+            session.commit()
+        return counts, rejected
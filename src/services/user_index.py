@@ -0,0 +1,478 @@
+"""In-memory columnar index of the users table, serving ``/api/users`` filters without Postgres.
+
+The index is a snapshot of the columns the filters, sorts, facets and responses read, rows in id order. The
+string columns the filters and facets read are dictionary encoded: a code per row into the sorted distinct
+values, so a partial match runs its pattern once per distinct value and maps the result to the rows with one
+gather. The numeric and date sorts are precomputed as permutations, string sorts are computed on first use.
+
+One worker per host, the publisher, brings the snapshot up to date from the ``updated_at`` watermark: changed
+rows replace their old version by id, a full rebuild runs when the row counts disagree (deleted users) and
+periodically. It publishes the snapshot to the :class:`SnapshotStore` and every worker memory-maps it, so
+the columns are held once per host and workers start without reading the table. Each snapshot carries the
+users data version it was read at. Requests are served from memory only while the snapshot was found up to
+date recently enough, otherwise in SQL, and searches the index cannot answer exactly like Postgres (full-text
+``q``, string sorts under a linguistic collation) always go to SQL.
+"""
+
+import asyncio
+import functools
+import operator
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import polars as pl
+from sqlalchemy import Select, String
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.core.snapshots import Snapshot, SnapshotStore
+from src.models.user import User
+from src.repos.user import SORT_COLUMNS, UserRepo
+from src.schemas.dto.user import DateRange, FacetCount, NumRange, UserFilterCriteria
+
+logger = get_logger(__name__)
+
+INDEX_SCHEMA = pl.Schema(
+    {
+        'id': pl.String,
+        'first_name': pl.String,
+        'last_name': pl.String,
+        'email': pl.String,
+        'company_name': pl.String,
+        'job_title': pl.String,
+        'city': pl.String,
+        'state': pl.String,
+        'crm_status': pl.String,
+        'lead_source': pl.String,
+        'created_at': pl.Datetime('us'),
+        'last_activity_at': pl.Datetime('us', 'UTC'),
+        'number_events_hosted': pl.Int32,
+        'number_events_attended': pl.Int32,
+        'updated_at': pl.Datetime('us'),
+    }
+)
+# Frame columns of USER_RESPONSE_COLUMNS, in the same order
+RESPONSE_COLUMNS = (
+    'id',
+    'first_name',
+    'last_name',
+    'email',
+    'company_name',
+    'job_title',
+    'city',
+    'state',
+    'crm_status',
+    'created_at',
+    'last_activity_at',
+)
+# Matched with ILIKE or counted as facets
+ENCODED_COLUMNS = ('company_name', 'job_title', 'city', 'state', 'crm_status', 'lead_source')
+PARTIAL_MATCH_FILTERS = ('company_name', 'job_title', 'city')
+RANGE_FILTERS = (('event_hosted', 'number_events_hosted'), ('event_attended', 'number_events_attended'))
+DATE_RANGE_FILTERS = (('last_activity', 'last_activity_at'), ('created', 'created_at'))
+STRING_SORTS = {key for key, column in SORT_COLUMNS.items() if isinstance(column.type, String)}
+# Cheap to compute for the publisher, shared by every worker
+PRESORTED = [
+    (key, descending) for key in SORT_COLUMNS if key not in STRING_SORTS for descending in (False, True)
+]
+CODE_PREFIX = '_code:'
+USERS_SNAPSHOT = 'users'
+# Strings whose order differs between byte order and the usual linguistic collations
+COLLATION_PROBE = ['a', 'A', 'b', 'B', 'Z', 'ab', 'a b', 'a-c', 'a_b', 'e', 'é', 'f', '1', '_', ' ']
+READ_BATCH_SIZE = 50_000
+
+# Characters with a meaning in regular expressions, escaped when they appear literally in a LIKE pattern
+_REGEX_META = frozenset('\\.+*?()|[]{}^$#&-~')
+
+
+def like_to_regex(pattern: str) -> str:
+    """Translate an ``ILIKE`` pattern (``%``, ``_``, ``\\`` escape) to an anchored, case-insensitive regex."""
+    parts = []
+    chars = iter(pattern)
+    for char in chars:
+        if char == '%':
+            parts.append('.*')
+        elif char == '_':
+            parts.append('.')
+        else:
+            literal = next(chars, '\\') if char == '\\' else char
+            parts.append(f'\\{literal}' if literal in _REGEX_META else literal)
+    return f'(?is)^{"".join(parts)}$'
+
+
+def _order_name(sort_by: str, descending: bool) -> str:
+    return f'{sort_by}:{"desc" if descending else "asc"}'
+
+
+class UserSnapshot:
+    """Immutable columnar copy of the users table at data version ``version``, rows in id order.
+
+    ``checked_at`` (epoch seconds) is the last time the snapshot was found up to date with the database,
+    ``token`` identifies the published version it was loaded from.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        frame: pl.DataFrame,
+        version: int,
+        byte_order_strings: bool,
+        checked_at: Optional[float] = None,
+        rebuilt_at: Optional[float] = None,
+        codes: Optional[Dict[str, Tuple[pl.Series, pl.Series]]] = None,
+        orders: Optional[pl.DataFrame] = None,
+        token: Optional[str] = None,
+    ):
+        self.frame = frame
+        self.version = version
+        # Whether the database sorts strings by code point, like polars does
+        self.byte_order_strings = byte_order_strings
+        self.checked_at = time.time() if checked_at is None else checked_at
+        self.rebuilt_at = self.checked_at if rebuilt_at is None else rebuilt_at
+        self.token = token
+        self.watermark: Optional[datetime] = frame['updated_at'].max()
+        if codes is None:
+            codes = {name: self._encode(frame[name]) for name in ENCODED_COLUMNS}
+        self._codes = codes
+        self._presorted = orders
+        self._orders: Dict[Tuple[str, bool], pl.Series] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _encode(series: pl.Series) -> Tuple[pl.Series, pl.Series]:
+        """Codes into the sorted distinct values, null for null."""
+        dictionary = series.drop_nulls().unique().sort()
+        codes = (series.rank('dense') - 1).cast(pl.UInt32)
+        return codes, dictionary
+
+    # --- Publication ---
+
+    def to_frames(self) -> Dict[str, pl.DataFrame]:
+        """Parts of the published snapshot: the rows with their codes, the dictionaries and the presorts."""
+        return {
+            'users': self.frame.with_columns(
+                codes.alias(f'{CODE_PREFIX}{name}') for name, (codes, _) in self._codes.items()
+            ),
+            'dictionaries': pl.concat(
+                [pl.DataFrame({'value': dictionary}) for _, dictionary in self._codes.values()]
+            ),
+            'orders': pl.DataFrame({_order_name(*key): self.order(*key) for key in PRESORTED}),
+        }
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'byte_order_strings': self.byte_order_strings,
+            'checked_at': self.checked_at,
+            'rebuilt_at': self.rebuilt_at,
+            'dictionary_lengths': {name: dictionary.len() for name, (_, dictionary) in self._codes.items()},
+        }
+
+    @classmethod
+    def from_published(cls, snapshot: Snapshot) -> 'UserSnapshot':
+        """Snapshot over the memory-mapped parts of ``snapshot``, nothing is copied."""
+        users = snapshot.frames['users']
+        values = snapshot.frames['dictionaries']['value']
+        codes = {}
+        offset = 0
+        for name, length in snapshot.meta['dictionary_lengths'].items():
+            codes[name] = (users[f'{CODE_PREFIX}{name}'].alias(name), values.slice(offset, length))
+            offset += length
+        return cls(
+            users.select(INDEX_SCHEMA.names()),
+            snapshot.meta['version'],
+            snapshot.meta['byte_order_strings'],
+            checked_at=snapshot.meta['checked_at'],
+            rebuilt_at=snapshot.meta['rebuilt_at'],
+            codes=codes,
+            orders=snapshot.frames['orders'],
+            token=snapshot.token,
+        )
+
+    # --- Search ---
+
+    @property
+    def height(self) -> int:
+        return self.frame.height
+
+    def age(self) -> float:
+        return time.time() - self.checked_at
+
+    def can_serve(self, criteria: UserFilterCriteria) -> bool:
+        """Whether the snapshot gives the same answer as SQL for ``criteria``."""
+        # Full-text matching and ranking follow the tsvector parser, only Postgres has it
+        if criteria.q:
+            return False
+        sort_by = criteria.sort_by if criteria.sort_by in SORT_COLUMNS else 'email'
+        return sort_by not in STRING_SORTS or self.byte_order_strings
+
+    def search(
+        self, criteria: UserFilterCriteria
+    ) -> Tuple[int, list[tuple], Optional[Dict[str, List[FacetCount]]]]:
+        """Total count, page rows (as USER_RESPONSE_COLUMNS tuples) and facet counts of ``criteria``."""
+        mask = self.mask(criteria)
+        order = self.order(criteria.sort_by, criteria.sort_order == 'desc')
+        selected = order if mask is None else order.filter(mask.gather(order))
+        page = selected.slice((criteria.page - 1) * criteria.page_size, criteria.page_size)
+        rows = [
+            (uuid.UUID(row[0]), *row[1:])
+            for row in self.frame.select(pl.col(RESPONSE_COLUMNS).gather(page)).iter_rows()
+        ]
+        facets = self.facets(mask, criteria.facets, settings.FACET_MAX_VALUES) if criteria.facets else None
+        return len(selected), rows, facets
+
+    def mask(self, criteria: UserFilterCriteria) -> Optional[pl.Series]:
+        """Rows matching the filters of ``criteria``, ``None`` when nothing is filtered.
+
+        Same conditions as :meth:`UserRepo.retrieve_user_using_criteria`, except the full-text ``q``.
+        """
+        masks = [
+            self._like(field, f'%{value}%')
+            for field in PARTIAL_MATCH_FILTERS
+            if (value := getattr(criteria, field))
+        ]
+        if criteria.state:
+            masks.append(self._like('state', criteria.state))
+        for field, column in RANGE_FILTERS:
+            masks.extend(self._range_masks(column, getattr(criteria, field)))
+        if criteria.crm_status:
+            masks.append(self._equals('crm_status', criteria.crm_status))
+        for field, column in DATE_RANGE_FILTERS:
+            masks.extend(self._date_range_masks(column, getattr(criteria, field)))
+        return functools.reduce(operator.and_, masks) if masks else None
+
+    def _range_masks(self, column: str, bounds: Optional[NumRange]) -> List[pl.Series]:
+        if not bounds:
+            return []
+        masks = []
+        if bounds.min_number:
+            masks.append(self.frame[column] > bounds.min_number)
+        if bounds.max_number:
+            masks.append(self.frame[column] < bounds.max_number)
+        return masks
+
+    def _date_range_masks(self, column: str, bounds: Optional[DateRange]) -> List[pl.Series]:
+        if not bounds:
+            return []
+        values = self.frame[column]
+        # Bounds are aware UTC, naive columns hold UTC
+        naive = values.dtype.time_zone is None
+        masks = []
+        for bound, compare in ((bounds.start, operator.ge), (bounds.end, operator.lt)):
+            if bound:
+                value = bound.replace(tzinfo=None) if naive else bound
+                # Null timestamps never match, like NULL comparisons in SQL
+                masks.append(compare(values, value).fill_null(False))
+        return masks
+
+    def _equals(self, column: str, value: str) -> pl.Series:
+        codes, dictionary = self._codes[column]
+        return (dictionary == value).gather(codes).fill_null(False)
+
+    def _like(self, column: str, pattern: str) -> pl.Series:
+        codes, dictionary = self._codes[column]
+        matched = dictionary.str.contains(like_to_regex(pattern))
+        # Null codes gather null, and NULL ILIKE never matches
+        return matched.gather(codes).fill_null(False)
+
+    def order(self, sort_by: str, descending: bool) -> pl.Series:
+        """Row positions in the order of :meth:`UserRepo.data_range`, cached per sort."""
+        key = (sort_by, descending)
+        order = self._orders.get(key)
+        if order is None and self._presorted is not None and (name := _order_name(*key)) in self._presorted:
+            return self._presorted[name]
+        if order is None:
+            with self._lock:
+                order = self._orders.get(key)
+                if order is None:
+                    column = SORT_COLUMNS.get(sort_by, User.email).key
+                    order = self._orders[key] = self._sort(column, descending)
+        return order
+
+    def warm(self, sorts: List[Tuple[str, bool]]) -> None:
+        """Compute the permutations of ``sorts`` ahead of the first search using them."""
+        for sort_by, descending in sorts:
+            self.order(sort_by, descending)
+
+    @property
+    def sorts(self) -> List[Tuple[str, bool]]:
+        return list(self._orders)
+
+    def _sort(self, column: str, descending: bool) -> pl.Series:
+        # Postgres puts nulls last ascending and first descending. Rows are in id order (the text form of a
+        # uuid is lowercase hex, it sorts like the uuid), a stable sort breaks ties by id like data_range
+        return self.frame.select(
+            pl.arg_sort_by(column, descending=descending, nulls_last=not descending, maintain_order=True)
+        ).to_series()
+
+    def facets(
+        self, mask: Optional[pl.Series], facets: List[str], max_values: int
+    ) -> Dict[str, List[FacetCount]]:
+        """The ``max_values`` most frequent values of every facet among the ``mask`` rows, null included."""
+        counts: Dict[str, List[FacetCount]] = {}
+        for facet in facets:
+            codes, dictionary = self._codes[facet]
+            top = (
+                (codes if mask is None else codes.filter(mask))
+                .value_counts(name='count')
+                .sort(['count', facet], descending=[True, False], nulls_last=False)
+                .head(max_values)
+            )
+            values = dictionary.gather(top[facet]).to_list()
+            counts[facet] = [
+                FacetCount(value=value, count=count) for value, count in zip(values, top['count'])
+            ]
+        return counts
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'token': self.token,
+            'version': self.version,
+            'rows': self.height,
+            'age_seconds': round(self.age(), 1),
+            'byte_order_strings': self.byte_order_strings,
+            'cached_sorts': len(self._orders),
+        }
+
+
+class UserIndex:
+    """Holder of the current :class:`UserSnapshot` of this worker, refreshed in the background.
+
+    Every worker follows the snapshot published in the store, the one holding the publisher lock first brings
+    it up to date from the database.
+    """
+
+    def __init__(self, user_repo: UserRepo, store: SnapshotStore):
+        self.user_repo = user_repo
+        self.store = store
+        self._snapshot: Optional[UserSnapshot] = None
+
+    @property
+    def snapshot(self) -> Optional[UserSnapshot]:
+        return self._snapshot
+
+    def select(self, criteria: UserFilterCriteria, engine: str = 'auto') -> Optional[UserSnapshot]:
+        """Snapshot to serve ``criteria`` from, ``None`` to run it in SQL."""
+        snapshot = self._snapshot
+        if engine == 'sql' or snapshot is None or not snapshot.can_serve(criteria):
+            return None
+        if snapshot.age() > settings.USERS_INDEX_MAX_STALENESS_SECONDS:
+            return None
+        return snapshot
+
+    def stats(self) -> dict[str, Any]:
+        snapshot = self._snapshot
+        return {'ready': snapshot is not None, **(snapshot.stats() if snapshot is not None else {})}
+
+    async def load(self) -> None:
+        """Adopt the published snapshot, reading the database only when nothing was published yet."""
+        await asyncio.to_thread(self._load)
+
+    async def refresh(self) -> None:
+        await asyncio.to_thread(self._refresh)
+
+    async def rebuild(self) -> None:
+        await asyncio.to_thread(self._refresh, True)
+
+    def _load(self) -> None:
+        self._follow()
+        if self._snapshot is None:
+            self._refresh()
+
+    def _refresh(self, full: bool = False) -> None:
+        with self.store.publisher(USERS_SNAPSHOT) as publishing:
+            # Another worker may have published since, updates start from the latest version
+            self._follow()
+            if publishing:
+                self._update(full)
+
+    def _follow(self) -> None:
+        pointer = self.store.pointer(USERS_SNAPSHOT)
+        if pointer is None:
+            return
+        current = self._snapshot
+        if current is not None and current.token == pointer['token']:
+            current.checked_at = pointer['meta']['checked_at']
+            return
+        self._adopt(UserSnapshot.from_published(self.store.load(USERS_SNAPSHOT, pointer)))
+
+    def _adopt(self, snapshot: UserSnapshot) -> None:
+        # Sorting millions of strings takes seconds, the sorts searches used so far are ready before the swap
+        if self._snapshot is not None:
+            snapshot.warm(self._snapshot.sorts)
+        # Swapped in one assignment, searches never see a partial state
+        self._snapshot = snapshot
+
+    def _update(self, full: bool) -> None:
+        current = self._snapshot
+        if (
+            full
+            or current is None
+            or current.watermark is None
+            or time.time() - current.rebuilt_at > settings.USERS_INDEX_FULL_REBUILD_INTERVAL_SECONDS
+        ):
+            snapshot = self._build()
+        else:
+            snapshot = self._build_since(current)
+        if snapshot is None:
+            # Unchanged, followers learn it is still up to date
+            self.store.update_meta(USERS_SNAPSHOT, checked_at=current.checked_at)
+            return
+        published = self.store.publish(USERS_SNAPSHOT, snapshot.to_frames(), snapshot.meta())
+        # The frames built here are dropped for the mapped ones, the publisher holds no private copy either
+        self._adopt(UserSnapshot.from_published(published))
+
+    @contextmanager
+    def _read_session(self) -> Iterator[Session]:
+        """Session whose statements all see the same snapshot, the rows match the data version read."""
+        with self.user_repo.db.sync_session() as session:
+            session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+            try:
+                yield session
+            finally:
+                session.rollback()
+
+    @staticmethod
+    def _read(session: Session, stm: Select) -> pl.DataFrame:
+        # Streamed in batches, the rows of the whole table are never all held as Python objects
+        result = session.execute(stm.execution_options(yield_per=READ_BATCH_SIZE))
+        frames = [
+            pl.DataFrame([tuple(row) for row in part], schema=INDEX_SCHEMA, orient='row')
+            for part in result.partitions()
+        ]
+        return pl.concat(frames) if frames else pl.DataFrame(schema=INDEX_SCHEMA)
+
+    def _build(self) -> UserSnapshot:
+        checked_at = time.time()
+        with self._read_session() as session:
+            version = session.scalar(self.user_repo.data_version()) or 0
+            frame = self._read(session, self.user_repo.index_rows())
+            byte_order_strings = session.scalar(self.user_repo.sorted_strings(COLLATION_PROBE)) == sorted(
+                COLLATION_PROBE
+            )
+        logger.info(f'User index rebuilt with {frame.height} users at version {version}')
+        return UserSnapshot(frame.sort('id'), version, byte_order_strings, checked_at)
+
+    def _build_since(self, current: UserSnapshot) -> Optional[UserSnapshot]:
+        """``current`` with the rows changed since its watermark, ``None`` when nothing changed."""
+        checked_at = time.time()
+        since = current.watermark - timedelta(seconds=settings.USERS_INDEX_WATERMARK_OVERLAP_SECONDS)
+        with self._read_session() as session:
+            version = session.scalar(self.user_repo.data_version()) or 0
+            if version == current.version:
+                current.checked_at = checked_at
+                return None
+            changed = self._read(session, self.user_repo.index_rows(since))
+            total = session.scalar(self.user_repo.count_all())
+        frame = pl.concat([current.frame.filter(~pl.col('id').is_in(changed['id'].implode())), changed])
+        if frame.height != total:
+            # Users were deleted, only a full read tells which
+            return self._build()
+        return UserSnapshot(
+            frame.sort('id'), version, current.byte_order_strings, checked_at, rebuilt_at=current.rebuilt_at
+        )
@@ -0,0 +1,41 @@
+"""Decoders for the binary list responses, for Python services calling this API."""
+
+import uuid
+from typing import Any
+
+import msgpack
+import orjson
+import pyarrow as pa
+
+from src.api.encoders import ARROW_STREAM, MSGPACK
+
+
+def decode_arrow(content: bytes) -> tuple[dict[str, Any], pa.Table]:
+    """Read an Arrow IPC stream response without copying it.
+
+    The table columns are views over ``content``, which must stay alive as long as the table is used.
+    Call ``table.to_pylist()`` or ``pl.from_arrow(table)`` to go further.
+    """
+    reader = pa.ipc.open_stream(pa.py_buffer(content))
+    table = reader.read_all()
+    meta = orjson.loads(table.schema.metadata[b'meta'])
+    return meta, table
+
+
+def decode_msgpack(content: bytes, key: str) -> dict[str, Any]:
+    """Decode a MessagePack response, turning the 16 byte ids back into UUIDs."""
+    payload = msgpack.unpackb(content, timestamp=3)
+    for row in payload[key]:
+        for field, value in row.items():
+            if isinstance(value, bytes) and len(value) == 16:  # noqa: PLR2004
+                row[field] = uuid.UUID(bytes=value)
+    return payload
+
+
+def decode(content: bytes, content_type: str, key: str) -> Any:
+    media_type = content_type.split(';', maxsplit=1)[0].strip()
+    if media_type == ARROW_STREAM:
+        return decode_arrow(content)
+    if media_type == MSGPACK:
+        return decode_msgpack(content, key)
+    return orjson.loads(content)
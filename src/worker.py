@@ -0,0 +1,37 @@
+"""Standalone background job runner.
+
+Runs the same job runner as the API workers without serving HTTP, so long jobs never compete with requests::
+
+    uv run python -m src.worker
+
+Set ``JOBS_RUN_IN_APP=false`` on the API when jobs should only run here. SIGTERM/SIGINT give the jobs in
+progress back to the queue before exiting.
+"""
+
+import asyncio
+import signal
+
+from src.container import Container
+from src.core.logger import get_logger, setup_logging
+
+logger = get_logger(__name__)
+
+
+async def run() -> None:
+    container = Container()
+    runner = container.job_runner()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    await runner.start()
+    await stop.wait()
+    logger.info('Stopping job runner')
+    await runner.stop()
+    await container.db().cleanup()
+
+
+if __name__ == '__main__':
+    setup_logging()
+    asyncio.run(run())
@@ -7,8 +7,6 @@ set -e
 #   sleep 2
 # done
 
-echo "Running database migrations..."
-uv run alembic upgrade head
-
+# Runs the migrations (one replica at a time), then the workers, see src/server.py
 echo "Starting application server..."
-uv run fastapi run src/main.py --workers 4
+exec uv run python -m src.server
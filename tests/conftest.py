@@ -0,0 +1,48 @@
+"""Shared fixtures.
+
+Tests reading Postgres run against the database of the settings (``POSTGRES_*``), migrated to head. They may
+write to it, so they only run once it is marked as a scratch database, and are skipped otherwise. The search
+tests add a fixed synthetic dataset to it (see :mod:`tests.seed`)::
+
+    uv run alembic upgrade head
+    psql -c "COMMENT ON DATABASE momos_test IS 'scratch'"
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from src.core.db import Database
+from tests.seed import seed_users
+
+SCRATCH_COMMENT = 'scratch'
+
+
+@pytest.fixture(scope='session')
+def db():
+    """The database of the settings, skips the test unless it is reachable and marked as scratch."""
+    database = Database()
+    try:
+        with database.sync_session() as session:
+            comment = session.scalar(
+                text(
+                    "SELECT shobj_description(oid, 'pg_database') FROM pg_database "
+                    'WHERE datname = current_database()'
+                )
+            )
+    except OperationalError as exc:
+        pytest.skip(f'No database reachable: {exc.orig}')
+    if comment != SCRATCH_COMMENT:
+        pytest.skip(f"The database is not marked as scratch (COMMENT ON DATABASE ... IS '{SCRATCH_COMMENT}')")
+    yield database
+    asyncio.run(database.cleanup())
+
+
+@pytest.fixture(scope='session')
+def seeded_users(db):
+    """The scratch database with the synthetic users of :mod:`tests.seed`, inserted on the first run."""
+    with db.sync_session() as session:
+        seed_users(session)
+    return db
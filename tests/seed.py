@@ -0,0 +1,68 @@
+"""A deterministic synthetic users table, large enough for the planner to pick the plans of production.
+
+Inserted by the ``seeded_users`` fixture into the scratch database only. The insert is idempotent (fixed
+emails, ``ON CONFLICT DO NOTHING``) and the random values come from a fixed seed, so every run sees the same
+dataset and the recorded plan snapshots stay valid.
+"""
+
+import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+SEEDED_USERS = 100_000
+# Dates of the dataset are relative to it, so the date filters keep their selectivity over time
+ANCHOR = datetime.datetime(2026, 1, 1, tzinfo=datetime.UTC)
+EMAIL_PATTERN = 'seed%@example.com'
+
+SEED_USERS = """
+INSERT INTO users (
+    first_name, last_name, email, phone_number, company_name, job_title, city, state, crm_status, lead_source,
+    last_activity_at, number_events_hosted, number_events_attended, created_at, updated_at
+)
+SELECT
+    (ARRAY['Jane', 'Janet', 'John', 'Maria', 'Ahmed', 'Li', 'Olga', 'Pedro'])[1 + floor(random() * 8)::int],
+    'Last' || n,
+    'seed' || n || '@example.com',
+    '+1 555 ' || lpad(n::text, 7, '0'),
+    'Company ' || floor(random() * 20000)::int,
+    (ARRAY['Software Engineer', 'Account Executive', 'Sales Manager', 'Data Engineer', 'Designer',
+           'Product Manager', 'Recruiter', 'Accountant'])[1 + floor(random() * 8)::int],
+    'City ' || floor(random() * 5000)::int,
+    (ARRAY['California', 'Texas', 'New York', 'Florida', 'Washington', 'Ohio', 'Georgia', 'Oregon',
+           'Nevada', 'Utah'])[1 + floor(power(random(), 2) * 10)::int],
+    (ARRAY['Lead', 'Prospect', 'Customer', 'Churned'])[1 + floor(random() * 4)::int],
+    (ARRAY['Website', 'Referral', 'Campaign', 'Direct Mail', 'Social Media'])[1 + floor(random() * 5)::int],
+    CASE WHEN random() < 0.9 THEN :anchor - random() * interval '365 days' END,
+    floor(power(random(), 3) * 20)::int,
+    floor(power(random(), 2) * 100)::int,
+    -- Signups in insertion order, like the real table
+    :anchor - interval '3 years' * (1 - n::float / :users),
+    now()
+FROM generate_series(1, :users) AS n
+ON CONFLICT (email) DO NOTHING
+"""
+
+
+def seed_users(session: Session) -> int:
+    """Inserts the users missing from the dataset then reorders and vacuums the table, returns how many it
+    added."""
+    present = session.scalar(
+        text('SELECT count(*) FROM users WHERE email LIKE :pattern'), {'pattern': EMAIL_PATTERN}
+    )
+    inserted = 0
+    if present < SEEDED_USERS:
+        session.execute(text('SELECT setseed(0.1739)'))
+        inserted = session.execute(text(SEED_USERS), {'users': SEEDED_USERS, 'anchor': ANCHOR}).rowcount
+    session.commit()
+    maintenance = session.connection(execution_options={'isolation_level': 'AUTOCOMMIT'})
+    # Back to signup order: other writers to the scratch database (benchmarks, imports) move updated rows, and
+    # the physical order of created_at decides between index and sequential scans
+    maintenance.exec_driver_sql('CLUSTER users USING ix_users_created_at')
+    # Fresh statistics and visibility map, like a settled table: both decide between (index only) scans. This
+    # statistics target samples every row (300 rows per unit), so the estimates are the same on each run
+    maintenance.exec_driver_sql(f'SET default_statistics_target = {SEEDED_USERS // 250}')
+    maintenance.exec_driver_sql('VACUUM (ANALYZE) users')
+    maintenance.exec_driver_sql('RESET default_statistics_target')
+    session.commit()
+    return inserted
@@ -0,0 +1,44 @@
+"""/api/events containment filters on event_details are served by the GIN index.
+
+Sequential scans are disabled, so a small development table gives the same answer as production: the index
+*can* serve the filter. Key existence (``details_has``) is not checked: ``jsonb_path_ops`` extracts no key
+from a bare path, the plan would show the index while the scan reads all of it.
+"""
+
+from typing import Any, Iterator
+
+import pytest
+from sqlalchemy import text
+
+from src.core.db import explain
+from src.repos.event import EventRepo
+from src.schemas.dto.event import EventFilterCriteria
+
+INDEX = 'ix_events_event_details'
+
+CASES = {
+    'containment': EventFilterCriteria(details={'value': 42}),
+    'nested containment': EventFilterCriteria(details={'venue': {'city': 'Austin'}}),
+    'containment and status': EventFilterCriteria(details={'value': 42}, event_status='Completed'),
+}
+
+
+def plan_nodes(plan: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def bitmap_scans(db, criteria: EventFilterCriteria) -> set[str]:
+    """Indexes read by the Bitmap Index Scans of the plan, the only scan a GIN index supports."""
+    repo = EventRepo(db=None)
+    with db.sync_session() as session:
+        session.execute(text('SET LOCAL enable_seqscan = off'))
+        plan = explain(session, repo.data_range(repo.retrieve_event_using_criteria(criteria), limit=10, offset=0))
+        session.rollback()
+    return {node['Index Name'] for node in plan_nodes(plan) if node['Node Type'] == 'Bitmap Index Scan'}
+
+
+@pytest.mark.parametrize('criteria', CASES.values(), ids=CASES.keys())
+def test_details_filter_uses_index(db, criteria):
+    assert INDEX in bitmap_scans(db, criteria)
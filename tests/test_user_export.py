@@ -0,0 +1,94 @@
+"""The XLSX export runs in bounded memory, whatever the number of rows.
+
+Synthetic user rows are written with the export's own writer, in batches like the export job receives them
+from its cursor, under tracemalloc.
+"""
+
+import datetime
+import os
+import tracemalloc
+import uuid
+from collections.abc import Iterator
+
+import pytest
+from openpyxl import load_workbook
+
+from src.repos.user import USER_EXPORT_COLUMNS
+from src.services import user_export
+from src.services.user_export import write_xlsx
+
+HEADER = [column.name for column in USER_EXPORT_COLUMNS]
+STATES = ['CA', 'NY', 'TX', 'WA', None]
+ROWS = 20_000
+# Below USERS_EXPORT_BATCH_SIZE, so that a tenth of the rows already spans several batches
+BATCH_SIZE = 1_000
+# Ceiling of the peak of the large export, and its allowed growth from a tenth of the rows
+MAX_PEAK_MB = 64
+MAX_GROWTH_MB = 4
+
+
+def batches(rows: int, batch_size: int = BATCH_SIZE) -> Iterator[list[tuple]]:
+    """Rows shaped like the export statement's, built one batch at a time."""
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+    for first in range(0, rows, batch_size):
+        yield [
+            (
+                str(uuid.uuid4()),
+                f'First{i}',
+                f'Last{i}',
+                f'user{i}@example.com',
+                f'+1 555 {i:07d}',
+                f'Company {i % 5000}',
+                'Account Executive',
+                f'City {i % 300}',
+                STATES[i % len(STATES)],
+                'Lead',
+                'Webinar' if i % 3 else None,
+                start + datetime.timedelta(minutes=i),
+                (start + datetime.timedelta(seconds=i)).replace(tzinfo=None),
+                i % 7,
+                i % 40,
+            )
+            for i in range(first, min(first + batch_size, rows))
+        ]
+
+
+def peak_mb(path: str, rows: int) -> float:
+    tracemalloc.start()
+    try:
+        assert write_xlsx(path, HEADER, batches(rows)) == rows
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def test_memory_does_not_follow_the_row_count(tmp_path):
+    small = peak_mb(os.path.join(tmp_path, 'small.xlsx'), ROWS // 10)
+    large = peak_mb(os.path.join(tmp_path, 'large.xlsx'), ROWS)
+
+    assert large < MAX_PEAK_MB
+    assert large - small < MAX_GROWTH_MB, f'peak {small:.1f} MB -> {large:.1f} MB with 10x the rows'
+
+
+def test_rows_continue_on_a_new_sheet(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_export, 'MAX_SHEET_ROWS', 4)
+    path = os.path.join(tmp_path, 'users.xlsx')
+
+    assert write_xlsx(path, HEADER, batches(7, batch_size=2)) == 7
+
+    workbook = load_workbook(path, read_only=True)
+    assert workbook.sheetnames == ['Users 1', 'Users 2', 'Users 3']
+    sheets = [list(sheet.values) for sheet in workbook.worksheets]
+    assert [len(rows) for rows in sheets] == [4, 4, 2]
+    assert all(rows[0] == tuple(HEADER) for rows in sheets)
+    assert sheets[2][1][3] == 'user6@example.com'
+
+
+@pytest.mark.parametrize('value', ['=HYPERLINK("http://x")', 'http://example.com'])
+def test_strings_are_written_as_text(tmp_path, value):
+    path = os.path.join(tmp_path, 'users.xlsx')
+    write_xlsx(path, ['company_name'], [[(value,)]])
+
+    cell = load_workbook(path).active['A2']
+    assert (cell.value, cell.data_type, cell.hyperlink) == (value, 's', None)
@@ -0,0 +1,29 @@
+import polars as pl
+
+from src.services.user_import import validate
+
+
+def test_repeated_email_cites_the_imported_row():
+    frame = pl.DataFrame(
+        {
+            'row': [2, 3, 6],
+            'first_name': ['Jane', 'John', 'Janet'],
+            'last_name': ['Doe', 'Roe', 'Doe'],
+            'email': ['jane@example.com', 'john@example.com', 'jane@example.com'],
+        }
+    )
+    valid, rejected = validate(frame)
+
+    assert valid['first_name'].to_list() == ['John', 'Janet']
+    assert rejected.rows() == [(2, 'jane@example.com', 'email appears again on row 6, which is imported')]
+
+
+def test_invalid_rows_list_every_problem():
+    frame = pl.DataFrame(
+        {'row': [2, 3], 'first_name': ['Jane', '  '], 'last_name': ['Doe', ''], 'email': ['jane', '']}
+    )
+    valid, rejected = validate(frame)
+
+    assert valid.is_empty()
+    # Row 3 is blank, neither imported nor reported
+    assert rejected.rows() == [(2, 'jane', 'email is not a valid address')]
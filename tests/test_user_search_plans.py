@@ -0,0 +1,125 @@
+"""Query plans of the /api/users search shapes match their recorded snapshots.
+
+Every shape (count or page query, filters, sort and order) is built like the search builds it
+(``UserRepo.retrieve_user_using_criteria`` then ``data_range``) and planned with ``EXPLAIN (FORMAT JSON)``
+over the seeded dataset. A plan is kept as its tree of node types, relations and indexes plus its total
+cost: a shape change (e.g. an Index Scan becoming a Seq Scan) fails, and so does a cost growth past
+``COST_TOLERANCE``. Snapshots are recorded on Postgres 16, the major version of ``docker-compose.yaml``,
+the test skips on others. After an intended plan change::
+
+    uv run pytest tests/test_user_search_plans.py --snapshot-update
+"""
+
+import datetime
+import itertools
+import json
+from pathlib import Path
+from typing import Any, Iterator
+
+import pytest
+from sqlalchemy import Select, text
+
+from src.core.db import explain
+from src.repos.user import SORT_BY_RELEVANCE, SORT_COLUMNS, UserRepo
+from src.schemas.dto.user import DateRange, NumRange, UserFilterCriteria
+from tests.seed import ANCHOR
+
+SNAPSHOT_DIR = Path(__file__).parent / 'snapshots' / 'user_search_plans'
+# Plans and costs change between major versions
+SNAPSHOT_SERVER_VERSION = 16
+# Allowed cost growth: relative, and absolute for the cheap plans
+COST_TOLERANCE = 0.25
+MIN_COST_DELTA = 50
+# One value per filter of UserFilterCriteria, each matching part of the seeded dataset
+FILTERS: dict[str, Any] = {
+    'q': 'jan',
+    'company_name': 'company 12',
+    'job_title': 'engineer',
+    'city': 'city 42',
+    'state': 'California',
+    'crm_status': 'Customer',
+    'event_hosted': NumRange(min_number=1, max_number=5),
+    'event_attended': NumRange(min_number=5, max_number=40),
+    'last_activity': DateRange.between(ANCHOR - datetime.timedelta(days=30), None),
+    'created': DateRange.between(
+        ANCHOR - datetime.timedelta(days=365), ANCHOR - datetime.timedelta(days=180)
+    ),
+}
+# What a plan is compared on, costs and row estimates move with the statistics
+PLAN_KEYS = (
+    'Node Type',
+    'Parent Relationship',
+    'Strategy',
+    'Join Type',
+    'Relation Name',
+    'Index Name',
+    'Scan Direction',
+)
+
+
+def combinations() -> Iterator[tuple[str, ...]]:
+    """No filter, every filter alone, every pair and all of them."""
+    for size in (0, 1, 2):
+        yield from itertools.combinations(FILTERS, size)
+    yield tuple(FILTERS)
+
+
+def shapes() -> Iterator[tuple[str, Select]]:
+    """Name and statement of every search shape: the count of each combination of filters, the page query
+    in every sort and order for a single filter, the default sort for several."""
+    repo = UserRepo(db=None)
+    for names in combinations():
+        criteria = UserFilterCriteria(**{'company_name': None, **{name: FILTERS[name] for name in names}})
+        filters = '+'.join(names) or 'no-filter'
+        query = repo.retrieve_user_using_criteria(criteria)
+        yield f'count {filters}', repo.count_of(query.statement)
+        if len(names) <= 1:
+            sorts = [(sort_by, order) for sort_by in SORT_COLUMNS for order in ('asc', 'desc')]
+        else:
+            sorts = [(criteria.sort_by, criteria.sort_order)]
+        if criteria.q:
+            sorts.insert(0, (SORT_BY_RELEVANCE, 'desc'))
+        for sort_by, order in sorts:
+            page = repo.data_range(query, limit=10, offset=0, sort_by=sort_by, sort_order=order, q=criteria.q)
+            yield f'page {filters} by {sort_by} {order}', page.statement
+
+
+SHAPES = dict(shapes())
+
+
+def normalize(plan: dict[str, Any]) -> dict[str, Any]:
+    node = {key: plan[key] for key in PLAN_KEYS if key in plan}
+    if plan.get('Plans'):
+        node['Plans'] = [normalize(child) for child in plan['Plans']]
+    return node
+
+
+def within_tolerance(recorded: float, current: float) -> bool:
+    return current - recorded <= MIN_COST_DELTA or current <= recorded * (1 + COST_TOLERANCE)
+
+
+@pytest.fixture(scope='module')
+def planner(seeded_users):
+    with seeded_users.sync_session() as session:
+        version = session.scalar(text('SHOW server_version_num'))
+    if int(version) // 10000 != SNAPSHOT_SERVER_VERSION:
+        pytest.skip(f'Plan snapshots are recorded on Postgres {SNAPSHOT_SERVER_VERSION}, not {version}')
+    return seeded_users
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_search_plan(planner, snapshot, shape):
+    with planner.sync_session() as session:
+        plan = explain(session, SHAPES[shape])
+        session.rollback()
+    current = {'cost': round(plan['Total Cost']), 'plan': normalize(plan)}
+
+    snapshot.snapshot_dir = SNAPSHOT_DIR
+    name = f'{shape.replace(" ", "_")}.json'
+    recorded_path = SNAPSHOT_DIR / name
+    if recorded_path.is_file():
+        recorded = json.loads(recorded_path.read_text())
+        # A cost within the tolerance compares equal, the snapshot keeps the recorded one
+        if within_tolerance(recorded['cost'], current['cost']):
+            current['cost'] = recorded['cost']
+    snapshot.assert_match(json.dumps(current, indent=1) + '\n', name)